@@ -0,0 +1,292 @@
+'''
+Combines many images into one texture, so a scene's draws needn't bind a
+texture each, or can be batched into one draw:
+
+    atlas = Atlas([pixels0, pixels1, ...])          # packed onto one sheet
+    layers = TextureArray([pixels0, pixels1, ...])  # a GL_TEXTURE_2D_ARRAY
+
+Either has regions, a (N, 4) float32 table of each image's (u offset, v
+offset, u scale, v scale), to remap the image's own texture coordinates
+into the combined texture's:
+
+    texcoord = regions[i].xy + texcoord * regions[i].zw
+
+for an atlas in 2D; for a texture array, image i is layer i, and the
+offsets are 0.  remap() does the same in numpy, for baking the remapped
+coordinates into vertices.
+
+Atlases pack images by the skyline bottom-left heuristic, each surrounded
+by padding texels copied from its edges, so linear filtering at an edge
+samples what GL_CLAMP_TO_EDGE would have.  Mipmaps would mix neighbours
+at coarse levels, so atlases have none; texture arrays have no
+neighbours, and take texturebake.Baked layers, mipmapped and compressed,
+as readily as pixels.
+
+To build either on textures.TextureLoader's pool:
+
+    texture = loader.load(filenames, decode=ArrayDecoder(Baker('bc1')),
+                          target=gl.GL_TEXTURE_2D_ARRAY)
+    ...
+    texture.regions     # once it's ready
+'''
+import ctypes
+
+import numpy
+
+from OpenGL import GL as gl
+from OpenGL.GL.EXT.texture_array import glInitTextureArrayEXT
+# the unwrapped call, which takes an offset into a pixel unpack buffer
+from OpenGL.raw.GL.VERSION.GL_1_3 import glCompressedTexImage3D
+
+# mipmapped, block compressed textures, see texturebake.py
+from texturebake import FORMATS, Baked
+# decodes images to bottom-up RGBA pixels, see textures.py
+from textures import decode
+
+
+DEFAULT_PADDING = 2
+MAX_SIZE = 4096
+
+
+def supported_arrays():
+    '''
+        whether the current GL context has GL_TEXTURE_2D_ARRAY, with
+        GLSL's texture2DArray()
+    '''
+    return bool(glInitTextureArrayEXT())
+
+
+def skyline(sizes, width):
+    '''
+        [(x, y)] placing each of (width, height) sizes within width
+        texels, bottom-left first, tallest first, and the height used
+    '''
+    # the skyline: [x, y, width] of each segment, left to right
+    segments = [[0, 0, width]]
+    positions = [None] * len(sizes)
+    order = sorted(range(len(sizes)),
+                   key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    for i in order:
+        w, h = sizes[i]
+        if w > width:
+            raise ValueError('a %dx%d image is wider than %d' % (w, h, width))
+        best = None
+        for start in range(len(segments)):
+            x = segments[start][0]
+            if x + w > width:
+                break
+            # resting on the highest segment it spans
+            y, end = 0, start
+            while segments[end][0] < x + w:
+                y = max(y, segments[end][1])
+                end += 1
+                if end == len(segments):
+                    break
+            if best is None or (y + h, x) < best[:2]:
+                best = (y + h, x, start, end)
+        top, x, start, end = best
+        positions[i] = (x, top - h)
+
+        # the new segment replaces those it covers, the last cut short
+        last = segments[end - 1]
+        remainder = last[0] + last[2] - (x + w)
+        replaced = [[x, top, w]]
+        if remainder > 0:
+            replaced.append([x + w, last[1], remainder])
+        segments[start:end] = replaced
+        merged = [segments[0]]
+        for segment in segments[1:]:
+            if segment[1] == merged[-1][1]:
+                merged[-1][2] += segment[2]
+            else:
+                merged.append(segment)
+        segments = merged
+    return positions, max(segment[1] for segment in segments)
+
+
+def pack(sizes, padding=DEFAULT_PADDING, max_size=MAX_SIZE):
+    '''
+        (width, height, [(x, y)]) of the smallest power of two width the
+        padded sizes pack into, no taller than it, positions inside the
+        padding
+    '''
+    padded = [(w + 2 * padding, h + 2 * padding) for w, h in sizes]
+    area = sum(w * h for w, h in padded)
+    width = 4
+    while width * width < area or width < max(w for w, _ in padded):
+        width *= 2
+    while True:
+        if width > max_size:
+            raise ValueError('the images don\'t fit in %dx%d' % (
+                max_size, max_size))
+        positions, height = skyline(padded, width)
+        if height <= width:
+            break
+        width *= 2
+    # a multiple of 4, for block compression
+    height = -(-height // 4) * 4
+    return width, height, [(x + padding, y + padding) for x, y in positions]
+
+
+def remap(regions, index, texcoords):
+    '''
+        (N, 2) texture coordinates of image index remapped by regions
+    '''
+    region = regions[index]
+    return region[:2] + numpy.asarray(texcoords) * region[2:]
+
+
+class Atlas(object):
+    '''
+        pixels: (height, width, 4) uint8 of every image, bottom row first
+        regions: see above
+        positions: [(x, y)] of each image's bottom left texel
+    '''
+    format = 'rgba'
+
+    def __init__(self, images, padding=DEFAULT_PADDING, max_size=MAX_SIZE):
+        sizes = [image.shape[1::-1] for image in images]
+        width, height, self.positions = pack(sizes, padding, max_size)
+        self.pixels = numpy.zeros((height, width, 4), numpy.uint8)
+        self.regions = numpy.zeros((len(images), 4), numpy.float32)
+        for i, (image, (x, y)) in enumerate(zip(images, self.positions)):
+            h, w = image.shape[:2]
+            self.pixels[y - padding:y + h + padding,
+                        x - padding:x + w + padding] = numpy.pad(
+                image, ((padding, padding), (padding, padding), (0, 0)),
+                mode='edge')
+            self.regions[i] = (
+                x / float(width), y / float(height),
+                w / float(width), h / float(height))
+
+    @property
+    def size(self):
+        return self.pixels.shape[1::-1]
+
+    @property
+    def levels(self):
+        width, height = self.size
+        return [(width, height, self.pixels)]
+
+    @property
+    def nbytes(self):
+        return self.pixels.nbytes
+
+    def specify(self, texture_id, offsets=None):
+        '''
+            as texturebake.Baked.specify(), for GL_TEXTURE_2D
+        '''
+        Baked(self.levels, 'rgba').specify(texture_id, offsets)
+
+
+class TextureArray(object):
+    '''
+        levels: [(width, height, uint8 array)] of every layer at each
+            level, layer after layer
+        format: one of texturebake.FORMATS
+        regions: see above
+    '''
+    def __init__(self, images):
+        if all(isinstance(image, Baked) for image in images):
+            self._from_baked(images)
+        else:
+            self._from_pixels(images)
+        self.layers = len(images)
+
+    def _from_baked(self, images):
+        formats = set((image.format, image.size) for image in images)
+        if len(formats) != 1:
+            raise ValueError(
+                'baked layers should all be the same format and size')
+        self.format = images[0].format
+        self.levels = [
+            (width, height, numpy.concatenate(
+                [image.levels[level][2] for image in images]))
+            for level, (width, height, _) in enumerate(images[0].levels)]
+        self.regions = numpy.zeros((len(images), 4), numpy.float32)
+        self.regions[:, 2:] = 1.0
+
+    def _from_pixels(self, images):
+        # each at the bottom left of the largest, edges repeated to fill
+        width = max(image.shape[1] for image in images)
+        height = max(image.shape[0] for image in images)
+        pixels = numpy.empty((len(images), height, width, 4), numpy.uint8)
+        self.regions = numpy.zeros((len(images), 4), numpy.float32)
+        for layer, image in enumerate(images):
+            h, w = image.shape[:2]
+            pixels[layer] = numpy.pad(
+                image, ((0, height - h), (0, width - w), (0, 0)),
+                mode='edge')
+            self.regions[layer, 2:] = (w / float(width), h / float(height))
+        self.format = 'rgba'
+        self.levels = [(width, height, pixels)]
+
+    @property
+    def size(self):
+        return self.levels[0][:2]
+
+    @property
+    def nbytes(self):
+        return sum(data.nbytes for _, _, data in self.levels)
+
+    def specify(self, texture_id, offsets=None):
+        '''
+            give the GL_TEXTURE_2D_ARRAY every layer at every level, from
+            the arrays, or from offsets into the bound pixel unpack buffer
+        '''
+        internal_format, _, block_bytes = FORMATS[self.format]
+        target = gl.GL_TEXTURE_2D_ARRAY
+        gl.glBindTexture(target, texture_id)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        try:
+            for level, (width, height, data) in enumerate(self.levels):
+                size = data.nbytes
+                if offsets is not None:
+                    data = ctypes.c_void_p(offsets[level])
+                elif block_bytes:
+                    data = ctypes.c_void_p(data.ctypes.data)
+                if block_bytes:
+                    glCompressedTexImage3D(
+                        target, level, internal_format, width, height,
+                        self.layers, 0, size, data)
+                else:
+                    gl.glTexImage3D(
+                        target, level, internal_format, width, height,
+                        self.layers, 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE,
+                        data)
+            gl.glTexParameteri(
+                target, gl.GL_TEXTURE_MAX_LEVEL, len(self.levels) - 1)
+            if len(self.levels) > 1:
+                gl.glTexParameteri(
+                    target, gl.GL_TEXTURE_MIN_FILTER,
+                    gl.GL_LINEAR_MIPMAP_LINEAR)
+        finally:
+            gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+            gl.glBindTexture(target, 0)
+
+
+class AtlasDecoder(object):
+    '''
+        decodes a list of files into an Atlas, as a textures.TextureLoader
+        decode, for load()
+    '''
+    def __init__(self, padding=DEFAULT_PADDING, max_size=MAX_SIZE):
+        self.padding = padding
+        self.max_size = max_size
+
+    def __call__(self, filenames, reader):
+        return Atlas([decode(filename, reader) for filename in filenames],
+                     self.padding, self.max_size)
+
+
+class ArrayDecoder(object):
+    '''
+        decodes a list of files into a TextureArray, each with decode (as
+        a texturebake.Baker does), as a textures.TextureLoader decode
+    '''
+    def __init__(self, decode=decode):
+        self.decode = decode
+
+    def __call__(self, filenames, reader):
+        return TextureArray(
+            [self.decode(filename, reader) for filename in filenames])
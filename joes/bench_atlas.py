@@ -0,0 +1,260 @@
+'''
+Times drawing a grid of quads, each with its own small image, from a
+texture each (a bind and a draw per quad) against atlas.py's Atlas and
+TextureArray (one bind, one draw):
+
+    python bench_atlas.py --images 256 --repeat 20 --frames 100
+
+Texture coordinates are remapped on the CPU, with atlas.remap() and the
+regions table, and the frames compared to the first method's by their
+largest difference and the share of pixels differing by more than 2:
+linear filtering rounds a little differently at remapped coordinates.
+'''
+import json
+import optparse
+from os.path import abspath, dirname, join
+import sys
+
+import numpy
+
+# shared helpers live alongside the pyopengl tutorials
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'pyopengl'))
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import timing
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+from shadercache import compileProgram, compileShader
+
+from atlas import Atlas, TextureArray, remap, supported_arrays
+from texturebake import Baked
+
+
+METHODS = ('binds', 'atlas', 'array')
+TOLERANCE = 2
+VERTEX_SHADER = '''#version 110
+attribute vec2 position;
+attribute vec3 texcoord;
+varying vec3 frag_texcoord;
+void main()
+{
+    gl_Position = vec4(position, 0.0, 1.0);
+    frag_texcoord = texcoord;
+}
+'''
+FRAGMENT_SHADERS = {
+    gl.GL_TEXTURE_2D: '''#version 110
+uniform sampler2D image;
+varying vec3 frag_texcoord;
+void main()
+{
+    gl_FragColor = texture2D(image, frag_texcoord.xy);
+}
+''',
+    gl.GL_TEXTURE_2D_ARRAY: '''#version 110
+#extension GL_EXT_texture_array : require
+uniform sampler2DArray image;
+varying vec3 frag_texcoord;
+void main()
+{
+    gl_FragColor = texture2DArray(image, frag_texcoord);
+}
+''',
+}
+# two triangles of the unit square
+CORNERS = numpy.array(
+    [(0, 0), (1, 0), (1, 1), (0, 0), (1, 1), (0, 1)], numpy.float32)
+
+
+def make_images(count, low=8, high=64):
+    '''
+        count smooth random RGBA images between low and high texels a side
+    '''
+    random = numpy.random.RandomState(0)
+    images = []
+    for _ in range(count):
+        height, width = random.randint(low, high + 1, 2)
+        v, u = numpy.mgrid[0:1:height * 1j, 0:1:width * 1j]
+        colour = random.rand(3, 3)
+        image = numpy.empty((height, width, 4))
+        for channel in range(3):
+            image[..., channel] = (
+                colour[channel, 0] + colour[channel, 1] * u
+                + colour[channel, 2] * v) * 255.0 / 3.0
+        image[..., 3] = 255.0
+        images.append(image.round().astype(numpy.uint8))
+    return images
+
+
+def quads(count):
+    '''
+        (count * 6, 2) clip space positions of a grid of count quads, and
+        (count * 6, 2) texture coordinates across each
+    '''
+    columns = int(numpy.ceil(numpy.sqrt(count)))
+    rows = -(-count // columns)
+    index = numpy.arange(count)
+    origin = numpy.column_stack([index % columns, index // columns])
+    scale = 2.0 / numpy.array([columns, rows])
+    positions = (origin[:, None] + CORNERS) * scale - 1.0
+    return (positions.reshape(-1, 2).astype(numpy.float32),
+            numpy.tile(CORNERS, (count, 1)))
+
+
+def texture(target, image):
+    texture_id = gl.glGenTextures(1)
+    gl.glBindTexture(target, texture_id)
+    for name, value in (
+        (gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR),
+        (gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR),
+        (gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE),
+        (gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE),
+    ):
+        gl.glTexParameteri(target, name, value)
+    image.specify(texture_id)
+    return texture_id
+
+
+def make(method, images, texcoords):
+    '''
+        ([(texture, first vertex, count)] to draw, remapped texcoords, and
+        the texture target
+    '''
+    count = len(images)
+    per_quad = len(CORNERS)
+    if method == 'binds':
+        textures = [
+            texture(gl.GL_TEXTURE_2D, Baked.from_pixels(image))
+            for image in images]
+        draws = [
+            (texture_id, i * per_quad, per_quad)
+            for i, texture_id in enumerate(textures)]
+        layers = numpy.zeros((len(texcoords), 1), numpy.float32)
+        return draws, numpy.hstack([texcoords, layers]), gl.GL_TEXTURE_2D
+
+    if method == 'atlas':
+        image, target = Atlas(images), gl.GL_TEXTURE_2D
+    else:
+        image, target = TextureArray(images), gl.GL_TEXTURE_2D_ARRAY
+    quad = texcoords.reshape(count, per_quad, 2)
+    remapped = numpy.concatenate([
+        remap(image.regions, i, quad[i]) for i in range(count)])
+    layers = numpy.repeat(numpy.arange(count), per_quad)[:, None]
+    if method == 'atlas':
+        layers = numpy.zeros_like(layers)
+    draws = [(texture(target, image), 0, count * per_quad)]
+    return draws, numpy.hstack([remapped, layers]), target
+
+
+def run(draws, target, shader, buffer, repeat, frames, warmup, framebuffer):
+    stride = 5 * 4
+    samples = []
+    gl.glUseProgram(shader)
+    gl.glUniform1i(gl.glGetUniformLocation(shader, 'image'), 0)
+    gl.glActiveTexture(gl.GL_TEXTURE0)
+    position = gl.glGetAttribLocation(shader, 'position')
+    texcoord = gl.glGetAttribLocation(shader, 'texcoord')
+    buffer.bind()
+    try:
+        gl.glEnableVertexAttribArray(position)
+        gl.glEnableVertexAttribArray(texcoord)
+        gl.glVertexAttribPointer(
+            position, 2, gl.GL_FLOAT, gl.GL_FALSE, stride, buffer)
+        gl.glVertexAttribPointer(
+            texcoord, 3, gl.GL_FLOAT, gl.GL_FALSE, stride, buffer + 8)
+        for frame in range(warmup + frames):
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+            gl.glFinish()
+            start = timing.clock()
+            for _ in range(repeat):
+                for texture_id, first, count in draws:
+                    gl.glBindTexture(target, texture_id)
+                    gl.glDrawArrays(gl.GL_TRIANGLES, first, count)
+            gl.glFinish()
+            if frame >= warmup:
+                samples.append(timing.clock() - start)
+    finally:
+        gl.glDisableVertexAttribArray(position)
+        gl.glDisableVertexAttribArray(texcoord)
+        buffer.unbind()
+        gl.glBindTexture(target, 0)
+        gl.glUseProgram(0)
+    return samples, framebuffer.read_pixels()
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-i', '--images', type='int', default=256,
+        help='images, and quads, to draw [%default]')
+    parser.add_option('-m', '--methods', default=','.join(METHODS),
+        help='comma-separated methods to time [%default]')
+    parser.add_option('-r', '--repeat', type='int', default=20,
+        help='draws of every quad per frame [%default]')
+    parser.add_option('-n', '--frames', type='int', default=100)
+    parser.add_option('-w', '--warmup', type='int', default=5)
+    parser.add_option('-s', '--size', default='512x512',
+        help='framebuffer WIDTHxHEIGHT [%default]')
+    parser.add_option('--json', metavar='FILE',
+        help='also write the percentiles to FILE')
+    options, _ = parser.parse_args(argv)
+
+    images = make_images(options.images)
+    positions, texcoords = quads(options.images)
+    size = headless.parse_size(options.size)
+    context = headless.OffscreenContext(size)
+    results = {}
+    try:
+        framebuffer = headless.Framebuffer(size)
+        framebuffer.bind()
+        methods = options.methods.split(',')
+        if 'array' in methods and not supported_arrays():
+            parser.error('texture arrays are not supported here')
+        shaders = dict(
+            (target, compileProgram(
+                compileShader(VERTEX_SHADER, gl.GL_VERTEX_SHADER),
+                compileShader(source, gl.GL_FRAGMENT_SHADER)))
+            for target, source in FRAGMENT_SHADERS.items())
+
+        reference = None
+        for method in methods:
+            start = timing.clock()
+            draws, remapped, target = make(method, images, texcoords)
+            gl.glFinish()
+            setup = timing.clock() - start
+            buffer = vbo.VBO(numpy.ascontiguousarray(
+                numpy.hstack([positions, remapped]), numpy.float32))
+            samples, pixels = run(
+                draws, target, shaders[target], buffer, options.repeat,
+                options.frames, options.warmup, framebuffer)
+            buffer.delete()
+            textures = sorted(set(texture_id for texture_id, _, _ in draws))
+            gl.glDeleteTextures(len(textures), textures)
+
+            results[method] = summary = timing.summarise(samples)
+            summary['setup_ms'] = setup * 1000.0
+            summary['draws'] = len(draws)
+            if reference is None:
+                reference = pixels
+            difference = numpy.abs(
+                pixels.astype('i') - reference.astype('i')).max(axis=2)
+            summary['max_difference'] = int(difference.max())
+            summary['pixels_differing'] = float(
+                (difference > TOLERANCE).mean())
+            print('%s  %4d draws  set up in %7.2fms  max difference %3d  '
+                  '%.3f%% over %d' % (
+                      timing.format_summary(method, summary), len(draws),
+                      setup * 1000.0, summary['max_difference'],
+                      summary['pixels_differing'] * 100.0, TOLERANCE))
+        for shader in shaders.values():
+            gl.glDeleteProgram(shader)
+        framebuffer.delete()
+    finally:
+        context.destroy()
+
+    if options.json:
+        with open(options.json, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+'''
+Times filling a vertex buffer the way main.py used to, by unpacking a list
+into a ctypes array, against buffers.buffer_data given the same floats as
+a list, a numpy array, a memoryview and bytes:
+
+    python bench_buffers.py --counts 1000,100000,10000000 --repeat 5
+
+Each method's buffer is read back, and should match the others.
+'''
+from ctypes import c_void_p, sizeof
+import json
+import optparse
+from os.path import abspath, dirname, join
+import sys
+
+import numpy
+
+# shared helpers live alongside the pyopengl tutorials
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'pyopengl'))
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import timing
+from OpenGL import GL as gl
+
+from buffers import buffer_data
+
+
+DEFAULT_COUNTS = '1000,10000,100000,1000000,10000000'
+METHODS = ('ctypes', 'list', 'numpy', 'memoryview', 'bytes')
+
+
+def ctypes_data(target, data):
+    # main.py's make_buffer, before buffers.py
+    size = len(data) * sizeof(gl.GLfloat)
+    array_type = (gl.GLfloat * len(data))
+    gl.glBufferData(target, size, array_type(*data), gl.GL_STATIC_DRAW)
+
+
+def sources(count):
+    '''
+        count floats as each method is given them
+    '''
+    array = numpy.arange(count, dtype=numpy.float32)
+    return {
+        'ctypes': array.tolist(),
+        'list': array.tolist(),
+        'numpy': array,
+        'memoryview': memoryview(array),
+        'bytes': array.tobytes(),
+    }
+
+
+def read_back(target, nbytes):
+    result = numpy.empty(nbytes, dtype=numpy.uint8)
+    gl.glGetBufferSubData(target, 0, nbytes, c_void_p(result.ctypes.data))
+    return result
+
+
+def run(method, data, repeat):
+    '''
+        returns seconds per upload, and the buffer's contents
+    '''
+    target = gl.GL_ARRAY_BUFFER
+    buffer_id = gl.glGenBuffers(1)
+    gl.glBindBuffer(target, buffer_id)
+    try:
+        samples = []
+        for _ in range(repeat):
+            start = timing.clock()
+            if method == 'ctypes':
+                ctypes_data(target, data)
+            elif method == 'list':
+                buffer_data(target, data, gl.GLfloat)
+            else:
+                buffer_data(target, data)
+            gl.glFinish()
+            samples.append(timing.clock() - start)
+        size = gl.glGetBufferParameteriv(target, gl.GL_BUFFER_SIZE)
+        return samples, read_back(target, int(size))
+    finally:
+        gl.glBindBuffer(target, 0)
+        gl.glDeleteBuffers(1, [buffer_id])
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-c', '--counts', default=DEFAULT_COUNTS,
+        help='comma-separated numbers of floats [%default]')
+    parser.add_option('-m', '--methods', default=','.join(METHODS),
+        help='comma-separated methods to time [%default]')
+    parser.add_option('-r', '--repeat', type='int', default=5,
+        help='uploads of each [%default]')
+    parser.add_option('--json', metavar='FILE',
+        help='also write the percentiles to FILE')
+    options, _ = parser.parse_args(argv)
+
+    context = headless.OffscreenContext(headless.DEFAULT_SIZE)
+    results = {}
+    try:
+        for count in [int(c) for c in options.counts.split(',')]:
+            data = sources(count)
+            reference = None
+            for method in options.methods.split(','):
+                samples, contents = run(method, data[method], options.repeat)
+                label = '%s %d' % (method, count)
+                results[label] = summary = timing.summarise(samples)
+                if reference is None:
+                    reference = contents
+                same = numpy.array_equal(contents, reference)
+                print('%s  %8.1f MB/s  %s' % (
+                    timing.format_summary(label, summary),
+                    count * 4 / summary['mean'] / 1000.0,
+                    'same' if same else 'DIFFERENT',
+                ))
+    finally:
+        context.destroy()
+
+    if options.json:
+        with open(options.json, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+'''
+Times loading textures one after the other, decoded by pyglet as main.py
+used to (pyglet) or by pngio (sync), against textures.TextureLoader
+decoding them on threads or processes, with either (--reader), or
+loading them mipmapped (and with --format bc1 or bc3, compressed) from
+texturebake.py's cache:
+
+    python bench_textures.py --count 32 --methods pyglet,threads,baked
+
+'ready' is how long until the first frame could be drawn, 'done' until
+every texture is uploaded, with update() called once a 'frame' (every
+10ms) meanwhile.  Each texture is read back, and should match: baked
+ones, to within 1, what texturebake.decompress() makes of them.
+'''
+import json
+import optparse
+from os.path import abspath, dirname, join
+import sys
+import time
+
+import numpy
+
+# shared helpers live alongside the pyopengl tutorials
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'pyopengl'))
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import timing
+from OpenGL import GL as gl
+from pngio import read_png
+import pyglet
+
+from textures import Texture, TextureLoader, _specify, decode, read_image
+from texturebake import Baker, bake, decompress, supported
+
+
+DATA = join(dirname(abspath(__file__)), 'data')
+IMAGES = ['gl2-hello-0.png', 'gl2-hello-1.png']
+METHODS = ('pyglet', 'sync', 'threads', 'processes', 'baked')
+READERS = {'pyglet': read_image, 'pngio': read_png}
+FRAME = 0.01
+# drivers round the colours blocks interpolate between their own ways
+TOLERANCE = 1
+
+
+def load_sync(filenames, reader):
+    textures = []
+    for filename in filenames:
+        texture = Texture(filename, None)
+        pixels = decode(filename, reader)
+        _specify(texture.id, pixels.shape[1], pixels.shape[0], pixels)
+        textures.append(texture)
+    return textures
+
+
+def run(method, filenames, format, reader):
+    '''
+        returns seconds until ready, and done, frames drawn meanwhile, and
+        the textures
+    '''
+    start = timing.clock()
+    if method in ('pyglet', 'sync'):
+        textures = load_sync(
+            filenames, read_image if method == 'pyglet' else read_png)
+        ready = done = timing.clock() - start
+        return ready, done, 0, textures, None
+
+    loader = TextureLoader(processes=(method == 'processes'))
+    named = {'decode': Baker(format)} if method == 'baked' else {}
+    textures = [
+        loader.load(filename, reader, **named) for filename in filenames]
+    ready = timing.clock() - start
+    frames = 0
+    while loader.update():
+        frames += 1
+        gl.glFinish()
+        time.sleep(FRAME)
+    done = timing.clock() - start
+    return ready, done, frames, textures, loader
+
+
+def contents(texture):
+    gl.glBindTexture(gl.GL_TEXTURE_2D, texture.id)
+    gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 1)
+    data = gl.glGetTexImage(
+        gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE)
+    gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+    return numpy.frombuffer(data, dtype=numpy.uint8)
+
+
+def _within(pixels, expected, tolerance):
+    return numpy.abs(pixels.astype('i') - expected).max() <= tolerance
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-c', '--count', type='int', default=32,
+        help='textures to load, cycling through data/ [%default]')
+    parser.add_option('-m', '--methods', default=','.join(METHODS),
+        help='comma-separated methods to time [%default]')
+    parser.add_option('-f', '--format', default='rgba',
+        help='texturebake.py format for baked [%default]')
+    parser.add_option('-r', '--reader', default='pyglet',
+        choices=sorted(READERS),
+        help='decoder for threads, processes and baked: %s [%%default]'
+             % ', '.join(sorted(READERS)))
+    parser.add_option('--json', metavar='FILE',
+        help='also write the timings to FILE')
+    options, _ = parser.parse_args(argv)
+    # no hidden window of pyglet's own, so it decodes without a display
+    pyglet.options['shadow_window'] = False
+
+    filenames = [
+        join(DATA, IMAGES[i % len(IMAGES)]) for i in range(options.count)]
+    methods = options.methods.split(',')
+    # (pixels, bytes uploaded) of each image, decoded and baked
+    decoded = {}
+    for filename in set(filenames):
+        pixels = decode(filename)
+        decoded[filename] = (pixels.ravel(), pixels.nbytes)
+    context = headless.OffscreenContext(headless.DEFAULT_SIZE)
+    results = {}
+    try:
+        if 'baked' in methods:
+            if not supported(options.format):
+                parser.error('%s is not supported here' % options.format)
+            # once, ahead of timing, as the cache would be in use
+            start = timing.clock()
+            baked = {}
+            for filename in set(filenames):
+                image = bake(
+                    filename, options.format, reader=READERS[options.reader])
+                width, height, data = image.levels[0]
+                baked[filename] = (
+                    decompress(data, width, height, image.format).ravel(),
+                    image.nbytes)
+            print('baked or found in the cache in %.3fms' % (
+                (timing.clock() - start) * 1000.0))
+        for method in methods:
+            ready, done, frames, textures, loader = run(
+                method, filenames, options.format, READERS[options.reader])
+            expected = baked if method == 'baked' else decoded
+            tolerance = TOLERANCE if method == 'baked' else 0
+            same = all(
+                _within(contents(texture), expected[texture.filename][0],
+                        tolerance)
+                for texture in textures)
+            uploaded = sum(
+                expected[texture.filename][1] for texture in textures)
+            gl.glDeleteTextures(len(textures), [t.id for t in textures])
+            if loader is not None:
+                loader.close()
+            results[method] = {
+                'ready_ms': ready * 1000.0, 'done_ms': done * 1000.0,
+                'frames': frames, 'bytes': uploaded,
+            }
+            print('%-10s ready %9.3fms  done %9.3fms  %4d frames meanwhile'
+                  '  %6.2fMB  %s'
+                  % (method, ready * 1000.0, done * 1000.0, frames,
+                     uploaded / 1e6, 'same' if same else 'DIFFERENT'))
+    finally:
+        context.destroy()
+
+    if options.json:
+        with open(options.json, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+'''
+Fills OpenGL buffers straight from memory that already holds the data.
+
+Packing a list into a ctypes array, (GLfloat * len(data))(*data), makes a
+Python float per value on the way, which is fine for a quad but takes
+seconds for a million-vertex mesh.  Numpy arrays, memoryviews, bytes,
+array.array, ctypes arrays and anything else with the buffer protocol are
+passed to glBufferData by pointer instead, without a copy (unless they're
+strided, when they're made contiguous first).  Lists are still accepted,
+converted by numpy in one go.
+'''
+from ctypes import c_void_p
+
+import numpy
+from OpenGL import GL as gl
+
+
+def as_contiguous(data, element_type=None):
+    '''
+        data: anything with the buffer protocol, or a sequence of values
+        element_type: ctypes type of the values, eg. gl.GLfloat.  Needed
+            for sequences, ignored for buffers, which know their own
+        returns data as a contiguous numpy array, sharing its memory
+            where it can
+    '''
+    if not isinstance(data, numpy.ndarray):
+        try:
+            data = numpy.asarray(memoryview(data))
+        except TypeError:
+            if element_type is None:
+                raise TypeError('element_type is needed for a sequence')
+            data = numpy.array(data, dtype=numpy.dtype(element_type))
+    return numpy.ascontiguousarray(data)
+
+
+def buffer_data(target, data, element_type=None, usage=gl.GL_STATIC_DRAW):
+    '''
+        target: buffer type, eg.
+            GL_ARRAY_BUFFER (vertices), GL_ELEMENT_ARRAY_BUFFER (indices)
+        data, element_type: as for as_contiguous
+        fills the buffer bound to target, returning the array it read
+    '''
+    array = as_contiguous(data, element_type)
+    gl.glBufferData(target, array.nbytes, c_void_p(array.ctypes.data), usage)
+    return array
@@ -0,0 +1,21 @@
+#version 110
+#extension GL_EXT_texture_array : require
+
+uniform float fade_factor;
+// both images, one a layer, bound once, see atlas.py
+uniform sampler2DArray textures;
+// each layer's (u offset, v offset, u scale, v scale)
+uniform vec4 regions[2];
+
+varying vec2 texcoord;
+
+void main()
+{
+    gl_FragColor = mix(
+        texture2DArray(textures,
+            vec3(regions[0].xy + texcoord * regions[0].zw, 0.0)),
+        texture2DArray(textures,
+            vec3(regions[1].xy + texcoord * regions[1].zw, 1.0)),
+        fade_factor
+    );
+}
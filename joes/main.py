@@ -1,13 +1,35 @@
 
-from ctypes import sizeof
-from os.path import join
+from ctypes import c_void_p, sizeof
+from os.path import abspath, dirname, join
 import sys
 
-from OpenGL.GL.shaders import compileShader, compileProgram
+import numpy
 from OpenGL import GL as gl
 
 import pyglet
 
+# shared helpers live alongside the pyopengl tutorials
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'pyopengl'))
+# caches linked programs on disk, see shadercache.py
+from shadercache import compileShader, compileProgram
+# picks the smallest index type for the vertices, see indexformat.py
+from indexformat import smallest
+# passes arrays to glBufferData without unpacking them, see buffers.py
+from buffers import buffer_data
+# decodes textures off the GL thread, uploading them as they're ready
+from textures import TextureLoader
+# bakes them once into cached, mipmapped, compressed textures
+from texturebake import Baker, supported
+# combines them into one texture array, bound once a frame
+from atlas import ArrayDecoder, supported_arrays
+# skips binding what's already bound from the last frame, see glstate.py
+from glstate import GLState
+
+
+# the hello images are baked uncompressed, with mipmaps.  'bc1' or 'bc3'
+# (where supported) take an eighth or a quarter of the memory, but bc1
+# keeps 5:6:5 bit colour and 1 bit alpha, and bc3 loses colour too
+TEXTURE_FORMAT = 'rgba'
 
 
 vertex_data = [
@@ -32,6 +54,8 @@ class Uniforms(object):
     def __init__(self):
         self.fade_factor = None
         self.textures = None
+        self.texture_array = None
+        self.regions = None
 
     def make(self, shader):
         self.fade_factor = gl.glGetUniformLocation(shader, 'fade_factor')
@@ -39,13 +63,20 @@ class Uniforms(object):
             gl.glGetUniformLocation(shader, 'textures[0]'),
             gl.glGetUniformLocation(shader, 'textures[1]'),
         ]
+        self.texture_array = gl.glGetUniformLocation(shader, 'textures')
+        self.regions = gl.glGetUniformLocation(shader, 'regions')
 
 
 class Resources(object):
     def __init__(self):
         self.vertex_buffer = None
         self.element_buffer = None
+        self.element_type = None
         self.textures = None
+        self.texture_array = None
+        self.loader = None
+        self.baker = None
+        self.state = GLState()
         self.vertex_shader = None
         self.fragment_shader = None
         self.shader_program = None
@@ -53,37 +84,52 @@ class Resources(object):
         self.uniforms = Uniforms()
 
 
-    def make_buffer(self, target, data, element_type):
+    def make_buffer(self, target, data, element_type=None):
         '''
             target: buffer type, eg.
                 GL_ARRAY_BUFFER (vertices), GL_ELEMENT_ARRAY_BUFFER (indices)
-            data: list of values
+            data: numpy array, memoryview or other buffer, copied straight
+                from its memory, or a list of element_type values
         '''
         buffer_id = gl.glGenBuffers(1)
         gl.glBindBuffer(target, buffer_id)
-        size = len(data) * sizeof(element_type)
-        array_type = (element_type * len(data))
-        gl.glBufferData(target, size, array_type(*data), gl.GL_STATIC_DRAW)
+        buffer_data(target, data, element_type)
         return buffer_id
 
 
     def make_texture(self, filename):
-        return pyglet.image.load(filename).get_texture().id
+        # a placeholder until the loader's update() uploads the image
+        return self.loader.load(filename, decode=self.baker).id
 
 
     def make(self):
         self.vertex_buffer = self.make_buffer(
             gl.GL_ARRAY_BUFFER, vertex_data, gl.GLfloat)
+        index_dtype, self.element_type = smallest(max(element_data) + 1)
         self.element_buffer = self.make_buffer(
-            gl.GL_ELEMENT_ARRAY_BUFFER, element_data, gl.GLushort) 
-
-        self.textures = [
-            self.make_texture(join('data', 'gl2-hello-0.png')),
-            self.make_texture(join('data', 'gl2-hello-1.png')),
+            gl.GL_ELEMENT_ARRAY_BUFFER,
+            numpy.array(element_data, dtype=index_dtype))
+
+        self.loader = TextureLoader()
+        self.baker = Baker(
+            TEXTURE_FORMAT if supported(TEXTURE_FORMAT) else 'rgba')
+        filenames = [
+            join('data', 'gl2-hello-0.png'),
+            join('data', 'gl2-hello-1.png'),
         ]
+        if supported_arrays():
+            # both as layers of one texture, its regions set once ready
+            self.texture_array = self.loader.load(
+                filenames, decode=ArrayDecoder(self.baker),
+                target=gl.GL_TEXTURE_2D_ARRAY)
+            fragment_filename = 'hello-gl-array.f.glsl'
+        else:
+            self.textures = [
+                self.make_texture(filename) for filename in filenames]
+            fragment_filename = 'hello-gl.f.glsl'
 
         self.shader_program = make_shader_program(
-            'hello-gl.v.glsl', 'hello-gl.f.glsl')
+            'hello-gl.v.glsl', fragment_filename)
 
         self.uniforms.make(self.shader_program)
         self.attributes.make(self.shader_program)
@@ -111,23 +157,35 @@ def make_shader_program(vertex_filename, fragment_filename):
 
 
 def render(window, resources):
+    state = resources.state
+    pending = len(resources.loader.pending)
+    if resources.loader.update() != pending:
+        # uploading bound textures and buffers behind the state's back
+        state.invalidate()
+
     gl.glClearColor(0.6, 0.5, 0.7, 1.0)
     window.clear()
 
-    gl.glUseProgram(resources.shader_program)
+    state.use_program(resources.shader_program)
 
     gl.glUniform1f(resources.uniforms.fade_factor, 0.5)
 
-    gl.glActiveTexture(gl.GL_TEXTURE0)
-    gl.glBindTexture(gl.GL_TEXTURE_2D, resources.textures[0])
-    gl.glUniform1i(resources.uniforms.textures[0], 0)
-
-    gl.glActiveTexture(gl.GL_TEXTURE1)
-    gl.glBindTexture(gl.GL_TEXTURE_2D, resources.textures[1])
-    gl.glUniform1i(resources.uniforms.textures[1], 1)
-
-    gl.glBindBuffer(gl.GL_ARRAY_BUFFER, resources.vertex_buffer)
-    gl.glEnableVertexAttribArray(resources.attributes.position)
+    if resources.texture_array is not None:
+        state.bind_texture(
+            0, gl.GL_TEXTURE_2D_ARRAY, resources.texture_array.id)
+        gl.glUniform1i(resources.uniforms.texture_array, 0)
+        regions = resources.texture_array.regions
+        if regions is not None:
+            gl.glUniform4fv(resources.uniforms.regions, len(regions), regions)
+    else:
+        state.bind_texture(0, gl.GL_TEXTURE_2D, resources.textures[0])
+        gl.glUniform1i(resources.uniforms.textures[0], 0)
+
+        state.bind_texture(1, gl.GL_TEXTURE_2D, resources.textures[1])
+        gl.glUniform1i(resources.uniforms.textures[1], 1)
+
+    state.bind_buffer(gl.GL_ARRAY_BUFFER, resources.vertex_buffer)
+    state.enable_attributes([resources.attributes.position])
     gl.glVertexAttribPointer(
         resources.attributes.position,
         2,              # size (position has 2 components?)
@@ -145,17 +203,16 @@ def render(window, resources):
     #gl.glVertex(300.0 * scale, +100.0 * scale)
     #gl.glEnd()
 
-    gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, resources.element_buffer)
+    state.bind_buffer(gl.GL_ELEMENT_ARRAY_BUFFER, resources.element_buffer)
 
     gl.glDrawElements(
         gl.GL_TRIANGLE_STRIP,   # mode
         len(element_data),      # element count
-        gl.GL_UNSIGNED_SHORT,   # type TODO, may not be bytes in future
-        0                       # element array buffer offset
+        resources.element_type, # type, the smallest to fit the indices
+        c_void_p(0),            # element array buffer offset
     )
 
-    gl.glDisableVertexAttribArray(resources.attributes.position)
-
+    # left bound for the next frame, which binds the same again
     window.invalid = False
     return pyglet.event.EVENT_HANDLED
 
@@ -170,8 +227,8 @@ def main():
         vsync=False,
         visible=False,
     )
+    resources = Resources()
     try:
-        resources = Resources()
         resources.make()
 
         pyglet.clock.schedule(lambda dt: update(window, dt))
@@ -181,6 +238,8 @@ def main():
         pyglet.app.run()
 
     finally:
+        if resources.loader is not None:
+            resources.loader.close()
         window.close()
 
 
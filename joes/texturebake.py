@@ -0,0 +1,596 @@
+'''
+Bakes images into textures ready for the GPU: a full chain of mipmaps,
+optionally block compressed, in a KTX file cached on disk, so later runs
+load them without decoding or filtering anything.
+
+    python texturebake.py data/*.png                # bake into cache/
+    python texturebake.py --format bc1 --filter kaiser data/*.png
+    python texturebake.py cache/gl2-hello-0.*.ktx   # describe one
+
+    baked = bake(join('data', 'gl2-hello-0.png'), 'bc1')
+    baked.specify(texture_id)
+
+or, to bake on textures.TextureLoader's pool:
+
+    loader.load(filename, decode=Baker('bc1'))
+
+FORMATS:
+
+    'rgba'  8 bit RGBA, as before, plus mipmaps
+    'bc1'   S3TC DXT1: 4x4 texels of RGB in 8 bytes, an eighth of 'rgba'
+    'bc3'   S3TC DXT5: 4x4 texels of RGBA in 16 bytes, a quarter
+
+Each level is half the last in each direction, rounding down as GL does,
+to 1x1, resampled from the one before in linear light (undoing a gamma of
+2.2 first) with a box filter or a sharper Kaiser windowed sinc.  The
+block encoder fits each block's endpoints along the principal axis of its
+colours, all blocks at once in numpy: quicker than good, but a few
+seconds a megapixel in place of minutes.  ETC2 isn't offered, as desktop
+GL drivers decompress it in software before upload, saving nothing.
+
+Files are KTX 1.1 (https://registry.khronos.org/KTX/specs/1.0/), bottom
+row first like glTexImage2D, and readable by other KTX tools.  Each
+records its source's size, mtime and SHA-1: a source with the same size
+and mtime is taken as unchanged without reading it, one merely touched is
+recognised by its hash, and anything else is baked again.
+'''
+import ctypes
+import hashlib
+import optparse
+import os
+from os.path import abspath, basename, dirname, exists, join, splitext
+import sys
+import tempfile
+
+import numpy
+
+from OpenGL import GL as gl
+from OpenGL.GL.EXT.texture_compression_s3tc import (
+    GL_COMPRESSED_RGB_S3TC_DXT1_EXT, GL_COMPRESSED_RGBA_S3TC_DXT5_EXT,
+    glInitTextureCompressionS3TcEXT,
+)
+# the unwrapped call, which takes an offset into a pixel unpack buffer
+# as readily as an array, with the size given
+from OpenGL.raw.GL.VERSION.GL_1_3 import glCompressedTexImage2D
+
+# shared helpers live alongside the pyopengl tutorials
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'pyopengl'))
+# decodes 8 bit RGB(A) PNGs with numpy alone, see pngio.py
+from pngio import read_png
+
+
+CACHE = join(dirname(abspath(__file__)), 'cache')
+# part of each cache file's name: change it to rebake everything
+VERSION = 1
+IDENTIFIER = b'\xabKTX 11\xbb\r\n\x1a\n'
+ENDIANNESS = 0x04030201
+HEADER = numpy.dtype([
+    ('identifier', 'S12'),
+    ('endianness', '<u4'),
+    ('gl_type', '<u4'),
+    ('gl_type_size', '<u4'),
+    ('gl_format', '<u4'),
+    ('gl_internal_format', '<u4'),
+    ('gl_base_internal_format', '<u4'),
+    ('width', '<u4'),
+    ('height', '<u4'),
+    ('depth', '<u4'),
+    ('array_elements', '<u4'),
+    ('faces', '<u4'),
+    ('levels', '<u4'),
+    ('key_value_bytes', '<u4'),
+])
+# name: (internal format, base format, bytes per 4x4 block, or 0 if
+# uncompressed)
+FORMATS = {
+    'rgba': (gl.GL_RGBA8, gl.GL_RGBA, 0),
+    'bc1': (GL_COMPRESSED_RGB_S3TC_DXT1_EXT, gl.GL_RGB, 8),
+    'bc3': (GL_COMPRESSED_RGBA_S3TC_DXT5_EXT, gl.GL_RGBA, 16),
+}
+FILTERS = ('box', 'kaiser')
+GAMMA = 2.2
+# Kaiser filter's half width, in output texels, and window shape
+KAISER_RADIUS = 3.0
+KAISER_BETA = 4.0
+# three colour mode is never used: blocks are always opaque
+BC1_BLOCK = numpy.dtype([('colour0', '<u2'), ('colour1', '<u2'),
+                         ('indices', '<u4')])
+BC3_BLOCK = numpy.dtype([('alpha0', 'u1'), ('alpha1', 'u1'),
+                         ('alpha_indices', 'u1', (6,)),
+                         ('colour', BC1_BLOCK)])
+
+
+def supported(format):
+    '''
+        whether the current GL context can sample textures in format
+    '''
+    return FORMATS[format][2] == 0 or bool(glInitTextureCompressionS3TcEXT())
+
+
+def _weights(size, filter):
+    '''
+        (size // 2, size) matrix resampling a row of size texels to the
+        next level's, clamping at the edges
+    '''
+    result = size // 2 or 1
+    scale = size / float(result)
+    centres = (numpy.arange(result) + 0.5) * scale
+    if filter == 'box':
+        # the share of each source texel inside each output's footprint
+        edges = numpy.arange(size + 1)
+        low = numpy.maximum(edges[None, :-1], centres[:, None] - scale / 2)
+        high = numpy.minimum(edges[None, 1:], centres[:, None] + scale / 2)
+        weights = numpy.maximum(high - low, 0.0)
+    else:
+        reach = int(numpy.ceil(KAISER_RADIUS * scale))
+        sources = numpy.arange(-reach, size + reach)
+        distance = ((sources + 0.5)[None, :] - centres[:, None]) / scale
+        inside = numpy.abs(distance) < KAISER_RADIUS
+        window = numpy.i0(KAISER_BETA * numpy.sqrt(numpy.maximum(
+            1.0 - (distance / KAISER_RADIUS) ** 2, 0.0)))
+        taps = numpy.where(
+            inside, numpy.sinc(distance) * window / numpy.i0(KAISER_BETA), 0)
+        weights = numpy.zeros((result, size))
+        for column, source in enumerate(numpy.clip(sources, 0, size - 1)):
+            weights[:, source] += taps[:, column]
+    return weights / weights.sum(axis=1)[:, None]
+
+
+def mipmaps(pixels, filter='box'):
+    '''
+        [(height, width, 4) uint8 pixels] of every level, from pixels down
+        to 1x1
+    '''
+    if filter not in FILTERS:
+        raise ValueError('filter should be one of %s' % ', '.join(FILTERS))
+    levels = [pixels]
+    linear = pixels / 255.0
+    linear[..., :3] **= GAMMA
+    while linear.shape[0] > 1 or linear.shape[1] > 1:
+        height, width = linear.shape[:2]
+        if height > 1:
+            linear = numpy.tensordot(
+                _weights(height, filter), linear, axes=(1, 0))
+        if width > 1:
+            linear = numpy.tensordot(
+                _weights(width, filter), linear, axes=(1, 1)).swapaxes(0, 1)
+        linear = numpy.clip(linear, 0.0, 1.0)
+        level = linear.copy()
+        level[..., :3] **= 1.0 / GAMMA
+        levels.append(numpy.round(level * 255.0).astype(numpy.uint8))
+    return levels
+
+
+def _blocks(pixels):
+    '''
+        (N, 16, 4) float texels of each 4x4 block, by rows of blocks, the
+        edge texels repeated to fill blocks overhanging the image
+    '''
+    height, width = pixels.shape[:2]
+    rows, columns = -(-height // 4), -(-width // 4)
+    padded = numpy.pad(
+        pixels, ((0, rows * 4 - height), (0, columns * 4 - width), (0, 0)),
+        mode='edge')
+    return padded.reshape(rows, 4, columns, 4, 4).swapaxes(1, 2).reshape(
+        -1, 16, 4).astype(numpy.float64)
+
+
+def _to_565(colours):
+    top = numpy.array([31, 63, 31])
+    scaled = numpy.clip(numpy.round(colours * top / 255.0), 0, top)
+    scaled = scaled.astype(numpy.uint16)
+    return (scaled[:, 0] << 11) | (scaled[:, 1] << 5) | scaled[:, 2]
+
+
+def _from_565(values):
+    values = values.astype(numpy.uint32)
+    red, green, blue = (values >> 11) & 31, (values >> 5) & 63, values & 31
+    return numpy.column_stack([
+        (red << 3) | (red >> 2), (green << 2) | (green >> 4),
+        (blue << 3) | (blue >> 2)]).astype(numpy.float64)
+
+
+def _pack(indices, bits):
+    '''
+        each row of indices in one integer, the first in the lowest bits
+    '''
+    shifts = numpy.arange(indices.shape[1], dtype=numpy.uint64) * bits
+    return numpy.bitwise_or.reduce(
+        indices.astype(numpy.uint64) << shifts, axis=1)
+
+
+def _encode_colour(colours):
+    '''
+        BC1_BLOCK array of (N, 16, 3) colours
+    '''
+    mean = colours.mean(axis=1)
+    centred = colours - mean[:, None]
+    covariance = numpy.einsum('nki,nkj->nij', centred, centred)
+    # power iteration for each block's principal axis
+    axis = numpy.ones_like(mean)
+    for _ in range(8):
+        axis = numpy.einsum('nij,nj->ni', covariance, axis)
+        axis /= numpy.maximum(numpy.abs(axis).max(axis=1), 1e-9)[:, None]
+    axis /= numpy.maximum(numpy.sqrt((axis ** 2).sum(axis=1)), 1e-9)[:, None]
+    along = numpy.einsum('nki,ni->nk', centred, axis)
+    high = _to_565(mean + axis * along.max(axis=1)[:, None])
+    low = _to_565(mean + axis * along.min(axis=1)[:, None])
+    # four colour mode needs colour0 above colour1
+    colour0, colour1 = numpy.maximum(high, low), numpy.minimum(high, low)
+
+    end0, end1 = _from_565(colour0), _from_565(colour1)
+    palette = numpy.stack([
+        end0, end1, (2 * end0 + end1) / 3.0, (end0 + 2 * end1) / 3.0],
+        axis=1)
+    distance = ((colours[:, :, None] - palette[:, None]) ** 2).sum(axis=3)
+    indices = distance.argmin(axis=2)
+    indices[colour0 == colour1] = 0
+
+    blocks = numpy.zeros(len(colours), BC1_BLOCK)
+    blocks['colour0'] = colour0
+    blocks['colour1'] = colour1
+    blocks['indices'] = _pack(indices, 2)
+    return blocks
+
+
+def _encode_alpha(alphas):
+    '''
+        (alpha0, alpha1, (N, 6) index bytes) of BC3's alpha blocks
+    '''
+    alpha0 = alphas.max(axis=1).round()
+    alpha1 = alphas.min(axis=1).round()
+    steps = numpy.arange(1, 7) / 7.0
+    palette = numpy.column_stack([alpha0, alpha1] + [
+        alpha0 * (1 - step) + alpha1 * step for step in steps])
+    indices = numpy.abs(alphas[:, :, None] - palette[:, None]).argmin(axis=2)
+    indices[alpha0 == alpha1] = 0
+    packed = _pack(indices, 3)
+    shifts = numpy.arange(6, dtype=numpy.uint64) * 8
+    return alpha0, alpha1, (packed[:, None] >> shifts) & 0xff
+
+
+def compress(pixels, format):
+    '''
+        (height, width, 4) uint8 pixels as a uint8 array of format's
+        blocks
+    '''
+    texels = _blocks(pixels)
+    colour = _encode_colour(texels[..., :3])
+    if format == 'bc1':
+        return colour.view(numpy.uint8)
+    blocks = numpy.zeros(len(texels), BC3_BLOCK)
+    blocks['alpha0'], blocks['alpha1'], blocks['alpha_indices'] = (
+        _encode_alpha(texels[..., 3]))
+    blocks['colour'] = colour
+    return blocks.view(numpy.uint8)
+
+
+def _unpack(packed, count, bits):
+    shifts = numpy.arange(count, dtype=numpy.uint64) * bits
+    return (packed.astype(numpy.uint64)[:, None] >> shifts) & (2 ** bits - 1)
+
+
+def decompress(data, width, height, format):
+    '''
+        (height, width, 4) uint8 pixels of format's blocks, as GL decodes
+        them, to measure what compression lost
+    '''
+    if format == 'rgba':
+        return numpy.frombuffer(data, numpy.uint8).reshape(height, width, 4)
+    blocks = numpy.frombuffer(
+        data, BC1_BLOCK if format == 'bc1' else BC3_BLOCK)
+    colour = blocks if format == 'bc1' else blocks['colour']
+    end0, end1 = _from_565(colour['colour0']), _from_565(colour['colour1'])
+    four = (colour['colour0'] > colour['colour1'])[:, None]
+    palette = numpy.stack([
+        end0, end1,
+        numpy.where(four, (2 * end0 + end1) / 3.0, (end0 + end1) / 2.0),
+        numpy.where(four, (end0 + 2 * end1) / 3.0, 0.0)], axis=1)
+    indices = _unpack(colour['indices'], 16, 2).astype(numpy.intp)
+    texels = numpy.empty((len(blocks), 16, 4))
+    texels[..., :3] = numpy.take_along_axis(
+        palette, indices[:, :, None], axis=1)
+    if format == 'bc1':
+        texels[..., 3] = numpy.where(four | (indices != 3), 255.0, 0.0)
+    else:
+        alpha0 = blocks['alpha0'].astype(numpy.float64)
+        alpha1 = blocks['alpha1'].astype(numpy.float64)
+        eight = (alpha0 > alpha1)[:, None]
+        steps = numpy.arange(1, 7)
+        palette = numpy.column_stack([alpha0, alpha1] + [
+            numpy.where(
+                eight[:, 0],
+                (alpha0 * (7 - step) + alpha1 * step) / 7.0,
+                (alpha0 * (5 - step) + alpha1 * step) / 5.0
+                if step < 5 else (0.0 if step == 5 else 255.0))
+            for step in steps])
+        packed = numpy.zeros(len(blocks), numpy.uint64)
+        for byte in range(6):
+            packed |= blocks['alpha_indices'][:, byte].astype(
+                numpy.uint64) << numpy.uint64(8 * byte)
+        indices = _unpack(packed, 16, 3).astype(numpy.intp)
+        texels[..., 3] = numpy.take_along_axis(palette, indices, axis=1)
+    rows, columns = -(-height // 4), -(-width // 4)
+    pixels = texels.reshape(rows, columns, 4, 4, 4).swapaxes(1, 2).reshape(
+        rows * 4, columns * 4, 4)
+    return numpy.round(pixels[:height, :width]).astype(numpy.uint8)
+
+
+class Baked(object):
+    '''
+        levels: [(width, height, uint8 array)] from the largest to 1x1
+        format: one of FORMATS
+        metadata: {key: value} strings, stored in the file
+    '''
+    def __init__(self, levels, format, metadata=None):
+        self.levels = levels
+        self.format = format
+        self.metadata = metadata or {}
+
+    @classmethod
+    def from_pixels(cls, pixels):
+        '''
+            a single 'rgba' level, of (height, width, 4) uint8 pixels
+        '''
+        height, width = pixels.shape[:2]
+        return cls([(width, height, numpy.ascontiguousarray(pixels))], 'rgba')
+
+    @property
+    def size(self):
+        return self.levels[0][:2]
+
+    @property
+    def nbytes(self):
+        return sum(data.nbytes for _, _, data in self.levels)
+
+    def specify(self, texture_id, offsets=None):
+        '''
+            give the texture every level, from the arrays, or if offsets
+            are given from those offsets in the bound pixel unpack buffer
+        '''
+        internal_format, _, block_bytes = FORMATS[self.format]
+        gl.glBindTexture(gl.GL_TEXTURE_2D, texture_id)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        try:
+            for level, (width, height, data) in enumerate(self.levels):
+                size = data.nbytes
+                if offsets is not None:
+                    data = ctypes.c_void_p(offsets[level])
+                elif block_bytes:
+                    data = ctypes.c_void_p(data.ctypes.data)
+                if block_bytes:
+                    glCompressedTexImage2D(
+                        gl.GL_TEXTURE_2D, level, internal_format, width,
+                        height, 0, size, data)
+                else:
+                    gl.glTexImage2D(
+                        gl.GL_TEXTURE_2D, level, internal_format, width,
+                        height, 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, data)
+            gl.glTexParameteri(
+                gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAX_LEVEL,
+                len(self.levels) - 1)
+            if len(self.levels) > 1:
+                gl.glTexParameteri(
+                    gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER,
+                    gl.GL_LINEAR_MIPMAP_LINEAR)
+        finally:
+            gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+            gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+
+def _padding(size):
+    return b'\0' * (-size % 4)
+
+
+def save_ktx(path, baked):
+    internal_format, base_format, block_bytes = FORMATS[baked.format]
+    header = numpy.zeros((), HEADER)
+    header['identifier'] = IDENTIFIER
+    header['endianness'] = ENDIANNESS
+    header['gl_type'] = 0 if block_bytes else gl.GL_UNSIGNED_BYTE
+    header['gl_type_size'] = 1
+    header['gl_format'] = 0 if block_bytes else gl.GL_RGBA
+    header['gl_internal_format'] = internal_format
+    header['gl_base_internal_format'] = base_format
+    header['width'], header['height'] = baked.size
+    header['faces'] = 1
+    header['levels'] = len(baked.levels)
+
+    metadata = b''
+    for key, value in sorted(baked.metadata.items()):
+        pair = key.encode('utf-8') + b'\0' + value.encode('utf-8') + b'\0'
+        metadata += numpy.array(len(pair), '<u4').tobytes() + pair
+        metadata += _padding(len(pair))
+    header['key_value_bytes'] = len(metadata)
+
+    with open(path, 'wb') as output:
+        output.write(header.tobytes())
+        output.write(metadata)
+        for _, _, data in baked.levels:
+            output.write(numpy.array(data.nbytes, '<u4').tobytes())
+            output.write(data.tobytes())
+            output.write(_padding(data.nbytes))
+
+
+def read_ktx(path):
+    '''
+        the Baked in a KTX file of one of FORMATS
+    '''
+    with open(path, 'rb') as source:
+        contents = source.read()
+    if len(contents) < HEADER.itemsize or not contents.startswith(
+            IDENTIFIER):
+        raise ValueError('%s is not a KTX file' % path)
+    header = numpy.frombuffer(contents, HEADER, 1)[0]
+    if header['endianness'] != ENDIANNESS:
+        raise ValueError('%s is big-endian' % path)
+    formats = [
+        name for name, (internal_format, _, _) in FORMATS.items()
+        if internal_format == header['gl_internal_format']]
+    if not formats or header['depth'] or header['array_elements'] or (
+            header['faces'] != 1):
+        raise ValueError('%s is not a 2D texture this can read' % path)
+
+    offset = HEADER.itemsize
+    end = offset + int(header['key_value_bytes'])
+    metadata = {}
+    while offset < end:
+        size = int(numpy.frombuffer(contents, '<u4', 1, offset)[0])
+        pair = contents[offset + 4:offset + 4 + size].rstrip(b'\0')
+        key, _, value = pair.partition(b'\0')
+        metadata[key.decode('utf-8')] = value.decode('utf-8')
+        offset += 4 + size + (-size % 4)
+
+    levels = []
+    width, height = int(header['width']), int(header['height'])
+    for level in range(max(int(header['levels']), 1)):
+        size = int(numpy.frombuffer(contents, '<u4', 1, end)[0])
+        levels.append((width, height, numpy.frombuffer(
+            contents, numpy.uint8, size, end + 4)))
+        end += 4 + size + (-size % 4)
+        width, height = max(width // 2, 1), max(height // 2, 1)
+    return Baked(levels, formats[0], metadata)
+
+
+def bake_pixels(pixels, format='rgba', filter='box'):
+    '''
+        a Baked of (height, width, 4) uint8 pixels, bottom row first
+    '''
+    if format not in FORMATS:
+        raise ValueError('format should be one of %s' % ', '.join(
+            sorted(FORMATS)))
+    levels = []
+    for level in mipmaps(pixels, filter):
+        height, width = level.shape[:2]
+        if format != 'rgba':
+            level = compress(level, format)
+        levels.append((width, height, level.ravel()))
+    return Baked(levels, format)
+
+
+def _digest(path):
+    with open(path, 'rb') as source:
+        return hashlib.sha1(source.read()).hexdigest()
+
+
+def cache_path(path, format='rgba', filter='box', cache=CACHE):
+    '''
+        where path baked in format with filter is cached
+    '''
+    key = hashlib.sha1(abspath(path).encode('utf-8')).hexdigest()[:12]
+    return join(cache, '%s.%s-%s-%d-%s.ktx' % (
+        splitext(basename(path))[0], format, filter, VERSION, key))
+
+
+def _write(path, baked):
+    # through a temporary file, so other processes never read half a file
+    handle, temporary = tempfile.mkstemp(dir=dirname(path), suffix='.tmp')
+    os.close(handle)
+    try:
+        save_ktx(temporary, baked)
+        if exists(path):
+            os.remove(path)
+        os.rename(temporary, path)
+    except (IOError, OSError):
+        if exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def bake(path, format='rgba', filter='box', cache=CACHE, reader=read_png):
+    '''
+        a Baked of the image at path, from the cache if it's been baked
+        since it last changed, else baked and cached.  With no cache, baked
+        every time.
+    '''
+    if cache is None:
+        return bake_pixels(reader(path)[::-1], format, filter)
+    stat = os.stat(path)
+    source = {'source-size': str(stat.st_size),
+              'source-mtime': repr(stat.st_mtime)}
+    cached = cache_path(path, format, filter, cache)
+    digest = None
+    try:
+        baked = read_ktx(cached)
+    except (IOError, OSError, ValueError):
+        baked = None
+    if baked is not None:
+        metadata = baked.metadata
+        if all(metadata.get(key) == value for key, value in source.items()):
+            return baked
+        digest = _digest(path)
+        if metadata.get('source-sha1') == digest:
+            return baked
+
+    baked = bake_pixels(reader(path)[::-1], format, filter)
+    baked.metadata.update(source)
+    baked.metadata['source-sha1'] = digest or _digest(path)
+    baked.metadata['KTXorientation'] = 'S=r,T=u'
+    if not exists(cache):
+        try:
+            os.makedirs(cache)
+        except OSError:
+            # made meanwhile by another worker
+            if not exists(cache):
+                raise
+    _write(cached, baked)
+    return baked
+
+
+class Baker(object):
+    '''
+        bake() as a textures.TextureLoader decode, for load()
+    '''
+    def __init__(self, format='rgba', filter='box', cache=CACHE):
+        self.format = format
+        self.filter = filter
+        self.cache = cache
+
+    def __call__(self, filename, reader=read_png):
+        return bake(filename, self.format, self.filter, self.cache, reader)
+
+
+def describe(path, baked, source=None):
+    print('%s: %s %dx%d, %d levels, %d bytes' % (
+        path, baked.format, baked.size[0], baked.size[1],
+        len(baked.levels), baked.nbytes))
+    if source is not None:
+        width, height, data = baked.levels[0]
+        pixels = decompress(data, width, height, baked.format)
+        error = (pixels.astype('f8') - source) ** 2
+        channels = 4 if FORMATS[baked.format][1] == gl.GL_RGBA else 3
+        mean = error[..., :channels].mean()
+        print('    %.1f%% of rgba without mipmaps, PSNR %s' % (
+            baked.nbytes * 100.0 / source.size,
+            '%.1fdB' % (10 * numpy.log10(255.0 ** 2 / mean)) if mean
+            else 'infinite'))
+
+
+def main(argv=None):
+    parser = optparse.OptionParser(
+        usage='%prog [options] IMAGE.png...\n'
+              '       %prog TEXTURE.ktx...')
+    parser.add_option('-f', '--format', default='rgba',
+        help='one of %s [%%default]' % ', '.join(sorted(FORMATS)))
+    parser.add_option('--filter', default='box',
+        help='mipmap filter, one of %s [%%default]' % ', '.join(FILTERS))
+    parser.add_option('-c', '--cache', default=CACHE,
+        help='directory to bake into [%default]')
+    options, paths = parser.parse_args(argv)
+    if not paths:
+        parser.error('name images to bake, or KTX files to describe')
+    try:
+        for path in paths:
+            if path.lower().endswith('.ktx'):
+                describe(path, read_ktx(path))
+                continue
+            baked = bake(path, options.format, options.filter, options.cache)
+            describe(cache_path(path, options.format, options.filter,
+                                options.cache),
+                     baked, read_png(path)[::-1])
+    except ValueError as err:
+        parser.error(str(err))
+
+
+if __name__ == '__main__':
+    main()
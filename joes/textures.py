@@ -0,0 +1,228 @@
+'''
+Loads textures without holding up the first frame.
+
+    loader = TextureLoader()
+    texture = loader.load(join('data', 'gl2-hello-0.png'))
+    gl.glBindTexture(gl.GL_TEXTURE_2D, texture.id)   # usable at once
+    ...
+    loader.update()     # once a frame, on the GL thread
+
+load() returns straight away with a texture holding a one pixel grey
+placeholder, and decodes the image on a pool of threads (or processes,
+for decoders that hold the GIL), with pyglet's decoders as main.py used
+to, or pngio's where pyglet can't be imported.  update() takes the
+decoded images, copies each into a pixel buffer object and specifies the
+texture from that, so the driver copies it to the GPU while the frame
+carries on, and the same texture name then shows the image.  Uploads
+are limited to budget bytes a frame, so a burst of finished images
+doesn't stall one frame.
+
+To load mipmapped, compressed textures baked once and cached, decode
+with texturebake.py instead:
+
+    texture = loader.load(filename, decode=Baker('bc1'))
+
+or to combine many into an atlas or texture array, with atlas.py.
+'''
+import ctypes
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+import sys
+
+import numpy
+from OpenGL import GL as gl
+
+# decodes 8 bit RGB(A) PNGs with numpy alone, see pngio.py, where pyglet
+# isn't to be had
+from pngio import read_png
+# mipmapped, block compressed textures, see texturebake.py
+from texturebake import Baked
+
+
+PLACEHOLDER = (128, 128, 128, 255)
+# bytes uploaded per update(), at least one image a call whatever its size
+DEFAULT_BUDGET = 8 * 1024 * 1024
+
+
+def read_image(filename):
+    '''
+        returns the image's (height, width, 4) uint8 pixels, top row first
+        as pngio.read_png() does, decoded by pyglet, on any thread: only
+        making a texture of it needs pyglet's GL context
+    '''
+    try:
+        import pyglet.image
+    except ImportError:
+        return read_png(filename)
+    image = pyglet.image.load(filename).get_image_data()
+    # converting RGB to RGBA, pyglet garbles the alpha, so we add our own
+    format = image.format if image.format in ('RGB', 'RGBA') else 'RGBA'
+    channels = len(format)
+    # a negative pitch asks for the top row first
+    pixels = numpy.frombuffer(
+        image.get_data(format, -image.width * channels), numpy.uint8)
+    pixels = pixels.reshape(image.height, image.width, channels)
+    if channels == 3:
+        alpha = numpy.full(pixels.shape[:2] + (1,), 255, numpy.uint8)
+        pixels = numpy.concatenate([pixels, alpha], axis=2)
+    return pixels
+
+
+def decode(filename, reader=read_image):
+    '''
+        returns the image's (height, width, 4) uint8 pixels, bottom row
+        first as glTexImage2D wants them (and as pyglet loads them)
+    '''
+    return reader(filename)[::-1].copy()
+
+
+def _specify(texture_id, width, height, pixels):
+    gl.glBindTexture(gl.GL_TEXTURE_2D, texture_id)
+    gl.glTexImage2D(
+        gl.GL_TEXTURE_2D, 0, gl.GL_RGBA8, width, height, 0,
+        gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, pixels)
+    gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+
+class Texture(object):
+    '''
+        id: GL texture name, the placeholder until ready
+        target: GL_TEXTURE_2D, or GL_TEXTURE_2D_ARRAY
+        result: the decode's AsyncResult, None once uploaded
+        error: the exception decoding raised, if it failed
+        regions: the UV remap table of an atlas or texture array, once
+            ready, see atlas.py
+    '''
+    def __init__(self, filename, result, target=gl.GL_TEXTURE_2D):
+        self.filename = filename
+        self.target = target
+        self.result = result
+        self.error = None
+        self.size = (1, 1)
+        self.regions = None
+        self.id = gl.glGenTextures(1)
+        gl.glBindTexture(target, self.id)
+        for name, value in (
+            (gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR),
+            (gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR),
+            (gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE),
+            (gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE),
+        ):
+            gl.glTexParameteri(target, name, value)
+        placeholder = (ctypes.c_ubyte * 4)(*PLACEHOLDER)
+        if target == gl.GL_TEXTURE_2D:
+            _specify(self.id, 1, 1, placeholder)
+        else:
+            gl.glTexImage3D(
+                target, 0, gl.GL_RGBA8, 1, 1, 1, 0, gl.GL_RGBA,
+                gl.GL_UNSIGNED_BYTE, placeholder)
+            gl.glBindTexture(target, 0)
+
+    @property
+    def ready(self):
+        return self.result is None and self.error is None
+
+
+class TextureLoader(object):
+    '''
+        workers: size of the decoding pool, by default one per CPU
+        processes: decode in processes rather than threads
+        budget: most bytes uploaded per update()
+        use_pbo: upload through a pixel buffer object, when supported
+    '''
+    def __init__(self, workers=None, processes=False,
+                 budget=DEFAULT_BUDGET, use_pbo=None):
+        self.pool = (Pool if processes else ThreadPool)(workers)
+        self.budget = budget
+        if use_pbo is None:
+            use_pbo = bool(gl.glMapBufferRange)
+        self.use_pbo = use_pbo
+        self.pbo = None
+        self.pending = []
+
+    def load(self, filename, reader=read_image, decode=decode,
+             target=gl.GL_TEXTURE_2D):
+        '''
+            returns a Texture for filename, its placeholder usable at once.
+            decode(filename, reader) runs on the pool, returning pixels, a
+            texturebake.Baked or an atlas.py texture for target, and must
+            pickle for a process pool.
+        '''
+        result = self.pool.apply_async(decode, (filename, reader))
+        texture = Texture(filename, result, target)
+        self.pending.append(texture)
+        return texture
+
+    def _upload(self, texture, image):
+        if not self.use_pbo:
+            image.specify(texture.id)
+            return
+        if self.pbo is None:
+            self.pbo = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, self.pbo)
+        try:
+            # fresh storage each time, so the driver needn't wait for the
+            # last upload from this buffer to finish before we write
+            gl.glBufferData(
+                gl.GL_PIXEL_UNPACK_BUFFER, image.nbytes, None,
+                gl.GL_STREAM_DRAW)
+            pointer = gl.glMapBufferRange(
+                gl.GL_PIXEL_UNPACK_BUFFER, 0, image.nbytes,
+                gl.GL_MAP_WRITE_BIT | gl.GL_MAP_INVALIDATE_BUFFER_BIT)
+            # every level one after another
+            offsets = []
+            offset = 0
+            for _, _, data in image.levels:
+                ctypes.memmove(pointer + offset, data.ctypes.data, data.nbytes)
+                offsets.append(offset)
+                offset += data.nbytes
+            gl.glUnmapBuffer(gl.GL_PIXEL_UNPACK_BUFFER)
+            # with a PBO bound, each level is given as an offset into it
+            image.specify(texture.id, offsets)
+        finally:
+            gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+
+    def update(self, budget=None):
+        '''
+            upload the textures decoded so far, up to budget bytes of
+            them (the loader's by default), on the GL thread.  Returns the
+            number still pending.
+        '''
+        budget = self.budget if budget is None else budget
+        uploaded = 0
+        for texture in list(self.pending):
+            if not texture.result.ready():
+                continue
+            if uploaded and uploaded >= budget:
+                break
+            self.pending.remove(texture)
+            try:
+                image = texture.result.get()
+            except Exception as exc:
+                texture.error = exc
+                sys.stderr.write('%s: %s\n' % (texture.filename, exc))
+                continue
+            finally:
+                texture.result = None
+            if isinstance(image, numpy.ndarray):
+                image = Baked.from_pixels(image)
+            self._upload(texture, image)
+            texture.size = image.size
+            texture.regions = getattr(image, 'regions', None)
+            uploaded += image.nbytes
+        return len(self.pending)
+
+    def wait(self):
+        '''
+            block until every texture is uploaded
+        '''
+        while self.pending:
+            self.pending[0].result.wait()
+            self.update(budget=0)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        if self.pbo is not None:
+            gl.glDeleteBuffers(1, [self.pbo])
+            self.pbo = None
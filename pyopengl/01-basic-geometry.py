@@ -6,7 +6,7 @@ BaseContext = testingcontext.getInteractive()
 from OpenGL import GL as gl
 from OpenGL.arrays import vbo
 from OpenGLContext.arrays import array
-from OpenGL.GL.shaders import compileProgram, compileShader
+from shadercache import compileProgram, compileShader
 
 
 VERTEX_SHADER = '''
@@ -11,7 +11,7 @@ BaseContext = testingcontext.getInteractive()
 from OpenGLContext.arrays import array
 from OpenGL import GL as gl
 from OpenGL.arrays import vbo
-from OpenGL.GL.shaders import compileProgram, compileShader
+from shadercache import compileProgram, compileShader
 
 VERTEX_SHADER = '''
 varying vec4 vertex_color;
@@ -10,7 +10,7 @@ from OpenGLContext.arrays import array
 from OpenGLContext.events.timer import Timer
 from OpenGL import GL as gl
 from OpenGL.arrays import vbo
-from OpenGL.GL.shaders import compileProgram, compileShader
+from shadercache import compileProgram, compileShader
 
 VERTEX_SHADER = '''
 uniform float tween;
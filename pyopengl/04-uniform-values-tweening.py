@@ -10,7 +10,9 @@ from OpenGLContext.arrays import array
 from OpenGLContext.events.timer import Timer
 from OpenGL import GL as gl
 from OpenGL.arrays import vbo
-from OpenGL.GL.shaders import compileProgram, compileShader
+from shadercache import compileProgram, compileShader
+
+from mesh import Attribute, Mesh
 
 VERTEX_SHADER = '''
 uniform float tween;
@@ -72,6 +74,17 @@ class TestContext( BaseContext ):
         self.color = gl.glGetAttribLocation( self.shader, 'color' )
         self.tween = gl.glGetUniformLocation( self.shader, 'tween' )
 
+        stride = 9 * 4
+        self.mesh = Mesh(
+            self.vbo,
+            [
+                Attribute( self.position, 3, stride, 0 ),
+                Attribute( self.tweened, 3, stride, 12 ),
+                Attribute( self.color, 3, stride, 24 ),
+            ],
+            9,
+        )
+
         self.time = Timer( duration = 2.0, repeating = 1 )
         self.time.addEventHandler( "fraction", self.OnTimerFraction )
         self.time.register( self )
@@ -86,35 +99,10 @@ class TestContext( BaseContext ):
         try:
             # set the value of attributes passed to the vertex shader
             gl.glUniform1f( self.tween, self.tween_fraction )
-            
-            self.vbo.bind()
-            try:
-                gl.glEnableVertexAttribArray( self.position )
-                gl.glEnableVertexAttribArray( self.tweened )
-                gl.glEnableVertexAttribArray( self.color )
-
-                stride = 9 * 4
-                gl.glVertexAttribPointer( 
-                    self.position, 
-                    3, gl.GL_FLOAT, False, stride, self.vbo 
-                )
-                gl.glVertexAttribPointer( 
-                    self.tweened, 
-                    3, gl.GL_FLOAT, False, stride, self.vbo+12
-                )
-                gl.glVertexAttribPointer( 
-                    self.color, 
-                    3, gl.GL_FLOAT, False, stride, self.vbo+24
-                )
-
-                gl.glDrawArrays( gl.GL_TRIANGLES, 0, 9 )
-            finally:
-                self.vbo.unbind()
-                gl.glDisableVertexAttribArray( self.position )
-                gl.glDisableVertexAttribArray( self.tweened )
-                gl.glDisableVertexAttribArray( self.color )
 
+            self.mesh.draw()
         finally:
+            self.mesh.unbind()
             gl.glUseProgram( 0 )
 
 
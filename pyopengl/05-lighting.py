@@ -12,7 +12,9 @@ BaseContext = testingcontext.getInteractive()
 from OpenGLContext.arrays import array
 from OpenGL import GL as gl
 from OpenGL.arrays import vbo
-from OpenGL.GL.shaders import compileProgram, compileShader
+from shadercache import compileProgram, compileShader
+
+from mesh import Attribute, Mesh
 
 DLIGHT_FUNC = """
 float dLight( 
@@ -129,6 +131,16 @@ class TestContext( BaseContext ):
             if location in ( None, -1 ):
                 print 'Warning, no attribute: %s'%( attribute )
             setattr( self, attribute + '_loc', location )
+
+        stride = 6*4
+        self.mesh = Mesh(
+            self.vbo,
+            [
+                Attribute( self.Vertex_position_loc, 3, stride, 0 ),
+                Attribute( self.Vertex_normal_loc, 3, stride, 12 ),
+            ],
+            18,
+        )
         
 
     def Render( self, mode ):
@@ -137,34 +149,16 @@ class TestContext( BaseContext ):
         '''
         gl.glUseProgram( self.shader )
         try:
-            self.vbo.bind()
-            try:
-                gl.glUniform4f( self.Global_ambient_loc, .9,.05,.05,.1 )
-                gl.glUniform4f( self.Light_ambient_loc, .2,.2,.2, 1.0 )
-                gl.glUniform4f( self.Light_diffuse_loc, 1,1,1,1 )
-                gl.glUniform3f( self.Light_location_loc, 2,2,10 )
-                gl.glUniform4f( self.Material_ambient_loc, .2,.2,.2, 1.0 )
-                gl.glUniform4f( self.Material_diffuse_loc, 1,1,1, 1 )
-
-                stride = 6*4
-                gl.glEnableVertexAttribArray( self.Vertex_position_loc )
-                gl.glEnableVertexAttribArray( self.Vertex_normal_loc )
-                gl.glVertexAttribPointer( 
-                    self.Vertex_position_loc, 
-                    3, gl.GL_FLOAT,False, stride, self.vbo 
-                )
-                gl.glVertexAttribPointer( 
-                    self.Vertex_normal_loc, 
-                    3, gl.GL_FLOAT,False, stride, self.vbo+12
-                )
-                
-                gl.glDrawArrays( gl.GL_TRIANGLES, 0, 18 )
-            finally:
-                self.vbo.unbind()
-                gl.glDisableVertexAttribArray( self.Vertex_position_loc )
-                gl.glDisableVertexAttribArray( self.Vertex_normal_loc )
-
+            gl.glUniform4f( self.Global_ambient_loc, .9,.05,.05,.1 )
+            gl.glUniform4f( self.Light_ambient_loc, .2,.2,.2, 1.0 )
+            gl.glUniform4f( self.Light_diffuse_loc, 1,1,1,1 )
+            gl.glUniform3f( self.Light_location_loc, 2,2,10 )
+            gl.glUniform4f( self.Material_ambient_loc, .2,.2,.2, 1.0 )
+            gl.glUniform4f( self.Material_diffuse_loc, 1,1,1, 1 )
+
+            self.mesh.draw()
         finally:
+            self.mesh.unbind()
             gl.glUseProgram( 0 )
 
 
@@ -13,7 +13,9 @@ from OpenGLContext.arrays import array
 from OpenGLContext.scenegraph.basenodes import Sphere
 from OpenGL import GL as gl
 from OpenGL.arrays import vbo
-from OpenGL.GL.shaders import compileProgram, compileShader
+from shadercache import compileProgram, compileShader
+
+from mesh import Attribute, Mesh
 
 DLIGHT_FUNC = """
 vec2 dLight( 
@@ -125,6 +127,17 @@ class TestContext( BaseContext ):
             if location in ( None, -1 ):
                 print 'Warning, no attribute: %s'%( attribute )
             setattr( self, attribute + '_loc', location )
+
+        stride = self.coords.data[0].nbytes
+        self.mesh = Mesh(
+            self.coords,
+            [
+                Attribute( self.Vertex_position_loc, 3, stride, 0 ),
+                Attribute( self.Vertex_normal_loc, 3, stride, 5*4 ),
+            ],
+            self.count,
+            indices=self.indices,
+        )
         
 
     def Render( self, mode ):
@@ -133,57 +146,21 @@ class TestContext( BaseContext ):
         '''
         gl.glUseProgram( self.shader )
         try:
-            self.coords.bind()
-            self.indices.bind()
-            stride = self.coords.data[0].nbytes
-            try:
-                gl.glUniform4f( self.Global_ambient_loc, 0.1, 0.1, 0.1, 1.0 )
-
-                gl.glUniform4f( self.Light_ambient_loc,  0.2, 0.2, 0.2, 1.0 )
-                gl.glUniform4f( self.Light_diffuse_loc,  0.8, 0.8, 0.8, 1.0 )
-                gl.glUniform4f( self.Light_specular_loc, 0.8, 0.8, 0.8, 1.0 )
-                gl.glUniform3f( self.Light_location_loc, 6,2,4 )
-
-                gl.glUniform4f( self.Material_ambient_loc,  0.1, 0.2, 0.1, 1.0)
-                gl.glUniform4f( self.Material_diffuse_loc,  0.2, 0.8, 0.4, 1.0)
-                gl.glUniform4f( self.Material_specular_loc, 0.2, 0.8, 0.4, 1.0)
-                gl.glUniform1f( self.Material_shininess_loc, 50)
-
-                gl.glEnableVertexAttribArray( self.Vertex_position_loc )
-                gl.glEnableVertexAttribArray( self.Vertex_normal_loc )
-                gl.glVertexAttribPointer( 
-                    self.Vertex_position_loc, 
-                    3, gl.GL_FLOAT, False, stride, self.coords
-                )
-                gl.glVertexAttribPointer( 
-                    self.Vertex_normal_loc, 
-                    3, gl.GL_FLOAT, False, stride, self.coords+(5*4)
-                )
-
-                gl.glEnableVertexAttribArray( self.Vertex_position_loc )
-                gl.glEnableVertexAttribArray( self.Vertex_normal_loc )
-                gl.glVertexAttribPointer( 
-                    self.Vertex_position_loc, 
-                    3, gl.GL_FLOAT,False, stride, self.coords
-                )
-                gl.glVertexAttribPointer( 
-                    self.Vertex_normal_loc, 
-                    3, gl.GL_FLOAT,False, stride, self.coords + (5 * 4)
-                )
-                
-                gl.glDrawElements(
-                    gl.GL_TRIANGLES,
-                    self.count,
-                    gl.GL_UNSIGNED_SHORT,
-                    self.indices
-                )
-            finally:
-                self.coords.unbind()
-                self.indices.unbind()
-                gl.glDisableVertexAttribArray( self.Vertex_position_loc )
-                gl.glDisableVertexAttribArray( self.Vertex_normal_loc )
+            gl.glUniform4f( self.Global_ambient_loc, 0.1, 0.1, 0.1, 1.0 )
+
+            gl.glUniform4f( self.Light_ambient_loc,  0.2, 0.2, 0.2, 1.0 )
+            gl.glUniform4f( self.Light_diffuse_loc,  0.8, 0.8, 0.8, 1.0 )
+            gl.glUniform4f( self.Light_specular_loc, 0.8, 0.8, 0.8, 1.0 )
+            gl.glUniform3f( self.Light_location_loc, 6,2,4 )
+
+            gl.glUniform4f( self.Material_ambient_loc,  0.1, 0.2, 0.1, 1.0)
+            gl.glUniform4f( self.Material_diffuse_loc,  0.2, 0.8, 0.4, 1.0)
+            gl.glUniform4f( self.Material_specular_loc, 0.2, 0.8, 0.4, 1.0)
+            gl.glUniform1f( self.Material_shininess_loc, 50)
 
+            self.mesh.draw()
         finally:
+            self.mesh.unbind()
             gl.glUseProgram( 0 )
 
 
@@ -10,7 +10,9 @@ from OpenGLContext import testingcontext
 BaseContext = testingcontext.getInteractive()
 from OpenGLContext.scenegraph.basenodes import Sphere
 from OpenGL import GL as gl
-from OpenGL.GL.shaders import compileProgram, compileShader
+from shadercache import compileProgram, compileShader
+
+from mesh import Attribute, Mesh
 
 
 MATERIAL_STRUCT = '''
@@ -175,6 +177,17 @@ class TestContext( BaseContext ):
 				print 'Warning, no attribute: %s'%( name )
 			setattr( self, name + '_loc', location )
 
+        stride = self.coords.data[0].nbytes
+        self.mesh = Mesh(
+            self.coords,
+            [
+                Attribute( self.Vertex_position_loc, 3, stride, 0 ),
+                Attribute( self.Vertex_normal_loc, 3, stride, 5*4 ),
+            ],
+            self.count,
+            indices=self.indices,
+        )
+
 
     def Render( self, mode ):
         '''
@@ -182,44 +195,19 @@ class TestContext( BaseContext ):
         '''
         gl.glUseProgram( self.shader )
         try:
-            self.coords.bind()
-            self.indices.bind()
-            stride = self.coords.data[0].nbytes
-            try:
-                for uniform, value in UNIFORM_VALUES.items():
-                    location = self.uniforms.get( uniform )
-                    if location not in (None,-1):
-                        if len(value) == 4:
-                            gl.glUniform4f( location, *value )
-                        elif len(value) == 3:
-                            gl.glUniform3f( location, *value )
-                        elif len(value) == 1:
-                            gl.glUniform1f( location, *value )
-
-                gl.glEnableVertexAttribArray( self.Vertex_position_loc )
-                gl.glEnableVertexAttribArray( self.Vertex_normal_loc )
-                gl.glVertexAttribPointer( 
-                    self.Vertex_position_loc, 
-                    3, gl.GL_FLOAT, False, stride, self.coords
-                )
-                gl.glVertexAttribPointer( 
-                    self.Vertex_normal_loc, 
-                    3, gl.GL_FLOAT, False, stride, self.coords+(5*4)
-                )
-
-                gl.glDrawElements(
-                    gl.GL_TRIANGLES,
-                    self.count,
-                    gl.GL_UNSIGNED_SHORT,
-                    self.indices
-                )
-            finally:
-                self.coords.unbind()
-                self.indices.unbind()
-                gl.glDisableVertexAttribArray( self.Vertex_position_loc )
-                gl.glDisableVertexAttribArray( self.Vertex_normal_loc )
-
+            for uniform, value in UNIFORM_VALUES.items():
+                location = self.uniforms.get( uniform )
+                if location not in (None,-1):
+                    if len(value) == 4:
+                        gl.glUniform4f( location, *value )
+                    elif len(value) == 3:
+                        gl.glUniform3f( location, *value )
+                    elif len(value) == 1:
+                        gl.glUniform1f( location, *value )
+
+            self.mesh.draw()
         finally:
+            self.mesh.unbind()
             gl.glUseProgram( 0 )
 
 
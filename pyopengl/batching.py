@@ -0,0 +1,293 @@
+'''
+Merges many static meshes of one vertex layout into shared vertex and
+index buffers, so they're all drawn with one call however many there are.
+
+    batch = Batch( attributes, geometry.COORD_STRIDE * 4 )
+    for position in positions:
+        coords, indices, count = Sphere( radius=0.5 ).compile()
+        batch.add( coords, indices, transforms.translation( *position ) )
+    ...
+    batch.draw()        # instead of a draw per mesh
+    batch.unbind()
+
+Meshes can be numpy arrays or the VBOs OpenGLContext's compile() returns
+(their data is copied), indexed or, like 01's, plain triangle lists.
+A transform is baked into the mesh's positions (and normals) as it's
+added, since the batch is drawn in one go with one modelview.
+
+How it's drawn depends on the driver:
+
+    'indirect'  GL 4.3 or GL_ARB_multi_draw_indirect: one
+                glMultiDrawElementsIndirect, reading a command per mesh
+                (built in numpy) from a GL_DRAW_INDIRECT_BUFFER, each
+                with its own base vertex, so indices stay mesh-local
+    'rebased'   otherwise: every mesh's indices are offset by where its
+                vertices start, and concatenated into one glDrawElements
+
+Either way set_visible() hides a mesh without rebuilding the vertex
+buffer: in 'indirect' mode its command draws no instances, in 'rebased'
+mode the index buffer is re-made from the visible meshes alone.
+
+Indices are the smallest type that can index the batch (or in 'indirect'
+mode, its biggest mesh).  Given max_vertices, say where 32 bit indices
+aren't available, meshes with more vertices are split as they're added,
+and a 'rebased' batch is drawn in runs of meshes that each fit, with a
+glDrawElementsBaseVertex per run.
+'''
+import ctypes
+
+import numpy
+
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+
+import geometry
+import indexformat
+from mesh import Mesh
+
+
+# the layout glMultiDrawElementsIndirect reads
+DRAW_COMMAND = numpy.dtype( [
+    ( 'count', '<u4' ),
+    ( 'instance_count', '<u4' ),
+    ( 'first_index', '<u4' ),
+    ( 'base_vertex', '<i4' ),
+    ( 'base_instance', '<u4' ),
+] )
+MODES = ( 'indirect', 'rebased' )
+# indices per primitive, of the draw modes whose meshes can be split
+PRIMITIVE_SIZES = {
+    gl.GL_POINTS: 1,
+    gl.GL_LINES: 2,
+    gl.GL_TRIANGLES: 3,
+}
+
+
+def indirect_supported():
+    return bool( gl.glMultiDrawElementsIndirect )
+
+
+class Batch( Mesh ):
+    '''
+    many meshes in one Mesh, whose buffers are built on the first draw
+
+    stride -- bytes per vertex, of float32 values
+    position, normal -- offsets in floats of the values a transform
+        moves, or None
+    mode -- one of MODES, or None for the best the driver supports
+    max_vertices -- the most vertices one draw may index, eg.
+        indexformat.MAX_16BIT_VERTICES without 32 bit indices
+    '''
+    def __init__( self, attributes, stride, mode=None,
+                  draw_mode=gl.GL_TRIANGLES,
+                  position=geometry.POSITION_OFFSET,
+                  normal=geometry.NORMAL_OFFSET, max_vertices=None,
+                  use_vao=None ):
+        Mesh.__init__(
+            self, None, attributes, 0, mode=draw_mode, use_vao=use_vao
+        )
+        self.batch_mode = mode
+        self.width = stride // 4
+        self.position = position
+        self.normal = normal
+        self.max_vertices = max_vertices
+        self.parts = []
+        self.visible = []
+        # the parts each add() made, more than one if it was split
+        self.groups = []
+        self.draws = []
+        self.commands = None
+        self.command_buffer = None
+        self.built = False
+        self.dirty = False
+
+    def __len__( self ):
+        return len( self.groups )
+
+    def add( self, coords, indices=None, transform=None ):
+        '''
+        add a mesh, returning its index.  coords are its vertices (an
+        array or VBO), indices index them, or if None, coords are drawn
+        in order.  transform is a transforms.py matrix to bake in.
+        '''
+        coords = numpy.asarray(
+            getattr( coords, 'data', coords ), dtype='f'
+        ).reshape( -1, self.width )
+        if indices is None:
+            indices = numpy.arange( len( coords ) )
+        else:
+            indices = numpy.asarray( getattr( indices, 'data', indices ) )
+        if transform is not None:
+            coords = coords.copy()
+            position = slice( self.position, self.position + 3 )
+            coords[:, position] = coords[:, position].dot(
+                transform[:3, :3]
+            ) + transform[3, :3]
+            if self.normal is not None:
+                normal = slice( self.normal, self.normal + 3 )
+                coords[:, normal] = coords[:, normal].dot(
+                    numpy.linalg.inv( transform[:3, :3] ).T
+                )
+        pieces = [ ( coords, indices.ravel() ) ]
+        if self.max_vertices is not None and len( coords ) > self.max_vertices:
+            if self.mode not in PRIMITIVE_SIZES:
+                raise ValueError( 'only points, lines and triangles split' )
+            pieces = indexformat.split(
+                coords, indices, self.max_vertices,
+                PRIMITIVE_SIZES[self.mode]
+            )
+        first = len( self.parts )
+        self.parts.extend( pieces )
+        self.visible.extend( [ True ] * len( pieces ) )
+        self.groups.append( range( first, len( self.parts ) ) )
+        self.delete()
+        return len( self.groups ) - 1
+
+    def set_visible( self, index, visible=True ):
+        for part in self.groups[index]:
+            if self.visible[part] != bool( visible ):
+                self.visible[part] = bool( visible )
+                self.dirty = True
+
+    def build( self ):
+        '''
+        make the vertex, index and (in 'indirect' mode) command buffers
+        '''
+        if self.batch_mode is None:
+            self.batch_mode = MODES[0] if indirect_supported() else MODES[1]
+        if self.batch_mode not in MODES:
+            raise ValueError(
+                'unknown batch mode: %r' % ( self.batch_mode, )
+            )
+        counts = numpy.array(
+            [ len( indices ) for _, indices in self.parts ], dtype='i'
+        )
+        vertex_counts = numpy.array(
+            [ len( coords ) for coords, _ in self.parts ], dtype='i'
+        )
+        self.first_indices = numpy.cumsum( counts ) - counts
+        self.base_vertices = numpy.cumsum( vertex_counts ) - vertex_counts
+
+        vertices = numpy.concatenate( [ coords for coords, _ in self.parts ] )
+        self.coords = vbo.VBO( vertices )
+        if self.batch_mode == 'indirect':
+            # each mesh's indices count from its own base vertex
+            dtype = indexformat.smallest( vertex_counts.max() )[0]
+            indices = numpy.concatenate(
+                [ indices for _, indices in self.parts ]
+            ).astype( dtype )
+            self.commands = numpy.zeros( len( self.parts ), DRAW_COMMAND )
+            self.commands['count'] = counts
+            self.commands['first_index'] = self.first_indices
+            self.commands['base_vertex'] = self.base_vertices
+            self.command_buffer = vbo.VBO(
+                self.commands, target=gl.GL_DRAW_INDIRECT_BUFFER
+            )
+        else:
+            self.runs, spans = self._runs( vertex_counts )
+            dtype = indexformat.smallest( max( spans ) )[0]
+            indices = self._rebased( dtype )
+        self.index_type = indexformat.gl_type( dtype )
+        self.indices = vbo.VBO( indices, target='GL_ELEMENT_ARRAY_BUFFER' )
+        self.count = len( indices )
+        self.built = True
+        self.dirty = True
+
+    def _runs( self, vertex_counts ):
+        '''
+        [ ( first part, end part, base vertex ), ... ] of consecutive parts
+        with max_vertices or fewer between them, and each run's vertices
+        '''
+        runs, spans = [], []
+        start = base = span = 0
+        for index, count in enumerate( vertex_counts ):
+            if ( self.max_vertices is not None and index > start and
+                    span + count > self.max_vertices ):
+                runs.append( ( start, index, base ) )
+                spans.append( span )
+                start, base, span = index, base + span, 0
+            span += count
+        runs.append( ( start, len( vertex_counts ), base ) )
+        spans.append( span )
+        return runs, spans
+
+    def _rebased( self, dtype ):
+        '''
+        the visible parts' indices, counting from their run's base vertex,
+        noting in draws the ( count, byte offset, base vertex ) of each run
+        '''
+        indices = []
+        self.draws = []
+        offset = 0
+        for start, end, base in self.runs:
+            run = [
+                self.parts[part][1].astype( dtype ) +
+                dtype( self.base_vertices[part] - base )
+                for part in range( start, end )
+                if self.visible[part]
+            ]
+            count = sum( len( part ) for part in run )
+            if count:
+                self.draws.append( ( count, offset, base ) )
+                indices.extend( run )
+                offset += count * numpy.dtype( dtype ).itemsize
+        if not indices:
+            return numpy.zeros( 0, dtype=dtype )
+        return numpy.concatenate( indices )
+
+    def _update( self ):
+        if self.batch_mode == 'indirect':
+            self.commands['instance_count'] = self.visible
+            self.command_buffer.set_array( self.commands )
+        else:
+            indices = self._rebased( self.indices.data.dtype.type )
+            self.indices.set_array( indices )
+            self.count = len( indices )
+        self.dirty = False
+
+    def _issue_draw( self, instances, first ):
+        if self.batch_mode != 'indirect':
+            for count, offset, base in self.draws:
+                if base:
+                    gl.glDrawElementsBaseVertex(
+                        self.mode, count, self.index_type,
+                        ctypes.c_void_p( offset ), base
+                    )
+                else:
+                    gl.glDrawElements(
+                        self.mode, count, self.index_type,
+                        ctypes.c_void_p( offset )
+                    )
+            return
+        self.command_buffer.bind()
+        try:
+            gl.glMultiDrawElementsIndirect(
+                self.mode, self.index_type, ctypes.c_void_p( 0 ),
+                len( self.parts ), 0
+            )
+        finally:
+            self.command_buffer.unbind()
+
+    def draw( self ):
+        '''
+        draw every visible mesh, with one call
+        '''
+        if not self.built:
+            self.build()
+        if self.dirty:
+            self._update()
+        if self.count:
+            Mesh.draw( self )
+
+    def delete( self ):
+        '''
+        free the GL buffers, which the next draw re-makes
+        '''
+        Mesh.delete( self )
+        for buffer in ( self.coords, self.indices, self.command_buffer ):
+            if buffer is not None:
+                buffer.delete()
+        self.coords = self.indices = self.command_buffer = None
+        self.commands = None
+        self.draws = []
+        self.built = False
@@ -0,0 +1,207 @@
+'''
+Times drawing a grid of spheres with a draw call each, against merging
+them into a batching.Batch drawn with one call, in each of its modes:
+
+    python bench_batching.py --counts 100,1000,5000 --frames 100
+
+The last frames of every method are compared, and should be identical.
+'''
+import json
+import optparse
+
+import numpy
+
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import batching
+import geometry
+import timing
+import transforms
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+from mesh import Attribute, Mesh
+from shadercache import compileProgram, compileShader
+
+
+DEFAULT_COUNTS = '100,1000,5000'
+METHODS = ( 'separate', ) + batching.MODES
+STRIDE = geometry.COORD_STRIDE * 4
+
+VERTEX_SHADER = '''
+attribute vec3 Vertex_position;
+attribute vec3 Vertex_normal;
+varying vec3 normal;
+void main() {
+    gl_Position = gl_ModelViewProjectionMatrix * vec4( Vertex_position, 1.0 );
+    normal = Vertex_normal;
+}
+'''
+FRAGMENT_SHADER = '''
+varying vec3 normal;
+void main() {
+    float light = max( dot( normalize( normal ), vec3( 0.0, 0.6, 0.8 ) ),
+                       0.0 );
+    gl_FragColor = vec4( vec3( 0.2 + 0.8 * light ), 1.0 );
+}
+'''
+
+
+def positions( count ):
+    '''
+    count points in a square grid facing the default camera
+    '''
+    side = int( numpy.ceil( numpy.sqrt( count ) ) )
+    spacing = 8.0 / side
+    index = numpy.arange( count )
+    grid = numpy.zeros( ( count, 3 ), dtype='f' )
+    grid[:, 0] = ( index % side - ( side - 1 ) / 2.0 ) * spacing
+    grid[:, 1] = ( index // side - ( side - 1 ) / 2.0 ) * spacing
+    return grid, spacing * 0.4
+
+
+def meshes( count ):
+    '''
+    ( coords, indices ) of count small spheres, moved into place
+    '''
+    grid, radius = positions( count )
+    coords, indices = geometry.sphere( radius, slices=12, stacks=6 )
+    result = []
+    for x, y, z in grid:
+        moved = coords.copy()
+        moved[:, :3] += ( x, y, z )
+        result.append( ( moved, indices ) )
+    return result
+
+
+def attributes( shader ):
+    return [
+        Attribute(
+            gl.glGetAttribLocation( shader, 'Vertex_position' ), 3, STRIDE,
+            geometry.POSITION_OFFSET * 4
+        ),
+        Attribute(
+            gl.glGetAttribLocation( shader, 'Vertex_normal' ), 3, STRIDE,
+            geometry.NORMAL_OFFSET * 4
+        ),
+    ]
+
+
+class Separate( object ):
+    '''
+    a Mesh, and a draw, per sphere
+    '''
+    def __init__( self, parts, shader ):
+        self.meshes = [
+            Mesh(
+                vbo.VBO( coords ), attributes( shader ), len( indices ),
+                indices=vbo.VBO( indices, target='GL_ELEMENT_ARRAY_BUFFER' )
+            )
+            for coords, indices in parts
+        ]
+
+    def draw( self ):
+        for mesh in self.meshes:
+            mesh.draw()
+        self.unbind()
+
+    def unbind( self ):
+        if self.meshes:
+            self.meshes[0].unbind()
+
+    def delete( self ):
+        for mesh in self.meshes:
+            mesh.delete()
+            mesh.coords.delete()
+            mesh.indices.delete()
+
+
+def make( method, parts, shader ):
+    if method == 'separate':
+        return Separate( parts, shader )
+    batch = batching.Batch( attributes( shader ), STRIDE, mode=method )
+    for coords, indices in parts:
+        batch.add( coords, indices )
+    return batch
+
+
+def run( drawable, shader, frames, warmup, framebuffer ):
+    samples = []
+    for frame in range( warmup + frames ):
+        start = timing.clock()
+        gl.glClear( gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT )
+        gl.glUseProgram( shader )
+        try:
+            drawable.draw()
+        finally:
+            drawable.unbind()
+            gl.glUseProgram( 0 )
+        if frame >= warmup:
+            samples.append( timing.clock() - start )
+        gl.glFinish()
+    return samples, framebuffer.read_pixels()
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options]' )
+    parser.add_option( '-c', '--counts', default=DEFAULT_COUNTS,
+        help='comma-separated numbers of spheres [%default]' )
+    parser.add_option( '-m', '--methods', default=','.join( METHODS ),
+        help='comma-separated methods to time [%default]' )
+    parser.add_option( '-n', '--frames', type='int', default=100 )
+    parser.add_option( '-w', '--warmup', type='int', default=5 )
+    parser.add_option( '-s', '--size', default='512x512',
+        help='framebuffer WIDTHxHEIGHT [%default]' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the percentiles to FILE' )
+    options, _ = parser.parse_args( argv )
+
+    size = headless.parse_size( options.size )
+    context = headless.OffscreenContext( size )
+    results = {}
+    try:
+        framebuffer = headless.Framebuffer( size )
+        framebuffer.bind()
+        shader = compileProgram(
+            compileShader( VERTEX_SHADER, gl.GL_VERTEX_SHADER ),
+            compileShader( FRAGMENT_SHADER, gl.GL_FRAGMENT_SHADER ),
+        )
+        modelview, projection = transforms.default_camera( *size )
+        gl.glMatrixMode( gl.GL_PROJECTION )
+        gl.glLoadMatrixf( projection )
+        gl.glMatrixMode( gl.GL_MODELVIEW )
+        gl.glLoadMatrixf( modelview )
+        gl.glEnable( gl.GL_DEPTH_TEST )
+
+        for count in [ int( c ) for c in options.counts.split( ',' ) ]:
+            parts = meshes( count )
+            reference = None
+            for method in options.methods.split( ',' ):
+                if method == 'indirect' and not batching.indirect_supported():
+                    print( 'indirect %d: not supported' % ( count, ) )
+                    continue
+                drawable = make( method, parts, shader )
+                samples, pixels = run(
+                    drawable, shader, options.frames, options.warmup,
+                    framebuffer
+                )
+                drawable.delete()
+                label = '%s %d' % ( method, count )
+                results[label] = summary = timing.summarise( samples )
+                if reference is None:
+                    reference = pixels
+                print( '%s  %s' % (
+                    timing.format_summary( label, summary ),
+                    'same' if ( pixels == reference ).all() else 'DIFFERENT',
+                ) )
+        gl.glDeleteProgram( shader )
+        framebuffer.delete()
+    finally:
+        context.destroy()
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+'''
+Times a tutorial's frames rendered by Render as usual, then recorded
+once into a commandlist.CommandList and submitted:
+
+    python bench_commandlist.py 08-optimised-lights.py --frames 500
+
+The scene is frozen at its first frame for the command list, so the
+tutorials animated by a Timer (03 and 04) stop moving; the others draw
+the same whichever way.  The last frames are compared to check.
+
+Frames are timed as submitted, without waiting for the GPU, which is
+waited for between frames, untimed.
+'''
+import json
+import optparse
+from os.path import basename
+
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import timing
+from commandlist import CommandList
+from OpenGL import GL
+
+
+def _time( render, frames, warmup, framebuffer ):
+    samples = []
+    for frame in range( warmup + frames ):
+        start = timing.clock()
+        render( frame, warmup + frames )
+        if frame >= warmup:
+            samples.append( timing.clock() - start )
+        GL.glFinish()
+    return samples, framebuffer.read_pixels()
+
+
+def run( path, frames, warmup, size ):
+    '''
+    returns { 'render': samples, 'commands': samples }, pixels of each,
+    and the number of commands
+    '''
+    target = headless.make_target( path )
+    context = headless.OffscreenContext( size )
+    try:
+        framebuffer = headless.Framebuffer( size )
+        try:
+            framebuffer.bind()
+            target.init( size )
+            samples, pixels = {}, {}
+            samples['render'], pixels['render'] = _time(
+                target.render, frames, warmup, framebuffer
+            )
+
+            commands = CommandList()
+            samples['commands'], pixels['commands'] = _time(
+                lambda frame, total: commands.draw(
+                    target.render, frame, total
+                ),
+                frames, warmup, framebuffer
+            )
+            return samples, pixels, len( commands )
+        finally:
+            framebuffer.delete()
+    finally:
+        context.destroy()
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options] TUTORIAL.py' )
+    parser.add_option( '-n', '--frames', type='int', default=100 )
+    parser.add_option( '-w', '--warmup', type='int', default=5,
+        help='untimed frames rendered first, the first of them recording, '
+             'else timed [%default]' )
+    parser.add_option( '-s', '--size', default='%dx%d' % headless.DEFAULT_SIZE,
+        help='framebuffer WIDTHxHEIGHT' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the percentiles to FILE' )
+    options, paths = parser.parse_args( argv )
+    if len( paths ) != 1:
+        parser.error( 'name one tutorial script' )
+
+    path = paths[0]
+    samples, pixels, count = run(
+        path, options.frames, options.warmup,
+        headless.parse_size( options.size )
+    )
+    results = {}
+    for label in ( 'render', 'commands' ):
+        results[label] = timing.summarise( samples[label] )
+        print( timing.format_summary(
+            '%s %s' % ( basename( path ), label ), results[label]
+        ) )
+    same = ( pixels['render'] == pixels['commands'] ).all()
+    print( '%d commands, %.2fx as fast, %s' % (
+        count, results['render']['mean'] / results['commands']['mean'],
+        'same frame' if same else 'DIFFERENT frame',
+    ) )
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+'''
+Times dlight.shade() over arrays of random points and normals, lit as in
+09-point-lights.py, and reports millions of points shaded per second.
+
+    python bench_dlight.py --counts 10000,100000,1000000 --repeat 5
+
+Needs no GL context.
+'''
+import json
+import optparse
+
+import numpy
+
+import dlight
+import timing
+import transforms
+from lights import LightSet
+
+
+DEFAULT_COUNTS = '10000,100000,1000000'
+
+# the material and lights of 09-point-lights.py
+UNIFORM_VALUES = {
+    'Global_ambient': (0.1, 0.1, 0.1, 1.0),
+
+    'material.ambient':  (0.1, 0.3, 0.1, 1.0),
+    'material.diffuse':  (0.2, 0.7, 0.3, 1.0),
+    'material.specular': (1.0, 1.0, 1.0, 1.0),
+    'material.shininess': (50,),
+}
+LIGHTS = LightSet()
+LIGHTS.add( (0.0, 8.0, 0.0, 1.0), (0.2, 0.2, 0.2, 1.0),
+            (0.7, 0.7, 0.7, 1.0), (0.5, 0.5, 0.5, 1.0), (0.5, 0.0, 0.0) )
+LIGHTS.add( (8.0, 2.0, 4.0, 1.0), (0.2, 0.5, 0.1, 1.0),
+            (0.2, 0.5, 0.1, 1.0), (0.2, 0.5, 0.1, 1.0), (0.0, 0.2, 0.0) )
+LIGHTS.add( (8.0, 4.0, 2.0, 1.0), (0.1, 0.2, 1.5, 1.0),
+            (0.1, 0.2, 10.5, 1.0), (0.1, 0.2, 10.5, 1.0), (0.0, 0.0, 0.1) )
+
+
+def points( count, seed=0 ):
+    '''
+    returns ( positions, normals ): count points on the unit sphere
+    '''
+    random = numpy.random.RandomState( seed )
+    normals = random.normal( size=( count, 3 ) ).astype( 'f' )
+    normals /= numpy.sqrt( ( normals * normals ).sum( axis=1 ) )[:, None]
+    return normals.copy(), normals
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options]' )
+    parser.add_option( '-c', '--counts', default=DEFAULT_COUNTS,
+        help='comma-separated numbers of points [%default]' )
+    parser.add_option( '-r', '--repeat', type='int', default=5 )
+    parser.add_option( '--chunk', type='int', default=dlight.CHUNK,
+        help='points shaded per numpy pass [%default]' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the percentiles to FILE' )
+    options, _ = parser.parse_args( argv )
+
+    modelview, _ = transforms.default_camera( 640, 480 )
+    results = {}
+    for count in [ int( c ) for c in options.counts.split( ',' ) ]:
+        positions, normals = points( count )
+        samples = timing.time_calls(
+            dlight.shade, options.repeat, positions, normals, LIGHTS,
+            UNIFORM_VALUES, modelview, options.chunk
+        )
+        label = 'shade %d' % ( count, )
+        results[label] = summary = timing.summarise( samples )
+        summary['mpoints_per_second'] = count / summary['p50'] / 1000.0
+        print( '%s  %8.2f Mpoints/s' % (
+            timing.format_summary( label, summary ),
+            summary['mpoints_per_second'],
+        ) )
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+'''
+Times drawing a grid of spheres, each with one of a few programs and
+textures, binding and unbinding everything per sphere as the tutorials
+do, against binding through a glstate.GLState, which skips what's already
+bound:
+
+    python bench_glstate.py --count 1000 --programs 4 --textures 16
+
+Spheres sharing a program and texture are drawn together, as a sorted
+scene would be.  The GL calls the state made and skipped are counted per
+frame, and the last frames of both methods compared.
+'''
+import json
+import optparse
+
+import numpy
+
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import geometry
+import timing
+import transforms
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+from bench_batching import meshes
+from glstate import GLState
+from mesh import Attribute, Mesh
+from shadercache import compileProgram, compileShader
+
+
+METHODS = ( 'binds', 'state' )
+STRIDE = geometry.COORD_STRIDE * 4
+
+VERTEX_SHADER = '''
+attribute vec3 Vertex_position;
+attribute vec2 Vertex_texcoord;
+attribute vec3 Vertex_normal;
+varying vec2 texcoord;
+varying vec3 normal;
+void main() {
+    gl_Position = gl_ModelViewProjectionMatrix * vec4( Vertex_position, 1.0 );
+    texcoord = Vertex_texcoord;
+    normal = Vertex_normal;
+}
+'''
+# each program tinted differently, so a wrong one shows
+FRAGMENT_SHADER = '''
+uniform sampler2D image;
+varying vec2 texcoord;
+varying vec3 normal;
+void main() {
+    float light = max( dot( normalize( normal ), vec3( 0.0, 0.6, 0.8 ) ),
+                       0.0 );
+    vec3 colour = texture2D( image, texcoord ).rgb * vec3( %s );
+    gl_FragColor = vec4( colour * ( 0.2 + 0.8 * light ), 1.0 );
+}
+'''
+
+
+def make_programs( count ):
+    random = numpy.random.RandomState( 0 )
+    programs = []
+    for _ in range( count ):
+        tint = ', '.join( '%.2f' % c for c in random.uniform( 0.4, 1.0, 3 ) )
+        programs.append( compileProgram(
+            compileShader( VERTEX_SHADER, gl.GL_VERTEX_SHADER ),
+            compileShader(
+                FRAGMENT_SHADER % ( tint, ), gl.GL_FRAGMENT_SHADER
+            ),
+        ) )
+    return programs
+
+
+def make_textures( count, size=8 ):
+    '''
+    count small textures of random colours
+    '''
+    random = numpy.random.RandomState( 1 )
+    textures = []
+    for _ in range( count ):
+        texture = gl.glGenTextures( 1 )
+        gl.glBindTexture( gl.GL_TEXTURE_2D, texture )
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST
+        )
+        gl.glTexParameteri(
+            gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST
+        )
+        pixels = random.randint( 0, 256, ( size, size, 4 ) ).astype( 'B' )
+        gl.glTexImage2D(
+            gl.GL_TEXTURE_2D, 0, gl.GL_RGBA8, size, size, 0, gl.GL_RGBA,
+            gl.GL_UNSIGNED_BYTE, pixels
+        )
+        textures.append( texture )
+    gl.glBindTexture( gl.GL_TEXTURE_2D, 0 )
+    return textures
+
+
+def attributes( shader ):
+    return [
+        Attribute(
+            gl.glGetAttribLocation( shader, name ), size, STRIDE, offset * 4
+        )
+        for name, size, offset in (
+            ( 'Vertex_position', 3, geometry.POSITION_OFFSET ),
+            ( 'Vertex_texcoord', 2, geometry.TEXCOORD_OFFSET ),
+            ( 'Vertex_normal', 3, geometry.NORMAL_OFFSET ),
+        )
+    ]
+
+
+def make_scene( parts, programs, textures, use_vao, state=None ):
+    '''
+    [ ( program, texture, Mesh ) ] of every sphere, in runs sharing a
+    program, and within those, a texture
+    '''
+    count = len( parts )
+    # the locations are the same in every program, they share a shader
+    layout = attributes( programs[0] )
+    scene = []
+    for i, ( coords, indices ) in enumerate( parts ):
+        mesh = Mesh(
+            vbo.VBO( coords ), layout, len( indices ),
+            indices=vbo.VBO( indices, target='GL_ELEMENT_ARRAY_BUFFER' ),
+            use_vao=use_vao, state=state
+        )
+        scene.append( (
+            programs[i * len( programs ) // count],
+            textures[i * len( textures ) // count],
+            mesh,
+        ) )
+    return scene
+
+
+def draw_binds( scene ):
+    for program, texture, mesh in scene:
+        gl.glUseProgram( program )
+        gl.glBindTexture( gl.GL_TEXTURE_2D, texture )
+        try:
+            mesh.draw()
+        finally:
+            mesh.unbind()
+            gl.glBindTexture( gl.GL_TEXTURE_2D, 0 )
+            gl.glUseProgram( 0 )
+
+
+def draw_state( scene, state ):
+    try:
+        for program, texture, mesh in scene:
+            state.use_program( program )
+            state.bind_texture( 0, gl.GL_TEXTURE_2D, texture )
+            mesh.draw()
+    finally:
+        state.reset()
+
+
+def run( draw, frames, warmup, framebuffer, state=None ):
+    samples = []
+    calls = []
+    for frame in range( warmup + frames ):
+        if state is not None:
+            state.reset_counters()
+        start = timing.clock()
+        gl.glClear( gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT )
+        draw()
+        if frame >= warmup:
+            samples.append( timing.clock() - start )
+            if state is not None:
+                calls.append( state.counters() )
+        gl.glFinish()
+    return samples, calls, framebuffer.read_pixels()
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options]' )
+    parser.add_option( '-c', '--count', type='int', default=1000,
+        help='spheres to draw [%default]' )
+    parser.add_option( '-p', '--programs', type='int', default=4,
+        help='programs they are drawn with [%default]' )
+    parser.add_option( '-t', '--textures', type='int', default=16,
+        help='textures they are drawn with [%default]' )
+    parser.add_option( '--no-vao', action='store_false', dest='use_vao',
+        default=True, help='set attribute pointers per draw' )
+    parser.add_option( '-m', '--methods', default=','.join( METHODS ),
+        help='comma-separated methods to time [%default]' )
+    parser.add_option( '-n', '--frames', type='int', default=100 )
+    parser.add_option( '-w', '--warmup', type='int', default=5 )
+    parser.add_option( '-s', '--size', default='512x512',
+        help='framebuffer WIDTHxHEIGHT [%default]' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the percentiles to FILE' )
+    options, _ = parser.parse_args( argv )
+
+    size = headless.parse_size( options.size )
+    context = headless.OffscreenContext( size )
+    results = {}
+    try:
+        framebuffer = headless.Framebuffer( size )
+        framebuffer.bind()
+        programs = make_programs( options.programs )
+        textures = make_textures( options.textures )
+        modelview, projection = transforms.default_camera( *size )
+        gl.glMatrixMode( gl.GL_PROJECTION )
+        gl.glLoadMatrixf( projection )
+        gl.glMatrixMode( gl.GL_MODELVIEW )
+        gl.glLoadMatrixf( modelview )
+        gl.glEnable( gl.GL_DEPTH_TEST )
+
+        parts = meshes( options.count )
+        reference = None
+        for method in options.methods.split( ',' ):
+            if method == 'state':
+                state = GLState()
+                scene = make_scene(
+                    parts, programs, textures, options.use_vao, state
+                )
+                draw = lambda: draw_state( scene, state )
+            else:
+                state = None
+                scene = make_scene(
+                    parts, programs, textures, options.use_vao
+                )
+                draw = lambda: draw_binds( scene )
+            samples, calls, pixels = run(
+                draw, options.frames, options.warmup, framebuffer, state
+            )
+            for _, _, mesh in scene:
+                mesh.delete()
+                mesh.coords.delete()
+                mesh.indices.delete()
+
+            results[method] = summary = timing.summarise( samples )
+            if reference is None:
+                reference = pixels
+            line = '%s  %s' % (
+                timing.format_summary( method, summary ),
+                'same' if ( pixels == reference ).all() else 'DIFFERENT',
+            )
+            if calls:
+                summary['calls'] = calls[-1]
+                line += '  %d calls, %d skipped a frame' % (
+                    calls[-1]['issued'], calls[-1]['skipped']
+                )
+            print( line )
+            if calls:
+                for kind, counts in sorted( calls[-1].items() ):
+                    if kind not in ( 'issued', 'skipped' ):
+                        print( '    %-16s %6d made %6d skipped' % (
+                            ( kind, ) + counts
+                        ) )
+        for program in programs:
+            gl.glDeleteProgram( program )
+        gl.glDeleteTextures( len( textures ), textures )
+        framebuffer.delete()
+    finally:
+        context.destroy()
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+'''
+Times uploading and drawing spheres of various sizes with each index type
+that can index them, and meshes too big for uint16 split into uint16
+runs (as indexformat.split and batching.Batch do, without 32 bit indices):
+
+    python bench_indices.py --sizes 14x14,64x32,320x240 --frames 100
+
+Sizes are slices x stacks.  Each sphere is drawn --repeat times a frame,
+so the index reads add up, and the last frames of each type are compared,
+and should be identical.
+'''
+import json
+import optparse
+
+import numpy
+
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import batching
+import bench_batching
+import geometry
+import indexformat
+import timing
+import transforms
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+from mesh import Mesh
+from shadercache import compileProgram, compileShader
+
+
+DEFAULT_SIZES = '14x14,64x32,320x240'
+METHODS = ( 'uint8', 'uint16', 'uint32', 'split16' )
+UPLOADS = 10
+
+
+def sphere( size ):
+    slices, stacks = [ int( n ) for n in size.split( 'x' ) ]
+    return geometry.sphere( 1.5, slices=slices, stacks=stacks )
+
+
+def fits( method, vertices ):
+    if method == 'split16':
+        return vertices > indexformat.MAX_16BIT_VERTICES
+    dtype = numpy.dtype( method )
+    return vertices <= numpy.iinfo( dtype ).max + 1
+
+
+def upload( indices ):
+    '''
+    mean seconds to copy indices into a new element buffer
+    '''
+    total = 0.0
+    for _ in range( UPLOADS ):
+        start = timing.clock()
+        buffer = vbo.VBO( indices, target=gl.GL_ELEMENT_ARRAY_BUFFER )
+        buffer.bind()
+        gl.glFinish()
+        total += timing.clock() - start
+        buffer.unbind()
+        buffer.delete()
+    return total / UPLOADS
+
+
+def make( method, coords, indices, shader ):
+    '''
+    a drawable, the bytes of its indices, and the seconds to upload them
+    '''
+    attributes = bench_batching.attributes( shader )
+    if method == 'split16':
+        drawable = batching.Batch(
+            attributes, bench_batching.STRIDE, mode='rebased',
+            max_vertices=indexformat.MAX_16BIT_VERTICES
+        )
+        drawable.add( coords, indices )
+        parts = [ part for _, part in drawable.parts ]
+        size = sum( part.nbytes for part in parts )
+        return drawable, size, upload( numpy.concatenate( parts ) )
+    indices = indices.astype( method )
+    drawable = Mesh(
+        vbo.VBO( coords ), attributes, len( indices ),
+        indices=vbo.VBO( indices, target=gl.GL_ELEMENT_ARRAY_BUFFER )
+    )
+    return drawable, indices.nbytes, upload( indices )
+
+
+def run( drawable, shader, repeat, frames, warmup, framebuffer ):
+    samples = []
+    for frame in range( warmup + frames ):
+        gl.glClear( gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT )
+        gl.glFinish()
+        start = timing.clock()
+        gl.glUseProgram( shader )
+        try:
+            for _ in range( repeat ):
+                drawable.draw()
+        finally:
+            drawable.unbind()
+            gl.glUseProgram( 0 )
+        gl.glFinish()
+        if frame >= warmup:
+            samples.append( timing.clock() - start )
+    return samples, framebuffer.read_pixels()
+
+
+def delete( drawable ):
+    drawable.delete()
+    if not isinstance( drawable, batching.Batch ):
+        drawable.coords.delete()
+        drawable.indices.delete()
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options]' )
+    parser.add_option( '--sizes', default=DEFAULT_SIZES,
+        help='comma-separated sphere SLICESxSTACKS [%default]' )
+    parser.add_option( '-m', '--methods', default=','.join( METHODS ),
+        help='comma-separated index types to time [%default]' )
+    parser.add_option( '-r', '--repeat', type='int', default=10,
+        help='draws of the sphere per frame [%default]' )
+    parser.add_option( '-n', '--frames', type='int', default=100 )
+    parser.add_option( '-w', '--warmup', type='int', default=5 )
+    parser.add_option( '-s', '--size', default='512x512',
+        help='framebuffer WIDTHxHEIGHT [%default]' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the percentiles to FILE' )
+    options, _ = parser.parse_args( argv )
+
+    size = headless.parse_size( options.size )
+    context = headless.OffscreenContext( size )
+    results = {}
+    try:
+        framebuffer = headless.Framebuffer( size )
+        framebuffer.bind()
+        shader = compileProgram(
+            compileShader(
+                bench_batching.VERTEX_SHADER, gl.GL_VERTEX_SHADER
+            ),
+            compileShader(
+                bench_batching.FRAGMENT_SHADER, gl.GL_FRAGMENT_SHADER
+            ),
+        )
+        modelview, projection = transforms.default_camera( *size )
+        gl.glMatrixMode( gl.GL_PROJECTION )
+        gl.glLoadMatrixf( projection )
+        gl.glMatrixMode( gl.GL_MODELVIEW )
+        gl.glLoadMatrixf( modelview )
+        gl.glEnable( gl.GL_DEPTH_TEST )
+
+        for sphere_size in options.sizes.split( ',' ):
+            coords, indices = sphere( sphere_size )
+            reference = None
+            for method in options.methods.split( ',' ):
+                if not fits( method, len( coords ) ):
+                    continue
+                drawable, nbytes, seconds = make(
+                    method, coords, indices, shader
+                )
+                samples, pixels = run(
+                    drawable, shader, options.repeat, options.frames,
+                    options.warmup, framebuffer
+                )
+                delete( drawable )
+                label = '%s %d' % ( method, len( coords ) )
+                summary = timing.summarise( samples )
+                summary['index_bytes'] = nbytes
+                summary['upload_ms'] = seconds * 1000.0
+                results[label] = summary
+                if reference is None:
+                    reference = pixels
+                print( '%s  %8d index bytes, %.3fms upload  %s' % (
+                    timing.format_summary( label, summary ),
+                    nbytes, seconds * 1000.0,
+                    'same' if ( pixels == reference ).all() else 'DIFFERENT',
+                ) )
+        gl.glDeleteProgram( shader )
+        framebuffer.delete()
+    finally:
+        context.destroy()
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
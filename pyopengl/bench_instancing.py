@@ -0,0 +1,181 @@
+'''
+Times drawing many lit spheres offscreen, one glDrawElements per sphere
+from a Python loop, against one glDrawElementsInstanced for them all.
+
+    python bench_instancing.py --counts 100,1000,10000 --frames 20
+
+Both ways draw the same scene with the same shaders, so the last frames
+are compared too, and the largest difference in any channel reported.
+'''
+import json
+import optparse
+
+import numpy
+
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import geometry
+import lights
+import timing
+import transforms
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+from instancing import (
+    COLOR_ATTRIBUTE, TRANSFORM_ATTRIBUTE, InstancedMesh, instance_array,
+)
+from mesh import Attribute
+from shadercache import compileProgram, compileShader
+
+
+DEFAULT_COUNTS = '100,1000,10000'
+RADIUS = 0.15
+
+
+def scene( count, seed=0 ):
+    '''
+    count randomly placed and coloured small spheres in front of the
+    default camera
+    '''
+    random = numpy.random.RandomState( seed )
+    instances = instance_array( count )
+    transform = instances['transform']
+    transform[:, 0, 0] = transform[:, 1, 1] = transform[:, 2, 2] = RADIUS
+    transform[:, 3, :3] = random.uniform(
+        ( -6.0, -4.0, -10.0 ), ( 6.0, 4.0, 2.0 ), ( count, 3 )
+    )
+    instances['color'][:, :3] = random.uniform( 0.2, 1.0, ( count, 3 ) )
+    return instances
+
+
+def light_set():
+    light_set = lights.LightSet()
+    light_set.add( ( 10, 10, 10, 0 ), ( .05, .05, .05, 1 ),
+                   ( .8, .8, .8, 1 ), ( .3, .3, .3, 1 ) )
+    light_set.add( ( -5, 2, 4, 1 ), ( 0, 0, 0, 1 ),
+                   ( .6, .6, .9, 1 ), ( .2, .2, .4, 1 ), ( .5, .05, 0 ) )
+    return light_set
+
+
+class Bench( object ):
+
+    def __init__( self, framebuffer, size ):
+        self.framebuffer = framebuffer
+        vertex, fragment = lights.shader_sources( 2, instanced=True )
+        self.shader = compileProgram(
+            compileShader( vertex, gl.GL_VERTEX_SHADER ),
+            compileShader( fragment, gl.GL_FRAGMENT_SHADER ),
+        )
+        location = lambda name: gl.glGetAttribLocation( self.shader, name )
+        coords, indices = geometry.sphere( slices=16, stacks=8 )
+        stride = coords.strides[0]
+        self.mesh = InstancedMesh(
+            vbo.VBO( coords ),
+            [
+                Attribute( location( 'Vertex_position' ), 3, stride,
+                           geometry.POSITION_OFFSET * 4 ),
+                Attribute( location( 'Vertex_normal' ), 3, stride,
+                           geometry.NORMAL_OFFSET * 4 ),
+            ],
+            len( indices ),
+            location( TRANSFORM_ATTRIBUTE ),
+            location( COLOR_ATTRIBUTE ),
+            indices=vbo.VBO( indices, target=gl.GL_ELEMENT_ARRAY_BUFFER ),
+        )
+        self.lights = light_set()
+
+        modelview, projection = transforms.default_camera( *size )
+        gl.glMatrixMode( gl.GL_PROJECTION )
+        gl.glLoadMatrixf( projection )
+        gl.glMatrixMode( gl.GL_MODELVIEW )
+        gl.glLoadMatrixf( modelview )
+        gl.glEnable( gl.GL_DEPTH_TEST )
+
+    def render( self, instanced ):
+        gl.glClear( gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT )
+        gl.glUseProgram( self.shader )
+        try:
+            self.lights.upload(
+                gl.glGetUniformLocation( self.shader, lights.LIGHTS_UNIFORM )
+            )
+            for name, value in (
+                ( 'Global_ambient', ( .05, .05, .05, 1 ) ),
+                ( 'material.ambient', ( .2, .2, .2, 1 ) ),
+                ( 'material.diffuse', ( 1, 1, 1, 1 ) ),
+                ( 'material.specular', ( .4, .4, .4, 1 ) ),
+            ):
+                gl.glUniform4f(
+                    gl.glGetUniformLocation( self.shader, name ), *value
+                )
+            gl.glUniform1f(
+                gl.glGetUniformLocation( self.shader, 'material.shininess' ),
+                40.0
+            )
+            if instanced:
+                self.mesh.draw()
+            else:
+                self.mesh.draw_each()
+        finally:
+            self.mesh.unbind()
+            gl.glUseProgram( 0 )
+
+    def time( self, instances, instanced, frames, warmup ):
+        '''
+        returns ( per-frame durations, last frame's pixels )
+        '''
+        samples = []
+        for frame in range( warmup + frames ):
+            start = timing.clock()
+            # streamed every frame, as a scene of moving objects would be
+            self.mesh.set_instances( instances )
+            self.render( instanced )
+            gl.glFinish()
+            if frame >= warmup:
+                samples.append( timing.clock() - start )
+        return samples, self.framebuffer.read_pixels()
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options]' )
+    parser.add_option( '-c', '--counts', default=DEFAULT_COUNTS,
+        help='comma-separated numbers of spheres [%default]' )
+    parser.add_option( '-n', '--frames', type='int', default=20 )
+    parser.add_option( '-w', '--warmup', type='int', default=2 )
+    parser.add_option( '-s', '--size', default='%dx%d' % headless.DEFAULT_SIZE,
+        help='framebuffer WIDTHxHEIGHT' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the percentiles to FILE' )
+    options, _ = parser.parse_args( argv )
+
+    size = headless.parse_size( options.size )
+    context = headless.OffscreenContext( size )
+    results = {}
+    try:
+        framebuffer = headless.Framebuffer( size )
+        framebuffer.bind()
+        bench = Bench( framebuffer, size )
+        for count in [ int( c ) for c in options.counts.split( ',' ) ]:
+            instances = scene( count )
+            pixels = {}
+            for name, instanced in ( ( 'loop', False ), ( 'instanced', True ) ):
+                samples, pixels[name] = bench.time(
+                    instances, instanced, options.frames, options.warmup
+                )
+                label = '%s %d' % ( name, count )
+                results[label] = timing.summarise( samples )
+                print( timing.format_summary( label, results[label] ) )
+            difference = numpy.abs(
+                pixels['loop'].astype( 'i' ) - pixels['instanced']
+            ).max()
+            print( '%-32s max channel difference %d' % ( '', difference ) )
+        bench.mesh.delete()
+        framebuffer.delete()
+    finally:
+        context.destroy()
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
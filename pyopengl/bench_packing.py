@@ -0,0 +1,196 @@
+'''
+Times drawing a finely divided sphere, many times a frame, lit by 08's
+directional lights, from float vertices against packing.py's packed
+layouts:
+
+    python bench_packing.py --sphere 256x128 --repeat 20 --frames 100
+
+The sphere is stretched into an ellipsoid (--stretch), so its bounding
+box isn't a cube: lights.py's shaders turn normals by gl_NormalMatrix,
+so a quantised mesh's decode_matrix() must light correctly whatever its
+shape.  Packed frames can't be identical to the
+float one, so each is compared to it by the largest difference of any
+channel, and the share of pixels differing by more than 2.
+'''
+import json
+import optparse
+from os.path import abspath, dirname, join
+
+import numpy
+
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import geometry
+import lights
+import packing
+import timing
+import transforms
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+from mesh import Mesh
+from shadercache import compileProgram, compileShader
+from softshaders import tutorial_values
+from uniforms import UniformCache
+
+
+# name: ( position, texcoord, normal ) formats
+LAYOUTS = {
+    'float': ( 'float', 'float', 'float' ),
+    'half': ( 'half', 'half', 'normal' ),
+    'quantised': ( 'quantised', 'half', 'normal' ),
+}
+ORDER = ( 'float', 'half', 'quantised' )
+TOLERANCE = 2
+# lit as 08 is, found alongside wherever we're run from
+TUTORIAL = join( dirname( abspath( __file__ ) ), '08-optimised-lights.py' )
+
+
+def stretch( coords, scale ):
+    '''
+    geometry.sphere() coords scaled by ( x, y, z ), their normals turned
+    to match
+    '''
+    coords = numpy.array( coords )
+    scale = numpy.asarray( scale, dtype='f' )
+    position = slice( geometry.POSITION_OFFSET, geometry.POSITION_OFFSET + 3 )
+    normal = slice( geometry.NORMAL_OFFSET, geometry.NORMAL_OFFSET + 3 )
+    coords[:, position] *= scale
+    normals = coords[:, normal] / scale
+    coords[:, normal] = normals / numpy.sqrt(
+        ( normals * normals ).sum( axis=1 )
+    )[:, None]
+    return coords
+
+
+def make_shader():
+    '''
+    08's program, with its uniforms and lights set
+    '''
+    values = tutorial_values( TUTORIAL )
+    vertex, fragment = lights.shader_sources(
+        len( values['LIGHTS'] ), 'array'
+    )
+    shader = compileProgram(
+        compileShader( vertex, gl.GL_VERTEX_SHADER ),
+        compileShader( fragment, gl.GL_FRAGMENT_SHADER ),
+    )
+    gl.glUseProgram( shader )
+    cache = UniformCache()
+    for name, value in values['UNIFORM_VALUES'].items():
+        cache.set( shader, gl.glGetUniformLocation( shader, name ), value )
+    values['LIGHTS'].upload(
+        gl.glGetUniformLocation( shader, lights.LIGHTS_UNIFORM ), shader
+    )
+    gl.glUseProgram( 0 )
+    return shader
+
+
+def make( layout, coords, indices, shader ):
+    position, texcoord, normal = LAYOUTS[layout]
+    packed = packing.pack_quadric( coords, position, texcoord, normal )
+    locations = {
+        'position': gl.glGetAttribLocation( shader, 'Vertex_position' ),
+        'normal': gl.glGetAttribLocation( shader, 'Vertex_normal' ),
+    }
+    mesh = Mesh(
+        packed.buffer(), packed.attributes( locations ), len( indices ),
+        indices=vbo.VBO( indices, target=gl.GL_ELEMENT_ARRAY_BUFFER )
+    )
+    return packed, mesh
+
+
+def run( mesh, shader, modelview, repeat, frames, warmup, framebuffer ):
+    gl.glLoadMatrixf( modelview )
+    samples = []
+    for frame in range( warmup + frames ):
+        gl.glClear( gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT )
+        gl.glFinish()
+        start = timing.clock()
+        gl.glUseProgram( shader )
+        try:
+            for _ in range( repeat ):
+                mesh.draw()
+        finally:
+            mesh.unbind()
+            gl.glUseProgram( 0 )
+        gl.glFinish()
+        if frame >= warmup:
+            samples.append( timing.clock() - start )
+    return samples, framebuffer.read_pixels()
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options]' )
+    parser.add_option( '--sphere', default='256x128',
+        help='sphere SLICESxSTACKS [%default]' )
+    parser.add_option( '--stretch', default='1.5,1.0,0.5',
+        help='scale the sphere by X,Y,Z [%default]' )
+    parser.add_option( '-l', '--layouts', default=','.join( ORDER ),
+        help='comma-separated layouts to time [%default]' )
+    parser.add_option( '-r', '--repeat', type='int', default=20,
+        help='draws of the sphere per frame [%default]' )
+    parser.add_option( '-n', '--frames', type='int', default=100 )
+    parser.add_option( '-w', '--warmup', type='int', default=5 )
+    parser.add_option( '-s', '--size', default='512x512',
+        help='framebuffer WIDTHxHEIGHT [%default]' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the percentiles to FILE' )
+    options, _ = parser.parse_args( argv )
+
+    slices, stacks = [ int( n ) for n in options.sphere.split( 'x' ) ]
+    coords, indices = geometry.sphere( 3.0, slices=slices, stacks=stacks )
+    coords = stretch(
+        coords, [ float( n ) for n in options.stretch.split( ',' ) ]
+    )
+    size = headless.parse_size( options.size )
+    context = headless.OffscreenContext( size )
+    results = {}
+    try:
+        framebuffer = headless.Framebuffer( size )
+        framebuffer.bind()
+        shader = make_shader()
+        modelview, projection = transforms.default_camera( *size )
+        gl.glMatrixMode( gl.GL_PROJECTION )
+        gl.glLoadMatrixf( projection )
+        gl.glMatrixMode( gl.GL_MODELVIEW )
+        gl.glEnable( gl.GL_DEPTH_TEST )
+
+        reference = None
+        for layout in options.layouts.split( ',' ):
+            packed, mesh = make( layout, coords, indices, shader )
+            samples, pixels = run(
+                mesh, shader, packed.decode_matrix().dot( modelview ),
+                options.repeat, options.frames, options.warmup, framebuffer
+            )
+            mesh.delete()
+            mesh.coords.delete()
+            mesh.indices.delete()
+            results[layout] = summary = timing.summarise( samples )
+            summary['stride'] = packed.stride
+            if reference is None:
+                reference = pixels
+            difference = numpy.abs(
+                pixels.astype( 'i' ) - reference.astype( 'i' )
+            ).max( axis=2 )
+            summary['max_difference'] = int( difference.max() )
+            summary['pixels_differing'] = float(
+                ( difference > TOLERANCE ).mean()
+            )
+            print( '%s  %2d bytes/vertex  max difference %3d  '
+                   '%.3f%% over %d' % (
+                timing.format_summary( layout, summary ), packed.stride,
+                summary['max_difference'],
+                summary['pixels_differing'] * 100.0, TOLERANCE,
+            ) )
+        gl.glDeleteProgram( shader )
+        framebuffer.delete()
+    finally:
+        context.destroy()
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+'''
+Splits a tutorial's frame time into the Python of its Render and the GL
+calls Render makes (PyOpenGL's wrapping, and the driver):
+
+    python bench_python_overhead.py 09-point-lights.py --frames 200
+    python bench_python_overhead.py 07-multiple-lights.py --stub-only
+
+Three passes over the same tutorial:
+
+    gl       Render against the real GL, headless, as headless.py does
+    replay   one gl frame's calls, logged by glstub.RecordingGL, then
+             made again and again with no tutorial code around them
+    stub     Render against a RecordingGL with no GL behind it: only the
+             tutorial's own Python, plus logging each call
+
+"python" is gl less replay: the part of the frame that is the
+tutorial's Python, uniform loops, try/finally chains and all, which no
+driver will make faster.  The stub pass needs no GPU (--stub-only).
+
+Frames are timed as submitted, without waiting for the GPU, which is
+waited for between frames, untimed.
+'''
+import json
+import optparse
+from os.path import basename
+
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import glstub
+import timing
+from OpenGL import GL
+from OpenGL.arrays import vbo
+
+
+def _time( function, frames, warmup, finish ):
+    samples = []
+    for frame in range( warmup + frames ):
+        start = timing.clock()
+        function( frame, warmup + frames )
+        if frame >= warmup:
+            samples.append( timing.clock() - start )
+        if finish:
+            GL.glFinish()
+    return samples
+
+
+def time_gl( target, frames, warmup, size ):
+    '''
+    returns ( gl samples, replay samples, calls per frame )
+    '''
+    context = headless.OffscreenContext( size )
+    try:
+        framebuffer = headless.Framebuffer( size )
+        try:
+            framebuffer.bind()
+            target.init( size )
+            samples = _time( target.render, frames, warmup, True )
+
+            recorder = glstub.RecordingGL( GL )
+            patches = glstub.patch( 'gl', GL, recorder )
+            patches += recorder.record_methods(
+                vbo.VBO, glstub.VBO_METHODS, 'VBO.'
+            )
+            try:
+                target.render( warmup + frames, warmup + frames + 1 )
+            finally:
+                glstub.restore( patches )
+            GL.glFinish()
+            replay = _time(
+                lambda frame, total: recorder.replay(), frames, warmup, True
+            )
+            return samples, replay, len( recorder )
+        finally:
+            framebuffer.delete()
+    finally:
+        context.destroy()
+
+
+def time_stub( target, frames, warmup, size ):
+    '''
+    returns ( stub samples, calls per frame )
+    '''
+    recorder = glstub.RecordingGL( record_args=False )
+    patches = glstub.install( recorder )
+    try:
+        target.init( size )
+
+        def render( frame, total ):
+            recorder.reset()
+            target.render( frame, total )
+        samples = _time( render, frames, warmup, False )
+    finally:
+        glstub.restore( patches )
+    return samples, len( recorder )
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options] TUTORIAL.py' )
+    parser.add_option( '-n', '--frames', type='int', default=100 )
+    parser.add_option( '-w', '--warmup', type='int', default=5 )
+    parser.add_option( '-s', '--size', default='%dx%d' % headless.DEFAULT_SIZE,
+        help='framebuffer WIDTHxHEIGHT' )
+    parser.add_option( '--stub-only', action='store_true',
+        help='time only the stub pass, which needs no GPU' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the percentiles to FILE' )
+    options, paths = parser.parse_args( argv )
+    if len( paths ) != 1:
+        parser.error( 'name one tutorial script' )
+
+    path = paths[0]
+    size = headless.parse_size( options.size )
+    target = headless.make_target( path )
+    results = {}
+    if not options.stub_only:
+        samples, replay, calls = time_gl(
+            target, options.frames, options.warmup, size
+        )
+        results['gl'] = timing.summarise( samples )
+        results['replay'] = timing.summarise( replay )
+        results['gl']['calls'] = results['replay']['calls'] = calls
+    samples, calls = time_stub( target, options.frames, options.warmup, size )
+    results['stub'] = stub = timing.summarise( samples )
+    stub['calls'] = calls
+    stub['calls_per_second'] = calls * stub['fps']
+
+    name = basename( path )
+    for label in ( 'gl', 'replay', 'stub' ):
+        if label in results:
+            print( '%s  %5d calls' % (
+                timing.format_summary( '%s %s' % ( name, label ),
+                                       results[label] ),
+                results[label]['calls'],
+            ) )
+    print( 'stub: %.2f million calls/s' % ( stub['calls_per_second'] / 1e6, ) )
+    if 'gl' in results:
+        python = results['gl']['mean'] - results['replay']['mean']
+        results['python'] = {
+            'mean': python,
+            'fraction': python / results['gl']['mean'],
+        }
+        print( 'python: %.3f ms of %.3f ms a frame (%.0f%%)' % (
+            python, results['gl']['mean'],
+            results['python']['fraction'] * 100.0,
+        ) )
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
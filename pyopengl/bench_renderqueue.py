@@ -0,0 +1,290 @@
+'''
+Times a grid of spheres drawn through a renderqueue.RenderQueue, each with
+one of the tutorials' pipelines (05's per vertex lighting, 06's per
+fragment Blinn-Phong, 08's and 09's many lights), one of a few materials
+and a texture, submitted in the order they were added against sorted:
+
+    python bench_renderqueue.py --count 1000 --materials 4 --textures 8
+
+The tutorials' shaders don't sample the textures; they stand in for a
+material's, to be bound all the same.  The state changes of each frame
+are counted, and the last frames compared.  Sorting the keys by
+renderqueue.radix_argsort() is also timed against numpy.argsort().
+'''
+import json
+import optparse
+from os.path import abspath, basename, dirname, join
+
+import numpy
+
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import geometry
+import lights
+import timing
+import transforms
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+from bench_batching import meshes, positions
+from bench_glstate import make_textures
+from mesh import Attribute, Mesh
+from renderqueue import Material, RenderQueue, radix_argsort
+from shadercache import compileProgram, compileShader
+from softshaders import tutorial_values
+
+
+METHODS = ( 'unsorted', 'sorted' )
+# the tutorials are found alongside, wherever we're run from
+DIRECTORY = dirname( abspath( __file__ ) )
+STRIDE = geometry.COORD_STRIDE * 4
+
+# uniforms each tutorial sets in its Render, besides the material's
+TUTORIAL_UNIFORMS = {
+    '05-lighting.py': {
+        'Global_ambient': ( 0.9, 0.05, 0.05, 0.1 ),
+        'Light_ambient': ( 0.2, 0.2, 0.2, 1.0 ),
+        'Light_diffuse': ( 1.0, 1.0, 1.0, 1.0 ),
+        'Light_location': ( 2.0, 2.0, 10.0 ),
+    },
+    '06-specular-highlights.py': {
+        'Global_ambient': ( 0.1, 0.1, 0.1, 1.0 ),
+        'Light_ambient': ( 0.2, 0.2, 0.2, 1.0 ),
+        'Light_diffuse': ( 0.8, 0.8, 0.8, 1.0 ),
+        'Light_specular': ( 0.8, 0.8, 0.8, 1.0 ),
+        'Light_location': ( 6.0, 2.0, 4.0 ),
+    },
+}
+# the material uniforms of 05 and 06, and of the generated shaders
+MATERIAL_NAMES = {
+    '05-lighting.py': ( 'Material_ambient', 'Material_diffuse' ),
+    '06-specular-highlights.py': (
+        'Material_ambient', 'Material_diffuse', 'Material_specular',
+        'Material_shininess',
+    ),
+}
+LIGHTS_MATERIAL_NAMES = (
+    'material.ambient', 'material.diffuse', 'material.specular',
+    'material.shininess',
+)
+
+
+class Pipeline( object ):
+    '''
+    a tutorial's program, the uniforms it shares between items, and a
+    few materials of its own
+    '''
+    def __init__( self, path, materials, random ):
+        values = tutorial_values( join( DIRECTORY, path ) )
+        self.name = name = basename( path )
+        self.uniforms = dict( TUTORIAL_UNIFORMS.get( name, {} ) )
+        self.lights = values.get( 'LIGHTS' )
+        if self.lights is not None:
+            # 08 and 09 generate theirs, 09 by default looping per fragment
+            mode = 'unrolled' if name.startswith( '08' ) else 'array'
+            vertex, fragment = lights.shader_sources(
+                len( self.lights ), mode
+            )
+            self.uniforms['Global_ambient'] = values['UNIFORM_VALUES'][
+                'Global_ambient'
+            ]
+            names = LIGHTS_MATERIAL_NAMES
+        else:
+            vertex = values['VERTEX_SHADER']
+            fragment = values['FRAGMENT_SHADER']
+            names = MATERIAL_NAMES[name]
+        self.program = compileProgram(
+            compileShader( vertex, gl.GL_VERTEX_SHADER ),
+            compileShader( fragment, gl.GL_FRAGMENT_SHADER ),
+        )
+        self.materials = []
+        for _ in range( materials ):
+            colour = tuple( random.uniform( 0.2, 1.0, 3 ) ) + ( 1.0, )
+            material = {
+                'ambient': tuple( c * 0.2 for c in colour[:3] ) + ( 1.0, ),
+                'diffuse': colour,
+                'specular': ( 0.8, 0.8, 0.8, 1.0 ),
+                'shininess': ( 50.0, ),
+            }
+            self.materials.append( Material(
+                ( name, material[name.split( '_' )[-1].split( '.' )[-1]] )
+                for name in names
+            ) )
+
+    def attributes( self ):
+        return [
+            Attribute(
+                gl.glGetAttribLocation( self.program, 'Vertex_position' ), 3,
+                STRIDE, geometry.POSITION_OFFSET * 4
+            ),
+            Attribute(
+                gl.glGetAttribLocation( self.program, 'Vertex_normal' ), 3,
+                STRIDE, geometry.NORMAL_OFFSET * 4
+            ),
+        ]
+
+    def setup( self, queue ):
+        '''
+        upload what the program's items share, with it in use
+        '''
+        for name, value in self.uniforms.items():
+            queue.uniforms.set(
+                self.program, queue.location( self.program, name ), value
+            )
+        if self.lights is not None:
+            self.lights.upload(
+                queue.location( self.program, lights.LIGHTS_UNIFORM ),
+                self.program
+            )
+
+
+def make_scene( queue, pipelines, textures, count, random ):
+    '''
+    [ ( pipeline, Mesh, material, textures, depth ) ] of count spheres,
+    each with a random pipeline, material and texture
+    '''
+    grid, _ = positions( count )
+    depths = numpy.sqrt(
+        ( ( grid - transforms.CAMERA_POSITION ) ** 2 ).sum( axis=1 )
+    )
+    scene = []
+    for ( coords, indices ), depth in zip( meshes( count ), depths ):
+        pipeline = pipelines[random.randint( len( pipelines ) )]
+        mesh = Mesh(
+            vbo.VBO( coords ), pipeline.attributes(), len( indices ),
+            indices=vbo.VBO( indices, target='GL_ELEMENT_ARRAY_BUFFER' ),
+            state=queue.state
+        )
+        material = pipeline.materials[
+            random.randint( len( pipeline.materials ) )
+        ]
+        texture = textures[random.randint( len( textures ) )]
+        scene.append( ( pipeline, mesh, material, ( texture, ), depth ) )
+    return scene
+
+
+def run( queue, scene, sort, frames, warmup, framebuffer ):
+    samples = []
+    for frame in range( warmup + frames ):
+        start = timing.clock()
+        gl.glClear( gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT )
+        for pipeline, mesh, material, textures, depth in scene:
+            queue.add( pipeline.program, mesh, material, textures, depth )
+        stats = queue.submit( sort )
+        queue.clear()
+        if frame >= warmup:
+            samples.append( timing.clock() - start )
+        gl.glFinish()
+    return samples, stats, framebuffer.read_pixels()
+
+
+def time_sorts( keys, repeat=20 ):
+    '''
+    ( fastest radix seconds, fastest numpy.argsort seconds, whether they
+    agree )
+    '''
+    radix = min( timing.time_calls( radix_argsort, repeat, keys ) )
+    argsort = min( timing.time_calls(
+        lambda: numpy.argsort( keys, kind='stable' ), repeat
+    ) )
+    same = (
+        radix_argsort( keys ) == numpy.argsort( keys, kind='stable' )
+    ).all()
+    return radix, argsort, same
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options]' )
+    parser.add_option( '-c', '--count', type='int', default=1000,
+        help='spheres to draw [%default]' )
+    parser.add_option( '--materials', type='int', default=4,
+        help='materials per pipeline [%default]' )
+    parser.add_option( '-t', '--textures', type='int', default=8,
+        help='textures the spheres are drawn with [%default]' )
+    parser.add_option( '-p', '--pipelines',
+        default='05-lighting.py,06-specular-highlights.py,'
+                '08-optimised-lights.py,09-point-lights.py',
+        help='comma-separated tutorials to take programs from [%default]' )
+    parser.add_option( '-m', '--methods', default=','.join( METHODS ),
+        help='comma-separated methods to time [%default]' )
+    parser.add_option( '-n', '--frames', type='int', default=100 )
+    parser.add_option( '-w', '--warmup', type='int', default=5 )
+    parser.add_option( '-s', '--size', default='512x512',
+        help='framebuffer WIDTHxHEIGHT [%default]' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the percentiles to FILE' )
+    options, _ = parser.parse_args( argv )
+
+    size = headless.parse_size( options.size )
+    context = headless.OffscreenContext( size )
+    results = {}
+    try:
+        framebuffer = headless.Framebuffer( size )
+        framebuffer.bind()
+        random = numpy.random.RandomState( 0 )
+        pipelines = [
+            Pipeline( path, options.materials, random )
+            for path in options.pipelines.split( ',' )
+        ]
+        textures = make_textures( options.textures )
+        modelview, projection = transforms.default_camera( *size )
+        gl.glMatrixMode( gl.GL_PROJECTION )
+        gl.glLoadMatrixf( projection )
+        gl.glMatrixMode( gl.GL_MODELVIEW )
+        gl.glLoadMatrixf( modelview )
+        gl.glEnable( gl.GL_DEPTH_TEST )
+
+        queue = RenderQueue()
+        for pipeline in pipelines:
+            queue.prepare(
+                pipeline.program,
+                lambda pipeline=pipeline: pipeline.setup( queue )
+            )
+        scene = make_scene(
+            queue, pipelines, textures, options.count, random
+        )
+        reference = None
+        for method in options.methods.split( ',' ):
+            samples, stats, pixels = run(
+                queue, scene, method == 'sorted', options.frames,
+                options.warmup, framebuffer
+            )
+            results[method] = summary = timing.summarise( samples )
+            summary['changes'] = stats
+            if reference is None:
+                reference = pixels
+            print( '%s  %s  %d programs, %d textures, %d materials' % (
+                timing.format_summary( method, summary ),
+                'same' if ( pixels == reference ).all() else 'DIFFERENT',
+                stats['program'][0], stats['texture'][0], stats['materials'],
+            ) )
+
+        for pipeline, mesh, material, textures_, depth in scene:
+            queue.add( pipeline.program, mesh, material, textures_, depth )
+        radix, argsort, same = time_sorts( queue.keys() )
+        queue.clear()
+        results['sort'] = {
+            'radix_ms': radix * 1000, 'argsort_ms': argsort * 1000,
+        }
+        print( 'sorting %d keys: radix %.3fms, numpy.argsort %.3fms, %s' % (
+            options.count, radix * 1000, argsort * 1000,
+            'same' if same else 'DIFFERENT',
+        ) )
+
+        for _, mesh, _, _, _ in scene:
+            mesh.delete()
+            mesh.coords.delete()
+            mesh.indices.delete()
+        for pipeline in pipelines:
+            gl.glDeleteProgram( pipeline.program )
+        gl.glDeleteTextures( len( textures ), textures )
+        framebuffer.delete()
+    finally:
+        context.destroy()
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+'''
+Times re-sending a cloud of points animated on the CPU every frame, by
+each way of getting vertices to the GPU:
+
+    vbo         a new array each frame, via vbo.VBO.set_array()
+    subdata     one array updated in place, then glBufferSubData
+    copy, map, persistent
+                a streaming.StreamingBuffer in each of its modes
+
+    python bench_streaming.py --counts 100000,1000000 --frames 100
+
+Colours are re-sent with the positions, since a draw's first vertex
+applies to every attribute, not only those from the StreamingBuffer.
+Frames are timed on the CPU, without waiting for the GPU, since not
+waiting is the point; "total" includes a glFinish after the last frame.
+The last frames of every method are compared, and should be identical.
+'''
+import json
+import optparse
+
+import numpy
+
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import streaming
+import timing
+import transforms
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+from mesh import Attribute, Mesh
+from shadercache import compileProgram, compileShader
+
+
+DEFAULT_COUNTS = '100000,1000000'
+METHODS = ( 'vbo', 'subdata' ) + streaming.MODES
+STRIDE = 6 * 4
+
+VERTEX_SHADER = '''
+attribute vec3 position;
+attribute vec3 color;
+varying vec4 baseColor;
+void main() {
+    gl_Position = gl_ModelViewProjectionMatrix * vec4( position, 1.0 );
+    baseColor = vec4( color, 1.0 );
+}
+'''
+FRAGMENT_SHADER = '''
+varying vec4 baseColor;
+void main() {
+    gl_FragColor = baseColor;
+}
+'''
+
+
+class Cloud( object ):
+    '''
+    count points on a plane, rippling
+    '''
+    def __init__( self, count, seed=0 ):
+        random = numpy.random.RandomState( seed )
+        self.count = count
+        self.xy = random.uniform( -4.0, 4.0, ( count, 2 ) ).astype( 'f' )
+        self.phase = numpy.sqrt( ( self.xy * self.xy ).sum( axis=1 ) ) * 2
+        self.colors = random.uniform( 0.2, 1.0, ( count, 3 ) ).astype( 'f' )
+
+    def update( self, vertices, t ):
+        '''
+        write the points at time t into vertices, an (N, 6) array of
+        positions and colours
+        '''
+        vertices[:, :2] = self.xy
+        numpy.sin( self.phase + t, out=vertices[:, 2] )
+        vertices[:, 3:] = self.colors
+
+    def vertices( self, t ):
+        vertices = numpy.empty( ( self.count, 6 ), dtype='f' )
+        self.update( vertices, t )
+        return vertices
+
+
+def run( method, cloud, shader, frames, warmup, framebuffer ):
+    position = gl.glGetAttribLocation( shader, 'position' )
+    color = gl.glGetAttribLocation( shader, 'color' )
+
+    stream = None
+    if method == 'vbo':
+        buffer = vbo.VBO( cloud.vertices( 0.0 ), usage=gl.GL_STREAM_DRAW )
+    elif method == 'subdata':
+        vertices = cloud.vertices( 0.0 )
+        buffer = vbo.VBO( vertices, usage=gl.GL_STREAM_DRAW )
+    else:
+        buffer = stream = streaming.StreamingBuffer(
+            cloud.count * STRIDE, STRIDE, mode=method
+        )
+    mesh = Mesh(
+        buffer,
+        [
+            Attribute( position, 3, STRIDE, 0 ),
+            Attribute( color, 3, STRIDE, 12 ),
+        ],
+        cloud.count, mode=gl.GL_POINTS,
+    )
+
+    samples = []
+    total = timing.clock()
+    for frame in range( warmup + frames ):
+        if frame == warmup:
+            total = timing.clock()
+        start = timing.clock()
+        t = frame * 0.1
+        first = 0
+        if method == 'vbo':
+            buffer.set_array( cloud.vertices( t ) )
+            buffer.bind()
+            buffer.unbind()
+        elif method == 'subdata':
+            cloud.update( vertices, t )
+            buffer.bind()
+            gl.glBufferSubData(
+                gl.GL_ARRAY_BUFFER, 0, vertices.nbytes, vertices
+            )
+            buffer.unbind()
+        else:
+            cloud.update( stream.map( 'f', ( cloud.count, 6 ) ), t )
+            stream.unmap()
+            first = stream.first
+
+        gl.glClear( gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT )
+        gl.glUseProgram( shader )
+        try:
+            mesh.draw( first=first )
+        finally:
+            mesh.unbind()
+            gl.glUseProgram( 0 )
+        if stream is not None:
+            stream.fence()
+        if frame >= warmup:
+            samples.append( timing.clock() - start )
+    gl.glFinish()
+    total = timing.clock() - total
+
+    pixels = framebuffer.read_pixels()
+    stalls = stream.stalls if stream is not None else 0
+    mesh.delete()
+    buffer.delete()
+    return samples, total, stalls, pixels
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options]' )
+    parser.add_option( '-c', '--counts', default=DEFAULT_COUNTS,
+        help='comma-separated numbers of points [%default]' )
+    parser.add_option( '-m', '--methods', default=','.join( METHODS ),
+        help='comma-separated methods to time [%default]' )
+    parser.add_option( '-n', '--frames', type='int', default=100 )
+    parser.add_option( '-w', '--warmup', type='int', default=5 )
+    parser.add_option( '-s', '--size', default='256x256',
+        help='framebuffer WIDTHxHEIGHT [%default]' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the percentiles to FILE' )
+    options, _ = parser.parse_args( argv )
+
+    size = headless.parse_size( options.size )
+    context = headless.OffscreenContext( size )
+    results = {}
+    try:
+        framebuffer = headless.Framebuffer( size )
+        framebuffer.bind()
+        shader = compileProgram(
+            compileShader( VERTEX_SHADER, gl.GL_VERTEX_SHADER ),
+            compileShader( FRAGMENT_SHADER, gl.GL_FRAGMENT_SHADER ),
+        )
+        modelview, projection = transforms.default_camera( *size )
+        gl.glMatrixMode( gl.GL_PROJECTION )
+        gl.glLoadMatrixf( projection )
+        gl.glMatrixMode( gl.GL_MODELVIEW )
+        gl.glLoadMatrixf( modelview )
+
+        for count in [ int( c ) for c in options.counts.split( ',' ) ]:
+            cloud = Cloud( count )
+            reference = None
+            for method in options.methods.split( ',' ):
+                samples, total, stalls, pixels = run(
+                    method, cloud, shader, options.frames, options.warmup,
+                    framebuffer
+                )
+                label = '%s %d' % ( method, count )
+                results[label] = summary = timing.summarise( samples )
+                summary['total_ms_per_frame'] = total * 1000.0 / options.frames
+                summary['stalls'] = stalls
+                if reference is None:
+                    reference = pixels
+                print( '%s  total %7.3f ms/frame  stalls %d  %s' % (
+                    timing.format_summary( label, summary ),
+                    summary['total_ms_per_frame'], stalls,
+                    'same' if ( pixels == reference ).all() else 'DIFFERENT',
+                ) )
+        gl.glDeleteProgram( shader )
+        framebuffer.delete()
+    finally:
+        context.destroy()
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+'''
+Reports what vertexcache.py's reordering does to a mesh: ACMR and ATVR in
+a simulated FIFO vertex cache, overdraw (fragments that pass the depth
+test, per pixel covered, from several views), and draw time:
+
+    python bench_vertexcache.py model.mesh --views 8 --frames 100
+    python bench_vertexcache.py --shuffle       # a sphere, randomly ordered
+
+Models can be mesh files or anything meshfile.py converts.  Every stage
+is drawn, and the last frames compared: reordering changes neither the
+triangles nor, without ties in depth, the picture.
+'''
+import json
+import optparse
+from math import pi
+
+import numpy
+
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import bench_batching
+import geometry
+import meshfile
+import timing
+import transforms
+import vertexcache
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+from mesh import Mesh
+from shadercache import compileProgram, compileShader
+
+
+def load( path, shuffle ):
+    '''
+    ( coords, indices ) of the model at path, or of a sphere, with its
+    triangles in random order if shuffle
+    '''
+    if path is None:
+        coords, indices = geometry.sphere( 1.0, slices=64, stacks=32 )
+    elif path.lower().endswith( '.mesh' ):
+        data = meshfile.MeshFile( path )
+        coords = numpy.array( data.vertices, dtype='f' )
+        indices = numpy.array( data.indices )
+    else:
+        coords, indices = meshfile.READERS[path.lower()[-4:]]( path )
+    if shuffle:
+        triangles = indices.reshape( -1, 3 )
+        order = numpy.random.RandomState( 0 ).permutation( len( triangles ) )
+        indices = triangles[order].ravel()
+    return coords, indices
+
+
+def stages( coords, indices, threshold, cache_size ):
+    '''
+    [ ( stage, coords, indices, seconds ) ], each stage's reordering
+    applied to the last's
+    '''
+    result = [ ( 'original', coords, indices, 0.0 ) ]
+    start = timing.clock()
+    indices = vertexcache.optimise( indices, len( coords ) )
+    result.append( ( 'cache', coords, indices, timing.clock() - start ) )
+    start = timing.clock()
+    indices = vertexcache.overdraw(
+        coords, indices, threshold=threshold, cache_size=cache_size
+    )
+    result.append( ( 'overdraw', coords, indices, timing.clock() - start ) )
+    start = timing.clock()
+    coords, indices = vertexcache.reorder_vertices( coords, indices )
+    result.append( ( 'fetch', coords, indices, timing.clock() - start ) )
+    return result
+
+
+def views( coords, count, size ):
+    '''
+    count modelviews of the model, fitted into the default camera's view,
+    turned about the y axis and tipped alternately up and down
+    '''
+    positions = coords[:, :3]
+    low, high = positions.min( axis=0 ), positions.max( axis=0 )
+    radius = numpy.sqrt( ( ( high - low ) ** 2 ).sum() ) / 2.0 or 1.0
+    fit = transforms.translation( *( -( low + high ) / 2.0 ) ).dot(
+        transforms.scale( *( [ 3.0 / radius ] * 3 ) )
+    )
+    camera = transforms.default_camera( *size )[0]
+    return [
+        fit.dot( transforms.rotation( 2.0 * pi * view / count, 0, 1, 0 ) )
+        .dot( transforms.rotation( pi / 6 * ( -1 ) ** view, 1, 0, 0 ) )
+        .dot( camera )
+        for view in range( count )
+    ]
+
+
+def _samples( mesh ):
+    query, = gl.glGenQueries( 1 )
+    gl.glBeginQuery( gl.GL_SAMPLES_PASSED, query )
+    mesh.draw()
+    mesh.unbind()
+    gl.glEndQuery( gl.GL_SAMPLES_PASSED )
+    result = gl.glGetQueryObjectuiv( query, gl.GL_QUERY_RESULT )
+    gl.glDeleteQueries( 1, [ query ] )
+    return int( result )
+
+
+def overdraw( mesh, modelviews ):
+    '''
+    fragments passing the depth test per pixel covered, over every view
+    '''
+    passed = covered = 0
+    for modelview in modelviews:
+        gl.glLoadMatrixf( modelview )
+        gl.glClear( gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT )
+        passed += _samples( mesh )
+        # then only the fragments left showing
+        gl.glDepthFunc( gl.GL_EQUAL )
+        gl.glDepthMask( gl.GL_FALSE )
+        try:
+            covered += _samples( mesh )
+        finally:
+            gl.glDepthFunc( gl.GL_LESS )
+            gl.glDepthMask( gl.GL_TRUE )
+    return passed / float( covered ) if covered else 0.0
+
+
+def draw_time( mesh, modelviews, frames, warmup, framebuffer ):
+    samples = []
+    for frame in range( warmup + frames ):
+        gl.glLoadMatrixf( modelviews[frame % len( modelviews )] )
+        gl.glClear( gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT )
+        gl.glFinish()
+        start = timing.clock()
+        mesh.draw()
+        mesh.unbind()
+        gl.glFinish()
+        if frame >= warmup:
+            samples.append( timing.clock() - start )
+    return samples, framebuffer.read_pixels()
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options] [MODEL]' )
+    parser.add_option( '--shuffle', action='store_true',
+        help='put the triangles in random order first' )
+    parser.add_option( '--cache', type='int',
+        default=vertexcache.SIMULATED_CACHE_SIZE,
+        help='entries in the simulated vertex cache [%default]' )
+    parser.add_option( '--threshold', type='float',
+        default=vertexcache.OVERDRAW_THRESHOLD,
+        help='ACMR allowed overdraw clusters, relative [%default]' )
+    parser.add_option( '--views', type='int', default=8,
+        help='views to measure overdraw from [%default]' )
+    parser.add_option( '-n', '--frames', type='int', default=100 )
+    parser.add_option( '-w', '--warmup', type='int', default=5 )
+    parser.add_option( '-s', '--size', default='512x512',
+        help='framebuffer WIDTHxHEIGHT [%default]' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the statistics and percentiles to FILE' )
+    options, paths = parser.parse_args( argv )
+    if len( paths ) > 1:
+        parser.error( 'name at most one model' )
+
+    coords, indices = load( paths[0] if paths else None, options.shuffle )
+    size = headless.parse_size( options.size )
+    context = headless.OffscreenContext( size )
+    results = {}
+    try:
+        framebuffer = headless.Framebuffer( size )
+        framebuffer.bind()
+        shader = compileProgram(
+            compileShader(
+                bench_batching.VERTEX_SHADER, gl.GL_VERTEX_SHADER
+            ),
+            compileShader(
+                bench_batching.FRAGMENT_SHADER, gl.GL_FRAGMENT_SHADER
+            ),
+        )
+        gl.glMatrixMode( gl.GL_PROJECTION )
+        gl.glLoadMatrixf( transforms.default_camera( *size )[1] )
+        gl.glMatrixMode( gl.GL_MODELVIEW )
+        gl.glEnable( gl.GL_DEPTH_TEST )
+        modelviews = views( coords, max( options.views, 1 ), size )
+
+        reference = None
+        for stage, coords, indices, seconds in stages(
+            coords, indices, options.threshold, options.cache
+        ):
+            mesh = Mesh(
+                vbo.VBO( numpy.ascontiguousarray( coords, dtype='f' ) ),
+                bench_batching.attributes( shader ), len( indices ),
+                indices=vbo.VBO( indices, target=gl.GL_ELEMENT_ARRAY_BUFFER )
+            )
+            gl.glUseProgram( shader )
+            try:
+                ratio = overdraw( mesh, modelviews )
+                samples, pixels = draw_time(
+                    mesh, modelviews, options.frames, options.warmup,
+                    framebuffer
+                )
+            finally:
+                gl.glUseProgram( 0 )
+                mesh.delete()
+                mesh.coords.delete()
+                mesh.indices.delete()
+            summary = timing.summarise( samples )
+            summary.update( vertexcache.statistics( indices, options.cache ) )
+            summary['overdraw'] = ratio
+            summary['seconds'] = seconds
+            results[stage] = summary
+            if reference is None:
+                reference = pixels
+            print( timing.format_summary( stage, summary ) )
+            print( '    acmr %.3f  atvr %.3f  overdraw %.3f  '
+                   'reordered in %.2fs  %s' % (
+                summary['acmr'], summary['atvr'], ratio, seconds,
+                'same' if ( pixels == reference ).all() else 'DIFFERENT',
+            ) )
+        gl.glDeleteProgram( shader )
+        framebuffer.delete()
+    finally:
+        context.destroy()
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+'''
+Records a frame's GL calls once and submits them again every frame, for
+static scenes, instead of re-running Render's Python each time.
+
+    commands = CommandList()
+    ...
+    def Render( self, mode ):
+        commands.draw( self.RenderScene, mode )   # records, or submits
+
+The first draw() runs the render function once as usual, so that what
+it makes on first use (a Mesh's VAO, a VBO's buffer) is made then, and
+again with every loaded module's gl (and vbo.VBO's GL-calling methods)
+logged by glstub.RecordingGL, which passes the calls on, so that frame
+is drawn twice over.  Calls making GL objects (glGen*, glCreate*) in the
+second run would make another every submit(), so compile() refuses them
+with a ValueError: the render function must make its objects once, or
+be drawn without a command list.  The log is then compiled into a flat
+list of ( function, args ) pairs which submit() makes in a tight loop:
+no dict lookups, loops or try/finally chains, none of Mesh.draw()'s
+decisions.
+
+Float uniforms are pre-resolved further.  Their values, from glUniform*f
+tuples and glUniform*fv arrays alike, are packed into one float32 array,
+values, and set by the raw glUniform*fv entry points with pointers into
+it, skipping PyOpenGL's array conversion.  uniform() returns the view
+of a uniform's packed value, so that animating a uniform is a write into
+the array, not a re-recording.
+
+Anything else changing the scene calls for invalidate(): the next draw()
+records afresh.  Arrays the recorded calls were given are referenced,
+not copied, except for uniforms' values.  The render function mustn't
+rely on what GL calls return, as submit() discards it.
+'''
+import ctypes
+
+import numpy
+
+from OpenGL import GL
+from OpenGL.arrays import vbo
+
+import glstub
+
+
+# GL calls making objects, which can't be submitted over and over
+CREATING = ( 'glGen', 'glCreate' )
+# floats per value, of the uniform setters whose values are packed
+UNIFORM_SIZES = {
+    'glUniform1f': 1, 'glUniform2f': 2, 'glUniform3f': 3, 'glUniform4f': 4,
+    'glUniform1fv': 1, 'glUniform2fv': 2, 'glUniform3fv': 3,
+    'glUniform4fv': 4,
+    'glUniformMatrix2fv': 4, 'glUniformMatrix3fv': 9,
+    'glUniformMatrix4fv': 16,
+}
+
+
+def raw( name ):
+    '''
+    the entry point name, without PyOpenGL's wrapper if it has one
+    '''
+    function = getattr( GL, name )
+    return getattr( function, 'wrappedOperation', function )
+
+
+def _uniform_values( name, args ):
+    '''
+    ( location, count, transpose or None, flat values ) of a uniform call
+    '''
+    if not name.endswith( 'v' ):
+        return args[0], 1, None, args[1:]
+    if name.startswith( 'glUniformMatrix' ):
+        return args[0], args[1], args[2], args[3]
+    return args[0], args[1], None, args[2]
+
+
+class CommandList( object ):
+    '''
+    a recorded frame, as ( function, args ) commands
+    '''
+    def __init__( self ):
+        self.commands = None
+        self.values = None
+        self.slots = {}
+
+    @property
+    def valid( self ):
+        return self.commands is not None
+
+    def __len__( self ):
+        return len( self.commands or () )
+
+    def record( self, render, *args ):
+        '''
+        call render( *args ), drawing as usual, then again keeping its GL
+        calls
+        '''
+        self.invalidate()
+        # unrecorded, for whatever it makes the first time it draws
+        render( *args )
+        recorder = glstub.RecordingGL( GL )
+        patches = glstub.patch( 'gl', GL, recorder )
+        patches += recorder.record_methods(
+            vbo.VBO, glstub.VBO_METHODS, 'VBO.'
+        )
+        try:
+            result = render( *args )
+        finally:
+            glstub.restore( patches )
+        self.compile( recorder )
+        return result
+
+    def compile( self, recorder ):
+        '''
+        turn a RecordingGL's log into commands
+        '''
+        # ( name, function, args, uniform value or None ), in order
+        calls = []
+        size = 0
+        for op, args in zip( recorder.ops, recorder.args ):
+            name = recorder.names[op]
+            if name.startswith( CREATING ):
+                raise ValueError(
+                    '%s makes a GL object every time it is submitted'
+                    % ( name, )
+                )
+            value = None
+            if name in UNIFORM_SIZES:
+                location, count, transpose, value = _uniform_values(
+                    name, args
+                )
+                value = numpy.asarray( value, dtype='f' ).ravel()
+                value = value[:UNIFORM_SIZES[name] * count]
+                size += len( value )
+            calls.append( ( name, recorder.functions[op], args, value ) )
+
+        self.values = values = numpy.zeros( size, dtype='f' )
+        self.slots = {}
+        commands = []
+        program = 0
+        start = 0
+        for name, function, args, value in calls:
+            if name == 'glUseProgram':
+                program = int( args[0] )
+            if value is None:
+                commands.append( ( function, args ) )
+                continue
+            location, count, transpose, _ = _uniform_values( name, args )
+            slot = values[start:start + len( value )]
+            slot[:] = value
+            pointer = ctypes.cast(
+                slot.ctypes.data, ctypes.POINTER( GL.GLfloat )
+            )
+            if transpose is None:
+                arguments = ( location, count, pointer )
+            else:
+                arguments = ( location, count, transpose, pointer )
+            vector = name if name.endswith( 'v' ) else name + 'v'
+            commands.append( ( raw( vector ), arguments ) )
+            self.slots[( program, int( location ) )] = slot
+            start += len( value )
+        self.commands = commands
+
+    def uniform( self, location, program=None ):
+        '''
+        the packed value of the uniform at location (of program, if more
+        than one was used), as a writable float32 array, as last set
+        '''
+        for ( used, at ), value in self.slots.items():
+            if at == location and program in ( None, used ):
+                return value
+        raise KeyError( location )
+
+    def submit( self ):
+        for function, args in self.commands:
+            function( *args )
+
+    def draw( self, render, *args ):
+        '''
+        record render( *args ) if there's nothing valid recorded, else
+        submit what was
+        '''
+        if self.commands is None:
+            return self.record( render, *args )
+        self.submit()
+
+    def invalidate( self ):
+        self.commands = None
+        self.values = None
+        self.slots = {}
@@ -0,0 +1,166 @@
+'''
+The lighting model of lights.py -- dLight, lightLocation and lightContrib
+-- in numpy, evaluated over whole arrays of points and normals at once.
+
+For baking vertex colours offline, and for checking what the GPU drew on
+machines without one:
+
+    colours = shade( positions, normals, LIGHTS, UNIFORM_VALUES, modelview )
+
+gives, for each point, the gl_FragColor the 'array' mode fragment shader
+computes there, before the framebuffer clamps it to [0, 1].  It follows
+the GLSL to the letter, oddities included: the attenuation clamp has its
+arguments in the wrong order, so only limits the factor to at most 1.0.
+
+Calculations are in float32, as on the GPU, in chunks of CHUNK points to
+keep the temporaries small.
+'''
+import numpy
+
+import transforms
+from lights import LIGHT_STRIDE
+
+
+CHUNK = 1 << 16
+VIEW_DIRECTION = numpy.array( ( 0.0, 0.0, -1.0 ), dtype='f' )
+
+
+def _dot( a, b ):
+    return numpy.einsum( '...i,...i->...', a, b )
+
+
+def _normalize( vectors ):
+    length = numpy.sqrt( _dot( vectors, vectors ) )
+    return vectors / length[..., None]
+
+
+def dlight( light_pos, half_light, frag_normal, shininess, distance,
+            attenuations ):
+    '''
+    returns ( ambient, diffuse, specular ) multipliers, each an array of
+    the broadcast shape of the arguments, less their last axis of 3
+    '''
+    n_dot_pos = numpy.maximum( 0.0, _dot( frag_normal, light_pos ) )
+    n_dot_half = numpy.maximum( 0.0, _dot( half_light, frag_normal ) )
+    n_dot_half = n_dot_half ** numpy.float32( shininess )
+    distance = numpy.asarray( distance, dtype='f' )
+    attenuations = numpy.asarray( attenuations, dtype='f' )
+    with numpy.errstate( divide='ignore' ):
+        factor = 1.0 / (
+            attenuations[..., 0] +
+            attenuations[..., 1] * distance +
+            attenuations[..., 2] * distance * distance
+        )
+    # GLSL clamp( 0.0, 1.0, x ) is min( max( 0.0, 1.0 ), x )
+    attenuation = numpy.where(
+        distance != 0.0, numpy.minimum( 1.0, factor ), 1.0
+    ).astype( 'f' )
+    # n_dot_pos is never below the shader's -0.05 cut off, so no test
+    return attenuation, n_dot_pos * attenuation, n_dot_half * attenuation
+
+
+def light_location( position, model_position, normal_matrix ):
+    '''
+    returns ( eye-space direction to the light, distance to it ) from
+    each model_position, for a light at position (a 4-vector).
+    normal_matrix is transforms.normal_matrix( modelview ).
+    '''
+    position = numpy.asarray( position, dtype='f' )
+    if position[3] == 0.0:
+        direction = _normalize( position[:3].dot( normal_matrix ) )
+        shape = numpy.shape( model_position )[:-1]
+        return (
+            numpy.broadcast_to( direction, shape + ( 3, ) ),
+            numpy.zeros( shape, dtype='f' ),
+        )
+    modelspace_vec = position[:3] - model_position
+    distance = numpy.sqrt( _dot( modelspace_vec, modelspace_vec ) )
+    return _normalize( modelspace_vec.dot( normal_matrix ) ), distance
+
+
+def light_contrib( amb, diff, spec, ec_location, distance, attenuation,
+                   normal, material ):
+    '''
+    colour a light adds at each point, as (..., 4) float32.  material is
+    a mapping of 'ambient', 'diffuse', 'specular' and 'shininess'.
+    '''
+    ec_half_angle = _normalize( ec_location - VIEW_DIRECTION )
+    ambient, diffuse, specular = dlight(
+        ec_location, ec_half_angle, normal, material['shininess'],
+        distance, attenuation
+    )
+    return (
+        numpy.multiply.outer( ambient, amb * material['ambient'] ) +
+        numpy.multiply.outer( diffuse, diff * material['diffuse'] ) +
+        numpy.multiply.outer( specular, spec * material['specular'] )
+    )
+
+
+def material_from_uniforms( uniforms ):
+    '''
+    the material and global ambient out of a tutorial's UNIFORM_VALUES
+    '''
+    material = {}
+    for field in ( 'ambient', 'diffuse', 'specular', 'shininess' ):
+        material[field] = numpy.asarray(
+            uniforms['material.' + field], dtype='f'
+        ).reshape( -1 )
+    material['shininess'] = material['shininess'][0]
+    return material, numpy.asarray( uniforms['Global_ambient'], dtype='f' )
+
+
+def lit_colour( positions, normals, lights, material, global_ambient,
+                normal_matrix ):
+    '''
+    the 'array' mode fragment shader's colour, given model space
+    positions, eye space normals (baseNormal), light data shaped
+    (count, LIGHT_STRIDE, 4), and a material from material_from_uniforms
+    '''
+    colour = numpy.empty( ( len( positions ), 4 ), dtype='f' )
+    colour[:] = global_ambient * material['ambient']
+    for light in lights:
+        ec_location, distance = light_location(
+            light[0], positions, normal_matrix
+        )
+        colour += light_contrib(
+            light[1], light[2], light[3], ec_location, distance,
+            light[4, :3], normals, material
+        )
+    return colour
+
+
+def shade( positions, normals, lights, uniforms, modelview, chunk=CHUNK ):
+    '''
+    colours of N points lit by a lights.LightSet, as (N, 4) float32.
+
+    positions and normals -- (N, 3) arrays in model space
+    uniforms -- the tutorial's UNIFORM_VALUES
+    modelview -- as from transforms.default_camera()
+    '''
+    positions = numpy.asarray( positions, dtype='f' )
+    normals = numpy.asarray( normals, dtype='f' )
+    light_data = numpy.asarray(
+        getattr( lights, 'data', lights ), dtype='f'
+    ).reshape( -1, LIGHT_STRIDE, 4 )
+    material, global_ambient = material_from_uniforms( uniforms )
+    normal_matrix = transforms.normal_matrix( numpy.asarray( modelview ) )
+
+    colours = numpy.empty( ( len( positions ), 4 ), dtype='f' )
+    for start in range( 0, len( positions ), chunk ):
+        end = start + chunk
+        # gl_NormalMatrix * normalize( Vertex_normal )
+        colours[start:end] = lit_colour(
+            positions[start:end],
+            _normalize( normals[start:end] ).dot( normal_matrix ),
+            light_data, material, global_ambient, normal_matrix
+        )
+    return colours
+
+
+def to_bytes( colours ):
+    '''
+    colours as an 8 bit framebuffer would store them
+    '''
+    return numpy.round(
+        numpy.clip( colours, 0.0, 1.0 ) * 255.0
+    ).astype( numpy.uint8 )
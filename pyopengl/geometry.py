@@ -0,0 +1,48 @@
+'''
+Procedural meshes as plain numpy arrays, laid out like the VBOs the
+tutorials get from OpenGLContext, for code that must run without it.
+'''
+from math import pi
+
+import numpy
+
+
+# OpenGLContext's quadric layout: x, y, z, s, t, nx, ny, nz
+COORD_STRIDE = 8
+POSITION_OFFSET = 0
+TEXCOORD_OFFSET = 3
+NORMAL_OFFSET = 5
+
+
+def sphere( radius=1.0, slices=32, stacks=16 ):
+    '''
+    returns ( coords, indices ), as Sphere(radius).compile() uploads them:
+    an (N, 8) float32 array of interleaved vertices, and a flat array of
+    counter-clockwise triangle indices
+    '''
+    phi = numpy.linspace( 0.0, pi, stacks + 1 )
+    theta = numpy.linspace( 0.0, 2.0 * pi, slices + 1 )
+    phi, theta = numpy.meshgrid( phi, theta, indexing='ij' )
+    normals = numpy.dstack( (
+        numpy.sin( phi ) * numpy.sin( theta ),
+        numpy.cos( phi ),
+        numpy.sin( phi ) * numpy.cos( theta ),
+    ) ).reshape( -1, 3 )
+
+    coords = numpy.empty( ( len( normals ), COORD_STRIDE ), dtype='f' )
+    coords[:, 0:3] = normals * radius
+    coords[:, 3] = ( theta / ( 2.0 * pi ) ).ravel()
+    coords[:, 4] = ( 1.0 - phi / pi ).ravel()
+    coords[:, 5:8] = normals
+
+    row = slices + 1
+    top_left = (
+        numpy.arange( stacks )[:, None] * row + numpy.arange( slices )
+    ).ravel()
+    bottom_left = top_left + row
+    indices = numpy.column_stack( (
+        top_left, bottom_left, bottom_left + 1,
+        top_left, bottom_left + 1, top_left + 1,
+    ) ).ravel()
+    dtype = numpy.uint16 if len( coords ) <= 0x10000 else numpy.uint32
+    return coords, indices.astype( dtype )
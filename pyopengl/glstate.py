@@ -0,0 +1,229 @@
+'''
+Remembers what is bound, so that binding it again costs nothing: the
+program in use, buffers, the vertex array, textures on each unit, which
+vertex attributes are enabled, and capabilities.
+
+Each tutorial's Render binds everything it needs and unbinds it again in
+a finally clause, so a frame of many objects sharing a program or a
+texture pays for every bind twice over.  Binding through a GLState
+instead, and leaving things bound, only calls GL when something changes:
+
+    state = GLState()
+    for item in scene:
+        state.use_program( item.shader )
+        state.bind_texture( 0, gl.GL_TEXTURE_2D, item.texture )
+        item.mesh.draw()        # a Mesh( ..., state=state )
+    state.reset()               # unbind everything, once, at the end
+
+GL calls made around the state leave it out of date: follow them with
+invalidate(), and the next of each kind of call is made unconditionally.
+issued and skipped count the calls made and avoided, by kind, since
+reset_counters().
+'''
+from collections import Counter
+import numbers
+
+from OpenGL import GL as gl
+
+
+KINDS = (
+    'program', 'vertex_array', 'buffer', 'layout', 'active_texture',
+    'texture', 'attribute', 'divisor', 'capability',
+)
+
+
+def _vbo_target( buffer ):
+    target = buffer.target
+    # OpenGL.arrays.vbo.VBOs keep their target as a name
+    resolve = getattr( buffer, 'resolve', None )
+    return resolve( target ) if resolve is not None else target
+
+
+def _bound( value ):
+    # a buffer name or VBO, not 0 or unknown
+    return value is not None and not (
+        isinstance( value, numbers.Integral ) and value == 0
+    )
+
+
+class GLState( object ):
+    '''
+    the bindings we've made, None where we don't know
+    '''
+    def __init__( self ):
+        self.issued = Counter()
+        self.skipped = Counter()
+        self.invalidate()
+
+    def invalidate( self ):
+        '''
+        forget everything, after GL calls made without going through us
+        '''
+        self.program = None
+        self.vertex_array = None
+        self.buffers = {}
+        self.active_unit = None
+        self.textures = {}
+        # these belong to the vertex array bound, so are kept by it
+        self.elements = {}
+        self.attributes = {}
+        self.layouts = {}
+        self.divisors = {}
+        self.capabilities = {}
+
+    def _changes( self, kind, known, wanted ):
+        '''
+        whether wanted differs from known, counting the call to be made
+        or skipped
+        '''
+        if known is not None and known == wanted:
+            self.skipped[kind] += 1
+            return False
+        self.issued[kind] += 1
+        return True
+
+    def use_program( self, program ):
+        program = program or 0
+        if self._changes( 'program', self.program, program ):
+            gl.glUseProgram( program )
+            self.program = program
+
+    def bind_vertex_array( self, vertex_array ):
+        vertex_array = vertex_array or 0
+        if self._changes( 'vertex_array', self.vertex_array, vertex_array ):
+            gl.glBindVertexArray( vertex_array )
+            self.vertex_array = vertex_array
+
+    def _buffers( self, target ):
+        # the element array binding is the vertex array's, not global
+        if target == gl.GL_ELEMENT_ARRAY_BUFFER:
+            return self.elements.setdefault( self.vertex_array, {} )
+        return self.buffers
+
+    def bind_buffer( self, target, buffer ):
+        '''
+        bind a buffer name to target
+        '''
+        buffer = buffer or 0
+        bound = self._buffers( target )
+        if self._changes( 'buffer', bound.get( target ), buffer ):
+            gl.glBindBuffer( target, buffer )
+            bound[target] = buffer
+
+    def bind_vbo( self, buffer ):
+        '''
+        bind an OpenGL.arrays.vbo.VBO to its target, also uploading its
+        data if it has changed, as its bind() does
+        '''
+        target = _vbo_target( buffer )
+        bound = self._buffers( target )
+        wanted = buffer if buffer.copied else None
+        if self._changes( 'buffer', bound.get( target ), wanted ):
+            buffer.bind()
+            bound[target] = buffer
+
+    def set_layout( self, owner ):
+        '''
+        whether owner (a Mesh, say) must set its attribute pointers,
+        having not been the last to set them on this vertex array.  The
+        buffers they point into must not have changed since.
+        '''
+        key = self.vertex_array
+        if self._changes( 'layout', self.layouts.get( key ), owner ):
+            self.layouts[key] = owner
+            return True
+        return False
+
+    def bind_texture( self, unit, target, texture ):
+        '''
+        bind texture to target on texture unit (0, 1, ...), only making
+        that unit active if it needs to change
+        '''
+        texture = texture or 0
+        key = ( unit, target )
+        if not self._changes( 'texture', self.textures.get( key ), texture ):
+            return
+        if self._changes( 'active_texture', self.active_unit, unit ):
+            gl.glActiveTexture( gl.GL_TEXTURE0 + unit )
+            self.active_unit = unit
+        gl.glBindTexture( target, texture )
+        self.textures[key] = texture
+
+    def enable_attributes( self, locations ):
+        '''
+        enable exactly these vertex attribute arrays on the bound vertex
+        array, disabling any others we enabled
+        '''
+        enabled = self.attributes.setdefault( self.vertex_array, set() )
+        locations = set( locations )
+        for location in locations - enabled:
+            self.issued['attribute'] += 1
+            gl.glEnableVertexAttribArray( location )
+        for location in enabled - locations:
+            self.issued['attribute'] += 1
+            gl.glDisableVertexAttribArray( location )
+        self.skipped['attribute'] += len( locations & enabled )
+        self.attributes[self.vertex_array] = locations
+
+    def set_divisor( self, location, divisor ):
+        divisors = self.divisors.setdefault( self.vertex_array, {} )
+        if self._changes( 'divisor', divisors.get( location ), divisor ):
+            gl.glVertexAttribDivisor( location, divisor )
+            divisors[location] = divisor
+
+    def enable( self, capability, enabled=True ):
+        if self._changes(
+            'capability', self.capabilities.get( capability ), enabled
+        ):
+            ( gl.glEnable if enabled else gl.glDisable )( capability )
+            self.capabilities[capability] = enabled
+
+    def disable( self, capability ):
+        self.enable( capability, False )
+
+    def reset( self ):
+        '''
+        unbind everything we bound, disable the attributes we enabled, and
+        leave texture unit 0 active, as the tutorials expect to find them
+        '''
+        for ( unit, target ), texture in list( self.textures.items() ):
+            if texture:
+                self.bind_texture( unit, target, 0 )
+        if self.active_unit:
+            self.issued['active_texture'] += 1
+            gl.glActiveTexture( gl.GL_TEXTURE0 )
+            self.active_unit = 0
+        if self.vertex_array:
+            self.bind_vertex_array( 0 )
+        self.enable_attributes( () )
+        divisors = self.divisors.get( self.vertex_array, {} )
+        for location, divisor in list( divisors.items() ):
+            if divisor:
+                self.set_divisor( location, 0 )
+        for target, buffer in list( self.buffers.items() ):
+            if _bound( buffer ):
+                self.bind_buffer( target, 0 )
+        elements = self.elements.get( self.vertex_array, {} )
+        if _bound( elements.get( gl.GL_ELEMENT_ARRAY_BUFFER ) ):
+            self.bind_buffer( gl.GL_ELEMENT_ARRAY_BUFFER, 0 )
+        self.layouts.clear()
+        if self.program:
+            self.use_program( 0 )
+
+    def counters( self ):
+        '''
+        { 'issued': n, 'skipped': n, kind: ( issued, skipped ) } of the
+        kinds used, since reset_counters()
+        '''
+        result = {
+            'issued': sum( self.issued.values() ),
+            'skipped': sum( self.skipped.values() ),
+        }
+        for kind in KINDS:
+            if self.issued[kind] or self.skipped[kind]:
+                result[kind] = ( self.issued[kind], self.skipped[kind] )
+        return result
+
+    def reset_counters( self ):
+        self.issued.clear()
+        self.skipped.clear()
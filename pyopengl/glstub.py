@@ -0,0 +1,396 @@
+'''
+A stand-in for the OpenGL.GL module which needs no GL context, so the
+tutorials' calls can be counted and traced (see gltrace.py) on machines
+with no GPU at all.
+
+    stub = StubGL()
+    patches = install( stub )      # every module's gl is now the stub
+    ...
+    restore( patches )
+
+Every gl* function records its name and arguments in stub.calls and
+returns something plausible: fresh names from glGen* and glCreate*,
+locations from glGet*Location, success from status queries, and None
+from the rest.  GL_* constants and GL types are the real ones.
+
+RecordingGL logs calls more cheaply, in an array of opcodes, so that
+they can be replayed, to the stub or to the real GL it passes them on
+to; see bench_python_overhead.py.
+
+install() also swaps OpenGL.arrays.vbo for StubVBOs, OpenGL.GL.shaders
+(as used by shadercache.py) for stub compilation, and OpenGLContext's
+Sphere for one built by geometry.sphere(), since all of those would
+otherwise call the real GL.  Nothing is drawn.
+'''
+import array
+import ctypes
+import itertools
+import sys
+
+import numpy
+
+from OpenGL import GL
+
+import geometry
+
+
+# vbo.VBO's methods which call GL from inside PyOpenGL
+VBO_METHODS = ( 'bind', 'unbind', 'delete' )
+# queries whose answer the tutorials check is GL_TRUE
+STATUS_QUERIES = (
+    'GL_COMPILE_STATUS', 'GL_LINK_STATUS', 'GL_VALIDATE_STATUS',
+)
+
+
+class StubGL( object ):
+    '''
+    records calls in calls, a list of ( name, args ) tuples
+    '''
+    def __init__( self, record=True ):
+        self.record = record
+        self.calls = []
+        self._names = itertools.count( 1 )
+        self._locations = {}
+
+    def __getattr__( self, name ):
+        if name.startswith( 'gl' ):
+            value = _StubFunction( self, name )
+        elif name.startswith( 'GL' ):
+            # constants, and types like GLfloat
+            value = getattr( GL, name )
+        else:
+            raise AttributeError( name )
+        # found once; from then on an ordinary attribute
+        setattr( self, name, value )
+        return value
+
+    def new_name( self ):
+        return next( self._names )
+
+    def location( self, program, name ):
+        key = ( program, name )
+        if key not in self._locations:
+            self._locations[key] = len( self._locations )
+        return self._locations[key]
+
+    def reset( self ):
+        del self.calls[:]
+
+
+class _StubFunction( object ):
+
+    def __init__( self, stub, name ):
+        self.stub = stub
+        self.__name__ = name
+        self.result = _result( name )
+
+    def __call__( self, *args ):
+        if self.stub.record:
+            self.stub.calls.append( ( self.__name__, args ) )
+        if self.result is not None:
+            return self.result( self.stub, args )
+
+    # so that "if gl.glGenVertexArrays:" finds every entry point present
+    def __bool__( self ):
+        return True
+    __nonzero__ = __bool__
+
+
+class RecordingGL( object ):
+    '''
+    logs every gl* call as an opcode in ops (an array.array) and, with
+    record_args, its argument tuple in args.  names[op] and
+    functions[op] are the entry point called.
+
+    gl -- pass calls on to this, eg. OpenGL.GL; by default a StubGL
+        answers them, and there's no GL at all
+    '''
+    def __init__( self, gl=None, record_args=True ):
+        self.gl = gl if gl is not None else StubGL( record=False )
+        self.record_args = record_args
+        self.names = []
+        self.functions = []
+        self.ops = array.array( 'H' )
+        self.args = []
+
+    def __getattr__( self, name ):
+        value = getattr( self.gl, name )
+        # entry points the driver lacks stay false, unrecorded
+        if name.startswith( 'gl' ) and callable( value ) and value:
+            value = self._recorder( self._opcode( name, value ), value )
+        # found once; from then on an ordinary attribute
+        setattr( self, name, value )
+        return value
+
+    def _opcode( self, name, function ):
+        self.names.append( name )
+        self.functions.append( function )
+        return len( self.names ) - 1
+
+    def _recorder( self, op, function ):
+        log_op = self.ops.append
+        log_args = self.args.append
+        if self.record_args:
+            def record( *args ):
+                log_op( op )
+                log_args( args )
+                return function( *args )
+        else:
+            def record( *args ):
+                log_op( op )
+                return function( *args )
+        record.__name__ = self.names[op]
+        return record
+
+    def record_methods( self, cls, names, prefix ):
+        '''
+        log calls of cls's methods names, as prefix + name.  Returns the
+        patches, for restore().
+        '''
+        patches = []
+        for name in names:
+            original = getattr( cls, name )
+            try:
+                setattr( cls, name, self._recorder(
+                    self._opcode( prefix + name, original ), original
+                ) )
+            except TypeError:
+                # a compiled class
+                continue
+            patches.append( ( cls, name, original ) )
+        return patches
+
+    def __len__( self ):
+        return len( self.ops )
+
+    def reset( self ):
+        # in place: the recorders hold the arrays' append methods
+        del self.ops[:]
+        del self.args[:]
+
+    def counts( self ):
+        '''
+        { name: calls } since the last reset()
+        '''
+        counts = numpy.bincount(
+            numpy.array( self.ops, dtype=numpy.intp ),
+            minlength=len( self.names )
+        )
+        return dict(
+            ( name, int( count ) )
+            for name, count in zip( self.names, counts ) if count
+        )
+
+    def replay( self, start=0, end=None, functions=None ):
+        '''
+        make the logged calls start to end again, to functions (by
+        default those they went to first) indexed by opcode
+        '''
+        if not self.record_args:
+            raise RuntimeError( 'replay needs the arguments recorded' )
+        if functions is None:
+            functions = self.functions
+        if end is None:
+            end = len( self.ops )
+        for op, args in zip(
+            itertools.islice( self.ops, start, end ),
+            itertools.islice( self.args, start, end ),
+        ):
+            functions[op]( *args )
+
+
+def _generate( stub, args ):
+    count = args[0] if args else 1
+    if count == 1:
+        return stub.new_name()
+    return [ stub.new_name() for _ in range( count ) ]
+
+
+def _create( stub, args ):
+    return stub.new_name()
+
+
+def _location( stub, args ):
+    return stub.location( args[0], args[1] )
+
+
+def _parameter( stub, args ):
+    if getattr( args[-1], 'name', None ) in STATUS_QUERIES:
+        return GL.GL_TRUE
+    return 0
+
+
+def _constant( value ):
+    return lambda stub, args: value
+
+
+RESULTS = {
+    'glCheckFramebufferStatus': _constant( GL.GL_FRAMEBUFFER_COMPLETE ),
+    'glClientWaitSync': _constant( GL.GL_ALREADY_SIGNALED ),
+    'glFenceSync': _create,
+    'glGetError': _constant( GL.GL_NO_ERROR ),
+    'glGetIntegerv': _constant( 0 ),
+    'glGetProgramInfoLog': _constant( b'' ),
+    'glGetProgramiv': _parameter,
+    'glGetShaderInfoLog': _constant( b'' ),
+    'glGetShaderiv': _parameter,
+    'glGetString': _constant( b'glstub' ),
+    'glGetUniformBlockIndex': _location,
+}
+
+
+def _result( name ):
+    if name in RESULTS:
+        return RESULTS[name]
+    if name.startswith( 'glGen' ):
+        return _generate
+    if name.startswith( 'glCreate' ):
+        return _create
+    if name.endswith( 'Location' ):
+        return _location
+    return None
+
+
+class StubVBO( object ):
+    '''
+    enough of OpenGL.arrays.vbo.VBO for the tutorials, calling gl
+    '''
+    def __init__( self, gl, data, usage='GL_DYNAMIC_DRAW',
+                  target='GL_ARRAY_BUFFER', size=None ):
+        self.gl = gl
+        self.data = data
+        self.usage = _constant_named( usage )
+        self.target = _constant_named( target )
+        self.size = size
+        self.buffer = None
+        self.copied = False
+
+    def create_buffers( self ):
+        self.buffer = self.gl.glGenBuffers( 1 )
+
+    def copy_data( self ):
+        if not self.copied:
+            size = self.size
+            if size is None:
+                size = getattr( self.data, 'nbytes', 0 )
+            self.gl.glBufferData( self.target, size, self.data, self.usage )
+            self.copied = True
+
+    def set_array( self, data, size=None ):
+        self.data = data
+        self.size = size
+        self.copied = False
+
+    def bind( self ):
+        if self.buffer is None:
+            self.create_buffers()
+        self.gl.glBindBuffer( self.target, self.buffer )
+        self.copy_data()
+
+    def unbind( self ):
+        self.gl.glBindBuffer( self.target, 0 )
+
+    def __add__( self, offset ):
+        return ctypes.c_void_p( offset )
+
+    def delete( self ):
+        if self.buffer is not None:
+            self.gl.glDeleteBuffers( 1, [ self.buffer ] )
+            self.buffer = None
+
+
+def _constant_named( value ):
+    if isinstance( value, str ):
+        return getattr( GL, value )
+    return value
+
+
+class StubVBOModule( object ):
+    '''
+    stands in for the OpenGL.arrays.vbo module
+    '''
+    def __init__( self, gl ):
+        self.gl = gl
+
+    def VBO( self, data, *args, **named ):
+        return StubVBO( self.gl, data, *args, **named )
+
+
+class StubShaders( object ):
+    '''
+    stands in for OpenGL.GL.shaders
+    '''
+    def __init__( self, gl ):
+        self.gl = gl
+
+    def compileShader( self, source, type ):
+        shader = self.gl.glCreateShader( type )
+        self.gl.glShaderSource( shader, source )
+        self.gl.glCompileShader( shader )
+        return shader
+
+
+class StubSphere( object ):
+    '''
+    stands in for OpenGLContext.scenegraph.basenodes.Sphere
+    '''
+    def __init__( self, vbo, radius=1.0 ):
+        self.vbo = vbo
+        self.radius = radius
+
+    def compile( self ):
+        coords, indices = geometry.sphere( self.radius )
+        return (
+            self.vbo.VBO( coords ),
+            self.vbo.VBO( indices, target='GL_ELEMENT_ARRAY_BUFFER' ),
+            len( indices ),
+        )
+
+
+def _patchable( name ):
+    # PyOpenGL and OpenGLContext keep the real GL
+    return not name.startswith( 'OpenGL' ) \
+        and name not in ( __name__, 'gltrace' )
+
+
+def patch( name, original, replacement ):
+    '''
+    point every loaded module's global name at replacement, where it was
+    original.  Returns the patches, for restore().
+    '''
+    patches = []
+    for module_name, module in list( sys.modules.items() ):
+        if module is None or not _patchable( module_name ):
+            continue
+        if getattr( module, name, None ) is original:
+            setattr( module, name, replacement )
+            patches.append( ( module, name, original ) )
+    return patches
+
+
+def restore( patches ):
+    for module, name, original in reversed( patches ):
+        setattr( module, name, original )
+
+
+def install( gl ):
+    '''
+    make gl the OpenGL.GL of every module loaded so far: a StubGL, or
+    something wrapping one (a gltrace.Tracer, say)
+    '''
+    from OpenGL.arrays import vbo
+    from OpenGL.GL import shaders
+    vbo_module = StubVBOModule( gl )
+    patches = patch( 'gl', GL, gl )
+    patches += patch( 'vbo', vbo, vbo_module )
+    patches += patch( 'shaders', shaders, StubShaders( gl ) )
+    try:
+        from OpenGLContext.scenegraph.basenodes import Sphere
+    except ImportError:
+        pass
+    else:
+        patches += patch(
+            'Sphere', Sphere,
+            lambda radius=1.0: StubSphere( vbo_module, radius )
+        )
+    return patches
@@ -0,0 +1,351 @@
+'''
+Traces every call a tutorial makes through its gl module, frame by frame,
+to show how many PyOpenGL calls each Render makes and where the time in
+Python goes.
+
+    python gltrace.py 07-multiple-lights.py --frames 20 --trace trace.json
+    python gltrace.py 09-point-lights.py --stub     # no GPU needed
+    python gltrace.py ../joes/main.py --top 5
+
+A Tracer wraps the OpenGL.GL module (or a glstub.StubGL) and is put in
+place of every loaded module's gl, so the tutorials, mesh.py and the
+other helpers all call through it unchanged.  Each call's name, arguments
+and duration are recorded in the frame open at the time, between
+begin_frame() and end_frame(); calls outside any frame (OnInit's, say)
+are kept as setup.
+
+--trace writes Chrome's trace event format, which chrome://tracing and
+ui.perfetto.dev load: a slice per frame, with a slice per call inside
+it.  The summary printed is the calls per frame, and the entry points
+costing most in total.
+
+Times are of the Python call, PyOpenGL's wrapping and error checking
+included, since that's what we're after; the GPU is waited for after
+each frame, untraced.  Tracing has an overhead of its own, so judge
+frame times by headless.py, not by this.  OpenGL.arrays.vbo.VBO calls GL
+from inside PyOpenGL, so its bind(), unbind() and delete() are traced
+instead, as VBO.bind and so on (unless OpenGL_accelerate's compiled VBO
+is in use, which can't be patched).  With --stub, glstub's VBOs call
+through the tracer, so their calls are seen directly.
+'''
+import json
+import numbers
+import optparse
+from contextlib import contextmanager
+from os.path import basename
+
+# first, to choose the headless GL platform before OpenGL is imported
+import headless
+import glstub
+import timing
+from OpenGL import GL
+from OpenGL.arrays import vbo
+
+
+DEFAULT_TOP = 10
+# longest string argument kept whole, eg. a uniform's name
+MAX_STRING = 64
+MAX_SEQUENCE = 16
+
+
+def describe( value ):
+    '''
+    a JSON-friendly summary of a call's argument
+    '''
+    name = getattr( value, 'name', None )
+    if isinstance( name, str ):
+        # a GL constant
+        return name
+    if isinstance( value, numbers.Integral ):
+        return int( value )
+    if isinstance( value, numbers.Real ):
+        return float( value )
+    if isinstance( value, str ):
+        if len( value ) > MAX_STRING:
+            return value[:MAX_STRING - 3] + '...'
+        return value
+    shape = getattr( value, 'shape', None )
+    if shape is not None:
+        return '%s%s' % ( getattr( value, 'dtype', '' ), tuple( shape ) )
+    if isinstance( value, ( list, tuple ) ) and len( value ) <= MAX_SEQUENCE:
+        return [ describe( item ) for item in value ]
+    return type( value ).__name__
+
+
+class Frame( object ):
+    '''
+    the calls made in one frame, as ( name, start, duration, args )
+    '''
+    def __init__( self, index, start, duration, calls ):
+        self.index = index
+        self.start = start
+        self.duration = duration
+        self.calls = calls
+
+
+class Tracer( object ):
+    '''
+    stands in for gl, recording each gl* call made through it
+
+    gl -- the module (or stub) to call
+    record_args -- keep each call's arguments, for the trace
+    '''
+    def __init__( self, gl=GL, record_args=True ):
+        self.gl = gl
+        self.record_args = record_args
+        self.origin = timing.clock()
+        self.setup = []
+        self.frames = []
+        # where calls are recorded now
+        self.calls = self.setup
+        self.frame_start = None
+
+    def __getattr__( self, name ):
+        value = getattr( self.gl, name )
+        # entry points the driver lacks stay false, unwrapped
+        if name.startswith( 'gl' ) and callable( value ) and value:
+            value = self.wrap( name, value )
+        # found once; from then on an ordinary attribute
+        setattr( self, name, value )
+        return value
+
+    def wrap( self, name, function ):
+        tracer = self
+        clock = timing.clock
+
+        def traced( *args, **named ):
+            start = clock()
+            try:
+                return function( *args, **named )
+            finally:
+                tracer.calls.append( (
+                    name, start, clock() - start,
+                    args if tracer.record_args else (),
+                ) )
+        traced.__name__ = name
+        return traced
+
+    def trace_methods( self, cls, names, prefix ):
+        '''
+        trace cls's methods names, as prefix + name.  Returns the patches,
+        for glstub.restore().
+        '''
+        patches = []
+        for name in names:
+            original = getattr( cls, name )
+            try:
+                setattr( cls, name, self.wrap( prefix + name, original ) )
+            except TypeError:
+                # a compiled class
+                continue
+            patches.append( ( cls, name, original ) )
+        return patches
+
+    def begin_frame( self ):
+        self.calls = []
+        self.frame_start = timing.clock()
+
+    def end_frame( self ):
+        self.frames.append( Frame(
+            len( self.frames ), self.frame_start,
+            timing.clock() - self.frame_start, self.calls,
+        ) )
+        self.calls = self.setup
+
+    @contextmanager
+    def frame( self ):
+        self.begin_frame()
+        try:
+            yield
+        finally:
+            self.end_frame()
+
+    def _microseconds( self, start ):
+        return ( start - self.origin ) * 1e6
+
+    def _call_events( self, calls, category ):
+        return [
+            {
+                'name': name, 'cat': category, 'ph': 'X', 'pid': 1, 'tid': 1,
+                'ts': self._microseconds( start ), 'dur': duration * 1e6,
+                'args': { 'args': [ describe( arg ) for arg in args ] },
+            }
+            for name, start, duration, args in calls
+        ]
+
+    def chrome_trace( self ):
+        '''
+        the trace as a dict in Chrome's trace event format
+        '''
+        events = self._call_events( self.setup, 'setup' )
+        for frame in self.frames:
+            events.append( {
+                'name': 'frame %d' % ( frame.index, ), 'cat': 'frame',
+                'ph': 'X', 'pid': 1, 'tid': 1,
+                'ts': self._microseconds( frame.start ),
+                'dur': frame.duration * 1e6,
+                'args': { 'calls': len( frame.calls ) },
+            } )
+            events.extend( self._call_events( frame.calls, 'gl' ) )
+        return { 'traceEvents': events, 'displayTimeUnit': 'ms' }
+
+    def write_chrome_trace( self, path ):
+        with open( path, 'w' ) as output:
+            json.dump( self.chrome_trace(), output )
+
+    def summary( self, top=DEFAULT_TOP ):
+        '''
+        a dict of per-frame call counts and times (in milliseconds), and
+        the top entry points by total time
+        '''
+        count = len( self.frames ) or 1
+        calls = [ len( frame.calls ) for frame in self.frames ] or [ 0 ]
+        frame_time = sum( frame.duration for frame in self.frames )
+        entry_points = {}
+        for frame in self.frames:
+            for name, start, duration, args in frame.calls:
+                entry = entry_points.setdefault( name, [ 0, 0.0 ] )
+                entry[0] += 1
+                entry[1] += duration
+        gl_time = sum( total for _, total in entry_points.values() )
+        ranked = sorted(
+            entry_points.items(), key=lambda item: item[1][1], reverse=True
+        )
+        return {
+            'frames': len( self.frames ),
+            'setup_calls': len( self.setup ),
+            'calls_per_frame': sum( calls ) / float( count ),
+            'min_calls': min( calls ),
+            'max_calls': max( calls ),
+            'frame_ms': frame_time * 1000.0 / count,
+            'gl_ms': gl_time * 1000.0 / count,
+            'top': [
+                {
+                    'name': name,
+                    'calls': calls,
+                    'calls_per_frame': calls / float( count ),
+                    'total_ms': total * 1000.0,
+                    'mean_us': total * 1e6 / calls,
+                    'share': total / frame_time if frame_time else 0.0,
+                }
+                for name, ( calls, total ) in ranked[:top]
+            ],
+        }
+
+
+def format_summary( summary ):
+    '''
+    the summary as a table, one line per entry point
+    '''
+    lines = [
+        '%d frames, %d setup calls' % (
+            summary['frames'], summary['setup_calls'],
+        ),
+        '%.1f calls/frame (%d-%d), %.3f ms/frame, %.3f ms of it in gl calls'
+        % (
+            summary['calls_per_frame'], summary['min_calls'],
+            summary['max_calls'], summary['frame_ms'], summary['gl_ms'],
+        ),
+        '',
+        '%-36s %8s %8s %10s %9s %7s' % (
+            'entry point', 'calls', '/frame', 'total ms', 'mean us',
+            'frame%',
+        ),
+    ]
+    for entry in summary['top']:
+        lines.append( '%-36s %8d %8.1f %10.3f %9.2f %6.1f%%' % (
+            entry['name'], entry['calls'], entry['calls_per_frame'],
+            entry['total_ms'], entry['mean_us'], entry['share'] * 100.0,
+        ) )
+    return '\n'.join( lines )
+
+
+def _trace( path, frames, size, warmup, gl, stub, record_args ):
+    target = headless.make_target( path )
+    tracer = Tracer( gl, record_args )
+    if stub:
+        patches = glstub.install( tracer )
+    else:
+        patches = glstub.patch( 'gl', GL, tracer )
+        patches += tracer.trace_methods(
+            vbo.VBO, glstub.VBO_METHODS, 'VBO.'
+        )
+    try:
+        target.init( size )
+        total = warmup + frames
+        for frame in range( total ):
+            # warmup frames' calls go to setup
+            if frame >= warmup:
+                tracer.begin_frame()
+            target.render( frame, total )
+            if frame >= warmup:
+                tracer.end_frame()
+            if not stub:
+                GL.glFinish()
+    finally:
+        glstub.restore( patches )
+    return tracer
+
+
+def trace( path, frames, size=headless.DEFAULT_SIZE, warmup=1, stub=False,
+           record_args=True ):
+    '''
+    render frames of the script at path, returning the Tracer.  With
+    stub, against a glstub.StubGL, with no GL context at all.
+    '''
+    if stub:
+        return _trace(
+            path, frames, size, warmup, glstub.StubGL( record=False ),
+            True, record_args
+        )
+    context = headless.OffscreenContext( size )
+    try:
+        framebuffer = headless.Framebuffer( size )
+        try:
+            framebuffer.bind()
+            return _trace(
+                path, frames, size, warmup, GL, False, record_args
+            )
+        finally:
+            framebuffer.delete()
+    finally:
+        context.destroy()
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser( usage='%prog [options] TUTORIAL.py' )
+    parser.add_option( '-n', '--frames', type='int', default=10 )
+    parser.add_option( '-w', '--warmup', type='int', default=1,
+        help='frames rendered first, their calls counted as setup' )
+    parser.add_option( '-s', '--size', default='%dx%d' % headless.DEFAULT_SIZE,
+        help='framebuffer WIDTHxHEIGHT' )
+    parser.add_option( '--stub', action='store_true',
+        help='call a glstub.StubGL instead of GL, which needs no GPU' )
+    parser.add_option( '--trace', metavar='FILE',
+        help='write a Chrome/Perfetto trace to FILE' )
+    parser.add_option( '--top', type='int', default=DEFAULT_TOP,
+        help='entry points to list [%default]' )
+    parser.add_option( '--no-args', action='store_true',
+        help="don't record calls' arguments" )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the summary to FILE' )
+    options, paths = parser.parse_args( argv )
+    if len( paths ) != 1:
+        parser.error( 'name one tutorial script' )
+
+    tracer = trace(
+        paths[0], options.frames, headless.parse_size( options.size ),
+        options.warmup, options.stub, not options.no_args
+    )
+    summary = tracer.summary( options.top )
+    print( basename( paths[0] ) )
+    print( format_summary( summary ) )
+    if options.trace:
+        tracer.write_chrome_trace( options.trace )
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( summary, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+'''
+Renders any of the tutorials offscreen, with no display, and reports
+frame-time percentiles.
+
+    python headless.py 09-point-lights.py --frames 500 --size 1280x720
+    python headless.py ../joes/main.py
+    python headless.py 04-uniform-values-tweening.py --fraction 0.25 \
+        --frames 1 --warmup 0 --png 04.png
+
+Each tutorial's TestContext is given HeadlessContext as its BaseContext
+instead of the interactive window from testingcontext.getInteractive(),
+and renders into a framebuffer object.  joes/main.py has no TestContext,
+so its Resources and render() are driven directly.
+
+The GL context comes from EGL's surfaceless platform by default, which
+Mesa provides in software (llvmpipe) on machines with no GPU.  To use
+OSMesa instead, run with PYOPENGL_PLATFORM=osmesa.
+'''
+import os
+os.environ.setdefault( 'PYOPENGL_PLATFORM', 'egl' )
+os.environ.setdefault( 'EGL_PLATFORM', 'surfaceless' )
+
+import ctypes
+import json
+import optparse
+import re
+import sys
+from os.path import abspath, basename, dirname, splitext
+
+from OpenGL import GL as gl
+
+import pngio
+import timing
+import transforms
+
+
+DEFAULT_SIZE = ( 640, 480 )
+
+
+class OffscreenContext( object ):
+    '''
+    a GL context with no window, made current on creation
+    '''
+    def __init__( self, size ):
+        self.size = size
+        self.platform = os.environ['PYOPENGL_PLATFORM']
+        if self.platform == 'osmesa':
+            self._create_osmesa()
+        elif self.platform == 'egl':
+            self._create_egl()
+        else:
+            raise RuntimeError(
+                'headless rendering needs PYOPENGL_PLATFORM=egl or osmesa, '
+                'not %r' % ( self.platform, )
+            )
+
+    def _create_egl( self ):
+        from OpenGL import EGL
+        self.display = EGL.eglGetDisplay( EGL.EGL_DEFAULT_DISPLAY )
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        EGL.eglInitialize(
+            self.display, ctypes.pointer( major ), ctypes.pointer( minor )
+        )
+        attributes = ( EGL.EGLint * 5 )(
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_NONE,
+        )
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        EGL.eglChooseConfig(
+            self.display, attributes,
+            ctypes.pointer( config ), 1, ctypes.pointer( count )
+        )
+        if not count.value:
+            raise RuntimeError( 'no EGL config supports desktop OpenGL' )
+        EGL.eglBindAPI( EGL.EGL_OPENGL_API )
+        self.context = EGL.eglCreateContext(
+            self.display, config, EGL.EGL_NO_CONTEXT, None
+        )
+        # surfaceless where the driver allows it, else a token pbuffer,
+        # since everything is drawn into our own framebuffer object anyway
+        self.surface = EGL.EGL_NO_SURFACE
+        try:
+            made_current = EGL.eglMakeCurrent(
+                self.display, self.surface, self.surface, self.context
+            )
+        except EGL.EGLError:
+            made_current = False
+        if not made_current:
+            pbuffer = ( EGL.EGLint * 5 )(
+                EGL.EGL_WIDTH, 1, EGL.EGL_HEIGHT, 1, EGL.EGL_NONE
+            )
+            self.surface = EGL.eglCreatePbufferSurface(
+                self.display, config, pbuffer
+            )
+            EGL.eglMakeCurrent(
+                self.display, self.surface, self.surface, self.context
+            )
+
+    def _create_osmesa( self ):
+        from OpenGL import osmesa
+        from OpenGL import arrays
+        width, height = self.size
+        self.context = osmesa.OSMesaCreateContextExt(
+            osmesa.OSMESA_RGBA, 24, 0, 0, None
+        )
+        # OSMesa insists on a client-side colour buffer to be current with
+        self.buffer = arrays.GLubyteArray.zeros( ( height, width, 4 ) )
+        if not osmesa.OSMesaMakeCurrent(
+            self.context, self.buffer, gl.GL_UNSIGNED_BYTE, width, height
+        ):
+            raise RuntimeError( 'could not make OSMesa context current' )
+
+    def destroy( self ):
+        if self.platform == 'osmesa':
+            from OpenGL import osmesa
+            osmesa.OSMesaDestroyContext( self.context )
+        else:
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(
+                self.display,
+                EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT
+            )
+            if self.surface != EGL.EGL_NO_SURFACE:
+                EGL.eglDestroySurface( self.display, self.surface )
+            EGL.eglDestroyContext( self.display, self.context )
+            EGL.eglTerminate( self.display )
+
+
+class Framebuffer( object ):
+    '''
+    colour + depth framebuffer object to render frames into
+    '''
+    def __init__( self, size ):
+        self.size = width, height = size
+        self.fbo = gl.glGenFramebuffers( 1 )
+        self.color, self.depth = gl.glGenRenderbuffers( 2 )
+        gl.glBindFramebuffer( gl.GL_FRAMEBUFFER, self.fbo )
+        for renderbuffer, format, attachment in (
+            ( self.color, gl.GL_RGBA8, gl.GL_COLOR_ATTACHMENT0 ),
+            ( self.depth, gl.GL_DEPTH_COMPONENT24, gl.GL_DEPTH_ATTACHMENT ),
+        ):
+            gl.glBindRenderbuffer( gl.GL_RENDERBUFFER, renderbuffer )
+            gl.glRenderbufferStorage(
+                gl.GL_RENDERBUFFER, format, width, height
+            )
+            gl.glFramebufferRenderbuffer(
+                gl.GL_FRAMEBUFFER, attachment, gl.GL_RENDERBUFFER, renderbuffer
+            )
+        status = gl.glCheckFramebufferStatus( gl.GL_FRAMEBUFFER )
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError( 'framebuffer incomplete: 0x%x' % ( status, ) )
+
+    def bind( self ):
+        gl.glBindFramebuffer( gl.GL_FRAMEBUFFER, self.fbo )
+        gl.glViewport( 0, 0, self.size[0], self.size[1] )
+
+    def read_pixels( self ):
+        '''
+        returns the colour buffer as a (height, width, 4) uint8 array,
+        top row first
+        '''
+        import numpy
+        width, height = self.size
+        gl.glBindFramebuffer( gl.GL_READ_FRAMEBUFFER, self.fbo )
+        gl.glPixelStorei( gl.GL_PACK_ALIGNMENT, 1 )
+        data = gl.glReadPixels(
+            0, 0, width, height, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE
+        )
+        pixels = numpy.frombuffer( data, dtype=numpy.uint8 )
+        return pixels.reshape( height, width, 4 )[::-1].copy()
+
+    def delete( self ):
+        gl.glDeleteRenderbuffers( 2, [ self.color, self.depth ] )
+        gl.glDeleteFramebuffers( 1, [ self.fbo ] )
+
+
+class TimeManager( object ):
+    '''
+    accepts Timer registrations; headless frames are driven by frame
+    number instead, see HeadlessContext.advance
+    '''
+    def __init__( self ):
+        self.generators = []
+
+    def addEventGenerator( self, generator ):
+        self.generators.append( generator )
+
+    def removeEventGenerator( self, generator ):
+        if generator in self.generators:
+            self.generators.remove( generator )
+
+
+class FractionEvent( object ):
+    def __init__( self, fraction ):
+        self._fraction = fraction
+
+    def fraction( self ):
+        return self._fraction
+
+
+class HeadlessContext( object ):
+    '''
+    stands in for the BaseContext returned by testingcontext.getInteractive()
+    '''
+    def __init__( self ):
+        self.time_manager = TimeManager()
+
+    def getTimeManager( self ):
+        return self.time_manager
+
+    def triggerRedraw( self, *args, **named ):
+        pass
+
+    def OnInit( self ):
+        pass
+
+    def Render( self, mode=None ):
+        pass
+
+    def advance( self, fraction ):
+        '''
+        animate to fraction (0..1) of the way through the run, for tutorials
+        which animate from a Timer
+        '''
+        handler = getattr( self, 'OnTimerFraction', None )
+        if handler is not None:
+            handler( FractionEvent( fraction ) )
+
+    @classmethod
+    def ContextMainLoop( cls, *args, **named ):
+        raise RuntimeError(
+            'run tutorials headless with: python headless.py <tutorial>'
+        )
+
+
+def load_script( path ):
+    '''
+    import a tutorial script by filename, which needn't be a valid
+    module name, without running its __main__ block
+    '''
+    path = abspath( path )
+    directory = dirname( path )
+    if directory not in sys.path:
+        sys.path.insert( 0, directory )
+    name = '_headless_' + re.sub( r'\W', '_', splitext( basename( path ) )[0] )
+    try:
+        from importlib.util import spec_from_file_location, module_from_spec
+    except ImportError:
+        import imp
+        return imp.load_source( name, path )
+    spec = spec_from_file_location( name, path )
+    module = module_from_spec( spec )
+    sys.modules[name] = module
+    spec.loader.exec_module( module )
+    return module
+
+
+def load_tutorial( path ):
+    '''
+    import a pyopengl tutorial with HeadlessContext as its BaseContext
+    '''
+    from OpenGLContext import testingcontext
+    original = testingcontext.getInteractive
+    testingcontext.getInteractive = lambda *args, **named: HeadlessContext
+    try:
+        return load_script( path )
+    finally:
+        testingcontext.getInteractive = original
+
+
+class TutorialTarget( object ):
+    '''
+    drives a pyopengl tutorial's TestContext, animating it through the
+    run, or holding it at fraction if given
+    '''
+    def __init__( self, module, fraction=None ):
+        self.module = module
+        self.context = None
+        self.fraction = fraction
+
+    def init( self, size ):
+        self.context = self.module.TestContext()
+        self.context.OnInit()
+        modelview, projection = transforms.default_camera( *size )
+        gl.glMatrixMode( gl.GL_PROJECTION )
+        gl.glLoadMatrixf( projection )
+        gl.glMatrixMode( gl.GL_MODELVIEW )
+        gl.glLoadMatrixf( modelview )
+        gl.glEnable( gl.GL_DEPTH_TEST )
+
+    def render( self, frame, frames ):
+        fraction = self.fraction
+        if fraction is None:
+            fraction = float( frame ) / max( frames - 1, 1 )
+        self.context.advance( fraction )
+        gl.glClearColor( 0.0, 0.0, 0.0, 1.0 )
+        gl.glClear( gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT )
+        self.context.Render( None )
+
+
+class Window( object ):
+    '''
+    just enough of pyglet.window.Window for joes/main.py's render()
+    '''
+    invalid = True
+
+    def clear( self ):
+        gl.glClear( gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT )
+
+
+class PygletTarget( object ):
+    '''
+    drives joes/main.py's Resources and render(), from its own directory
+    since it loads data and shaders by relative path
+    '''
+    def __init__( self, path ):
+        self.directory = dirname( abspath( path ) )
+        self.window = Window()
+        import pyglet
+        # no hidden window of pyglet's own: our context is the current one
+        pyglet.options['shadow_window'] = False
+        with _working_directory( self.directory ):
+            self.module = load_script( path )
+        self.resources = None
+
+    def init( self, size ):
+        with _working_directory( self.directory ):
+            self.resources = self.module.Resources()
+            self.resources.make()
+            # time frames with the real textures, not the placeholders
+            # shown while joes/textures.py loads them
+            loader = getattr( self.resources, 'loader', None )
+            if loader is not None:
+                loader.wait()
+
+    def render( self, frame, frames ):
+        self.module.render( self.window, self.resources )
+
+
+class _working_directory( object ):
+    def __init__( self, directory ):
+        self.directory = directory
+
+    def __enter__( self ):
+        self.previous = os.getcwd()
+        os.chdir( self.directory )
+
+    def __exit__( self, *exc_info ):
+        os.chdir( self.previous )
+
+
+def make_target( path, fraction=None ):
+    if basename( path ) == 'main.py':
+        return PygletTarget( path )
+    return TutorialTarget( load_tutorial( path ), fraction )
+
+
+def run( path, frames, size=DEFAULT_SIZE, warmup=5, target=None,
+         fraction=None ):
+    '''
+    render frames of the script at path offscreen, every one at animation
+    fraction (0..1) if given
+
+    returns ( per-frame durations in seconds, last frame's pixels )
+    '''
+    context = OffscreenContext( size )
+    try:
+        framebuffer = Framebuffer( size )
+        try:
+            if target is None:
+                target = make_target( path, fraction )
+            framebuffer.bind()
+            target.init( size )
+            total = warmup + frames
+            samples = []
+            for frame in range( total ):
+                framebuffer.bind()
+                start = timing.clock()
+                target.render( frame, total )
+                # wait for the GPU, else we time only the command submission
+                gl.glFinish()
+                if frame >= warmup:
+                    samples.append( timing.clock() - start )
+            return samples, framebuffer.read_pixels()
+        finally:
+            framebuffer.delete()
+    finally:
+        context.destroy()
+
+
+def parse_size( text ):
+    width, height = text.lower().split( 'x' )
+    return int( width ), int( height )
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser(
+        usage='%prog [options] TUTORIAL.py [TUTORIAL.py ...]'
+    )
+    parser.add_option( '-n', '--frames', type='int', default=100 )
+    parser.add_option( '-w', '--warmup', type='int', default=5,
+        help='untimed frames rendered first' )
+    parser.add_option( '-s', '--size', default='%dx%d' % DEFAULT_SIZE,
+        help='framebuffer WIDTHxHEIGHT' )
+    parser.add_option( '--json', metavar='FILE',
+        help='also write the percentiles to FILE' )
+    parser.add_option( '-f', '--fraction', type='float',
+        help='render every frame at this animation time, 0.0 to 1.0, '
+             'rather than animating through the run' )
+    parser.add_option( '--png', metavar='FILE',
+        help='write the last frame to FILE, if rendering one tutorial' )
+    options, paths = parser.parse_args( argv )
+    if not paths:
+        parser.error( 'name at least one tutorial script' )
+    if options.png and len( paths ) > 1:
+        parser.error( '--png needs a single tutorial script' )
+
+    size = parse_size( options.size )
+    results = {}
+    for path in paths:
+        samples, pixels = run(
+            path, options.frames, size, options.warmup,
+            fraction=options.fraction
+        )
+        results[path] = timing.summarise( samples )
+        print( timing.format_summary( basename( path ), results[path] ) )
+        if options.png:
+            pngio.write_png( options.png, pixels )
+
+    if options.json:
+        with open( options.json, 'w' ) as output:
+            json.dump( results, output, indent=2, sort_keys=True )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+'''
+Picks the smallest index type a mesh's vertex count allows, and splits
+meshes with too many vertices for the index types available.
+
+    dtype, gl_type = smallest( len( coords ) )
+    indices = indices.astype( dtype )
+    ...
+    gl.glDrawElements( mode, len( indices ), gl_type, offset )
+
+Indices are read for every vertex drawn, so a uint16 index buffer is
+half the bandwidth (and cache) of a uint32 one, and uint8 half again.
+GL_UNSIGNED_BYTE indices are legal everywhere, but some hardware
+converts them to 16 bits in the driver; pass allow_bytes=False to
+smallest() to stop at uint16.
+
+Desktop GL always has 32 bit indices; OpenGL ES 2 only with
+GL_OES_element_index_uint.  Without them, split() breaks a mesh into
+parts of at most 65536 vertices each, to be drawn one after the other.
+'''
+import numpy
+
+from OpenGL import GL as gl
+
+
+# ( numpy type, GL type, most vertices indexable ), smallest first
+FORMATS = (
+    ( numpy.uint8, gl.GL_UNSIGNED_BYTE, 0x100 ),
+    ( numpy.uint16, gl.GL_UNSIGNED_SHORT, 0x10000 ),
+    ( numpy.uint32, gl.GL_UNSIGNED_INT, 0x100000000 ),
+)
+MAX_16BIT_VERTICES = 0x10000
+
+
+def smallest( vertices, allow_bytes=True ):
+    '''
+    ( numpy type, GL type ) of the smallest index type which can index
+    vertices vertices, not counting uint8 unless allow_bytes
+    '''
+    for dtype, gl_type, most in FORMATS:
+        if not allow_bytes and dtype is numpy.uint8:
+            continue
+        if vertices <= most:
+            return dtype, gl_type
+    raise ValueError( 'no index type can index %d vertices' % ( vertices, ) )
+
+
+def gl_type( dtype ):
+    '''
+    the GL type of a numpy index type
+    '''
+    dtype = numpy.dtype( dtype )
+    for candidate, gl_type, _ in FORMATS:
+        if dtype == candidate:
+            return gl_type
+    raise ValueError( 'not an index type: %s' % ( dtype, ) )
+
+
+def _fitting( indices, start, max_vertices ):
+    '''
+    the end of the most primitives from start using max_vertices or
+    fewer vertices, by binary search, as the count only grows with them
+    '''
+    low = start + min(
+        max_vertices // indices.shape[1], len( indices ) - start
+    )
+    high = len( indices )
+    if len( numpy.unique( indices[start:high] ) ) <= max_vertices:
+        return high
+    while high - low > 1:
+        middle = ( low + high ) // 2
+        if len( numpy.unique( indices[start:middle] ) ) <= max_vertices:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def split( coords, indices, max_vertices=MAX_16BIT_VERTICES, primitive=3 ):
+    '''
+    break an indexed mesh into [ ( coords, indices ), ... ] each with at
+    most max_vertices vertices, indices counting from its own first.
+    Whole primitives (of primitive indices each: triangles, by default)
+    are kept together, in their original order.
+    '''
+    indices = numpy.asarray( indices ).reshape( -1, primitive )
+    if len( coords ) <= max_vertices:
+        dtype = smallest( len( coords ), allow_bytes=False )[0]
+        return [ ( coords, indices.ravel().astype( dtype ) ) ]
+    if max_vertices < primitive:
+        raise ValueError( 'max_vertices is less than a primitive' )
+    parts = []
+    start = 0
+    while start < len( indices ):
+        end = _fitting( indices, start, max_vertices )
+        used, local = numpy.unique( indices[start:end], return_inverse=True )
+        dtype = smallest( len( used ), allow_bytes=False )[0]
+        parts.append( ( coords[used], local.ravel().astype( dtype ) ) )
+        start = end
+    return parts
@@ -0,0 +1,145 @@
+'''
+Draws thousands of copies of one mesh with a single glDrawElementsInstanced
+call, each copy placed and coloured by a row of a numpy array.
+
+Each instance is a transform (a mat4 attribute, so four consecutive vec4
+locations) and a colour, streamed into an instance VBO whose attributes
+advance once per instance (glVertexAttribDivisor) rather than per vertex.
+Pair with the shaders from lights.shader_sources( count, instanced=True ).
+
+Transforms are in the row layout of transforms.py, which is the column
+order GL expects, so transforms.translation( ... ) etc. can be assigned
+as they are.
+
+Needs GL 3.3, or GL_ARB_instanced_arrays and GL_ARB_draw_instanced.
+draw_each() draws the same instances one call at a time, for drivers
+without, and as the baseline of bench_instancing.py.
+'''
+import numpy
+
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+
+from mesh import Attribute, Mesh
+
+
+INSTANCE_DTYPE = numpy.dtype( [
+    ( 'transform', 'f4', ( 4, 4 ) ),
+    ( 'color', 'f4', ( 4, ) ),
+] )
+TRANSFORM_ATTRIBUTE = 'Instance_transform'
+COLOR_ATTRIBUTE = 'Instance_color'
+
+
+def instanced_supported():
+    return bool( gl.glVertexAttribDivisor and gl.glDrawElementsInstanced )
+
+
+def instance_array( count ):
+    '''
+    count instances with identity transforms, coloured white
+    '''
+    instances = numpy.zeros( count, dtype=INSTANCE_DTYPE )
+    instances['transform'] = numpy.identity( 4, dtype='f' )
+    instances['color'] = 1.0
+    return instances
+
+
+def instance_attributes( buffer, transform_location, color_location ):
+    '''
+    Attributes reading INSTANCE_DTYPE rows from buffer, once per instance
+    '''
+    stride = INSTANCE_DTYPE.itemsize
+    attributes = []
+    if transform_location not in ( None, -1 ):
+        offset = INSTANCE_DTYPE.fields['transform'][1]
+        attributes += [
+            Attribute( transform_location + column, 4, stride,
+                       offset + column * 16, buffer=buffer, divisor=1 )
+            for column in range( 4 )
+        ]
+    attributes.append( Attribute(
+        color_location, 4, stride, INSTANCE_DTYPE.fields['color'][1],
+        buffer=buffer, divisor=1
+    ) )
+    return attributes
+
+
+class InstancedMesh( object ):
+    '''
+    a Mesh, and the instances to draw it as.
+
+    coords, attributes, count and the remaining keyword arguments are
+    as for Mesh; transform_location and color_location are those of the
+    program's Instance_transform and Instance_color attributes.
+    '''
+    def __init__( self, coords, attributes, count, transform_location,
+                  color_location, **named ):
+        self.transform_location = transform_location
+        self.color_location = color_location
+        self.instances = instance_array( 0 )
+        self.buffer = vbo.VBO(
+            self.instances.view( 'f' ), usage=gl.GL_STREAM_DRAW
+        )
+        self.mesh = Mesh(
+            coords,
+            list( attributes ) + instance_attributes(
+                self.buffer, transform_location, color_location
+            ),
+            count,
+            **named
+        )
+        # without the instance attributes, whose values then come from
+        # glVertexAttrib, for draw_each()
+        self.single = Mesh( coords, attributes, count, **named )
+
+    def __len__( self ):
+        return len( self.instances )
+
+    def set_instances( self, instances ):
+        '''
+        draw instances, an INSTANCE_DTYPE array, from now on.  It is
+        streamed to the GPU, in one glBufferData, at the next draw().
+        Changes made to it in place are sent by calling this again.
+        '''
+        instances = numpy.ascontiguousarray( instances, dtype=INSTANCE_DTYPE )
+        self.instances = instances
+        self.buffer.set_array( instances.view( 'f' ) )
+
+    def draw( self ):
+        '''
+        draw every instance, with the program currently in use.  Follow
+        with unbind(), as for Mesh.
+        '''
+        if not len( self.instances ):
+            return
+        self.mesh.draw( len( self.instances ) )
+
+    def draw_each( self ):
+        '''
+        draw every instance with its own draw call, setting the instance
+        attributes as constants in between
+        '''
+        if not len( self.instances ):
+            return
+        transform = self.transform_location not in ( None, -1 )
+        color = self.color_location not in ( None, -1 )
+        for instance in self.instances:
+            if transform:
+                for column in range( 4 ):
+                    gl.glVertexAttrib4fv(
+                        self.transform_location + column,
+                        instance['transform'][column]
+                    )
+            if color:
+                gl.glVertexAttrib4fv( self.color_location, instance['color'] )
+            self.single.draw()
+
+    def unbind( self ):
+        self.mesh.unbind()
+        self.single.unbind()
+
+    def delete( self ):
+        self.mesh.delete()
+        self.single.delete()
+        self.buffer.delete()
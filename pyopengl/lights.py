@@ -0,0 +1,388 @@
+'''
+Shader source and uniform data for any number of lights, replacing the
+hand-copied light0_*/light1_*/light2_* declarations of 08 and 09.
+
+Every light is five vec4s in one uniform array, so a whole LightSet is
+uploaded with a single glUniform4fv:
+
+    lights[i*5 + 0]  position (w = 0.0 for directional, 1.0 for point)
+    lights[i*5 + 1]  ambient contribution
+    lights[i*5 + 2]  diffuse contribution
+    lights[i*5 + 3]  specular contribution
+    lights[i*5 + 4]  attenuation (constant, linear, quadratic, unused)
+
+shader_sources() generates the shaders in one of three modes:
+
+    'array'     loop over the lights in the fragment shader, doing the
+                light location calculations per fragment.  Needs only two
+                varyings however many lights there are.
+    'unrolled'  one block of code per light, with the light location
+                and half vector pre-calculated per vertex and passed in
+                varyings, as the tutorials originally did.  For GLSL 1.10
+                drivers which choke on loops over uniform arrays.  Each
+                light uses seven varying floats, so only suits a handful
+                of lights.
+    'ubo'       as 'array', but reading the lights and the material from
+                std140 uniform blocks (see ubo.py), so one buffer can feed
+                many programs.
+
+With instanced=True the vertex shader also reads a per-instance transform
+and colour (see instancing.py), placing each copy of the mesh in the
+scene and tinting its lit colour.
+'''
+import numpy
+
+from OpenGL import GL as gl
+
+import ubo
+
+
+LIGHT_STRIDE = 5    # vec4s per light
+LIGHTS_UNIFORM = 'lights'
+LIGHTS_BLOCK = 'Lights'
+MODES = ( 'array', 'unrolled', 'ubo' )
+
+
+DLIGHT_FUNC = '''
+vec3 dLight(
+    in vec3 light_pos,      // light position
+    in vec3 half_light,     // half-way vector between light and view
+    in vec3 frag_normal,    // geometry normal
+    in float shininess,     // determines size of specular highlight
+    in float distance,      // distance from vertex to lightsource
+    in vec3 attenuations    // light attenuation coefficients
+) {
+    // returns vec3( ambientMult, diffuseMult, specularMult )
+
+    float n_dot_pos = max( 0.0, dot( frag_normal, light_pos ) );
+    float n_dot_half = 0.0;
+    float attenuation = 1.0;
+    if (n_dot_pos > -0.05) {
+        n_dot_half = pow(
+            max( 0.0, dot( half_light, frag_normal ) ),
+            shininess
+        );
+        if (distance != 0.0) {
+            attenuation = clamp(
+                0.0, 1.0,
+                1.0 / (
+                    attenuations.x +
+                    attenuations.y * distance +
+                    attenuations.z * distance * distance
+                )
+            );
+            n_dot_pos *= attenuation;
+            n_dot_half *= attenuation;
+        }
+    }
+    return vec3( attenuation, n_dot_pos, n_dot_half);
+}
+'''
+
+# model_position is Vertex_position in the vertex shader, and the
+# interpolated modelPosition varying in the fragment shader
+LIGHT_LOCATION_FUNC = '''
+vec4 lightLocation(vec4 position, vec3 model_position)
+{
+    vec3 ec_location;
+    float distance;
+
+    if (position.w == 0.0) {
+        // directional light
+        ec_location = normalize(gl_NormalMatrix * position.xyz);
+        distance = 0.0;
+    } else {
+        // point light
+        // do lighting calcs in model-space.
+        vec3 modelspace_vec = position.xyz - model_position;
+        ec_location = normalize( gl_NormalMatrix * modelspace_vec );
+        distance = abs( length( modelspace_vec ) );
+    }
+    return vec4(ec_location.x, ec_location.y, ec_location.z, distance);
+}
+'''
+
+MATERIAL_DECL = '''
+struct Material {
+    vec4 ambient;
+    vec4 diffuse;
+    vec4 specular;
+    float shininess;
+};
+uniform Material material;
+uniform vec4 Global_ambient;
+'''
+
+LIGHT_CONTRIB_FUNC = '''
+vec4 lightContrib(
+    vec4 amb,
+    vec4 diff,
+    vec4 spec,
+    vec3 ec_location,
+    vec3 ec_half_angle,
+    float distance,
+    vec3 attenuation
+) {
+    vec3 weights = dLight(
+        ec_location,
+        ec_half_angle,
+        baseNormal,
+        material.shininess,
+        distance,
+        attenuation
+    );
+    return
+        (amb * material.ambient * weights.x) +
+        (diff * material.diffuse * weights.y) +
+        (spec * material.specular * weights.z);
+}
+'''
+
+VERTEX_ATTRIBUTES = '''
+attribute vec3 Vertex_position;
+attribute vec3 Vertex_normal;
+'''
+
+INSTANCE_ATTRIBUTES = '''
+attribute mat4 Instance_transform;
+attribute vec4 Instance_color;
+'''
+
+
+def _declarations( count, mode, instanced ):
+    size = count * LIGHT_STRIDE
+    if mode == 'ubo':
+        lights = '\n' + ubo.glsl_declaration(
+            LIGHTS_BLOCK, block_fields( count )
+        )
+    else:
+        lights = '\nuniform vec4 %s[%d];\n' % ( LIGHTS_UNIFORM, size )
+
+    varyings = [ 'varying vec3 baseNormal;' ]
+    if mode == 'unrolled':
+        for i in range( count ):
+            varyings += [
+                'varying vec3 light%d_ec_location;' % ( i, ),
+                'varying vec3 light%d_ec_half;' % ( i, ),
+                'varying float light%d_distance;' % ( i, ),
+            ]
+    else:
+        varyings.append( 'varying vec3 modelPosition;' )
+    if instanced:
+        varyings.append( 'varying vec4 instanceColor;' )
+    return lights + '\n'.join( varyings ) + '\n'
+
+
+def _header( mode ):
+    if mode == 'ubo':
+        return '#extension GL_ARB_uniform_buffer_object : require\n'
+    return ''
+
+
+def _light( i, field ):
+    return '%s[%d]' % ( LIGHTS_UNIFORM, i * LIGHT_STRIDE + field )
+
+
+def _half_angle( ec_location ):
+    # in eye space, direction to viewer is (0, 0, -1)
+    return 'normalize( %s - vec3( 0,0,-1 ) )' % ( ec_location, )
+
+
+def _vertex_main( count, mode, instanced ):
+    if instanced:
+        # light in the space the instances are placed in
+        position = 'position'
+        lines = [
+            'void main() {',
+            '    vec3 position = ( Instance_transform * '
+                'vec4( Vertex_position, 1.0 ) ).xyz;',
+            '    gl_Position = gl_ModelViewProjectionMatrix * '
+                'vec4( position, 1.0 );',
+            '    baseNormal = normalize( gl_NormalMatrix * (',
+            '        Instance_transform * vec4( Vertex_normal, 0.0 ) ).xyz'
+                ' );',
+            '    instanceColor = Instance_color;',
+        ]
+    else:
+        position = 'Vertex_position'
+        lines = [
+            'void main() {',
+            '    gl_Position = gl_ModelViewProjectionMatrix * '
+                'vec4( Vertex_position, 1.0);',
+            '    baseNormal = normalize(gl_NormalMatrix * Vertex_normal);',
+        ]
+    if mode == 'unrolled':
+        lines.append( '    vec4 lightLoc;' )
+        for i in range( count ):
+            lines += [
+                '',
+                '    lightLoc = lightLocation(%s, %s);' % (
+                    _light( i, 0 ), position,
+                ),
+                '    light%d_ec_location = lightLoc.xyz;' % ( i, ),
+                '    light%d_ec_half = %s;' % (
+                    i, _half_angle( 'lightLoc.xyz' ),
+                ),
+                '    light%d_distance = lightLoc.w;' % ( i, ),
+            ]
+    else:
+        lines.append( '    modelPosition = %s;' % ( position, ) )
+    lines.append( '}' )
+    return '\n'.join( lines ) + '\n'
+
+
+def _fragment_main( count, mode, instanced ):
+    lines = [
+        'void main() {',
+        '    vec4 fragColor = Global_ambient * material.ambient;',
+    ]
+    if mode == 'unrolled':
+        for i in range( count ):
+            lines += [
+                '    fragColor += lightContrib(',
+                '        %s, %s, %s,' % (
+                    _light( i, 1 ), _light( i, 2 ), _light( i, 3 ),
+                ),
+                '        light%d_ec_location, light%d_ec_half,' % ( i, i ),
+                '        light%d_distance, %s.xyz);' % ( i, _light( i, 4 ) ),
+            ]
+    else:
+        lines += [
+            '    for (int i = 0; i < %d; ++i) {' % ( count, ),
+            '        int base = i * %d;' % ( LIGHT_STRIDE, ),
+            '        vec4 lightLoc = lightLocation(',
+            '            %s[base], modelPosition);' % ( LIGHTS_UNIFORM, ),
+            '        fragColor += lightContrib(',
+            '            %s[base + 1], %s[base + 2], %s[base + 3],' % (
+                ( LIGHTS_UNIFORM, ) * 3
+            ),
+            '            lightLoc.xyz, %s,' % (
+                _half_angle( 'lightLoc.xyz' ),
+            ),
+            '            lightLoc.w, %s[base + 4].xyz);' % ( LIGHTS_UNIFORM, ),
+            '    }',
+        ]
+    if instanced:
+        lines.append( '    fragColor *= instanceColor;' )
+    lines += [
+        '    gl_FragColor = fragColor;',
+        '}',
+    ]
+    return '\n'.join( lines ) + '\n'
+
+
+def block_fields( count ):
+    '''
+    fields of the std140 block holding count lights, for ubo.UniformBlock
+    '''
+    return [ ( LIGHTS_UNIFORM, 'vec4', count * LIGHT_STRIDE ) ]
+
+
+def shader_sources( count, mode='array', instanced=False ):
+    '''
+    returns ( vertex_source, fragment_source ) lighting a mesh with
+    Vertex_position and Vertex_normal attributes by count lights, and
+    Instance_transform and Instance_color attributes too if instanced
+    '''
+    if mode not in MODES:
+        raise ValueError( 'unknown light shader mode: %r' % ( mode, ) )
+    if count < 1:
+        raise ValueError( 'need at least one light' )
+    declarations = _declarations( count, mode, instanced )
+    vertex = _header( mode ) + declarations + VERTEX_ATTRIBUTES
+    if instanced:
+        vertex += INSTANCE_ATTRIBUTES
+    if mode == 'unrolled':
+        vertex += LIGHT_LOCATION_FUNC
+    vertex += _vertex_main( count, mode, instanced )
+
+    if mode == 'ubo':
+        material = '\n' + ubo.glsl_declaration(
+            ubo.MATERIAL_BLOCK, ubo.MATERIAL_FIELDS
+        )
+    else:
+        material = MATERIAL_DECL
+    fragment = (
+        _header( mode ) + declarations + DLIGHT_FUNC + material
+        + LIGHT_CONTRIB_FUNC
+    )
+    if mode != 'unrolled':
+        fragment += LIGHT_LOCATION_FUNC
+    fragment += _fragment_main( count, mode, instanced )
+    return vertex, fragment
+
+
+class LightSet( object ):
+    '''
+    the parameters of many lights, packed contiguously as the float32
+    uniform array the generated shaders expect
+    '''
+    def __init__( self ):
+        self.data = numpy.zeros( ( 0, LIGHT_STRIDE, 4 ), dtype='f' )
+        # ( program, location ) pairs holding the lights as they are,
+        # emptied whenever they change
+        self.uploaded = set()
+
+    def __len__( self ):
+        return len( self.data )
+
+    def add( self, pos, amb, diff, spec, atten=( 1.0, 0.0, 0.0 ) ):
+        '''
+        append a light, returning its index.  pos is a 4-vector, with
+        w = 0.0 for a directional light and 1.0 for a point light.
+        '''
+        light = numpy.zeros( ( 1, LIGHT_STRIDE, 4 ), dtype='f' )
+        light[0, 0] = pos
+        light[0, 1] = amb
+        light[0, 2] = diff
+        light[0, 3] = spec
+        light[0, 4, :3] = atten
+        self.data = numpy.concatenate( ( self.data, light ) )
+        self.uploaded.clear()
+        return len( self.data ) - 1
+
+    def set( self, index, pos=None, amb=None, diff=None, spec=None,
+             atten=None ):
+        for field, value in enumerate( ( pos, amb, diff, spec ) ):
+            if value is not None:
+                self.data[index, field] = value
+        if atten is not None:
+            self.data[index, 4, :3] = atten
+        self.uploaded.clear()
+
+    def upload( self, location, program=None ):
+        '''
+        upload every light with one call, to the location of the lights
+        uniform array in the program currently in use.  Given that
+        program, the upload is skipped while it still holds the lights,
+        until add() or set() changes them.  Returns True if a GL call was
+        made.
+        '''
+        if location in ( None, -1 ):
+            return False
+        key = ( program, location )
+        if program is not None and key in self.uploaded:
+            return False
+        gl.glUniform4fv( location, len( self.data ) * LIGHT_STRIDE,
+                         self.data )
+        if program is not None:
+            self.uploaded.add( key )
+        return True
+
+    def forget( self, program=None ):
+        '''
+        upload to program (or every program) again, eg. after it is
+        relinked, which resets its uniforms
+        '''
+        if program is None:
+            self.uploaded.clear()
+        else:
+            self.uploaded = set(
+                key for key in self.uploaded if key[0] != program
+            )
+
+    def write_block( self, block ):
+        '''
+        copy every light into a ubo.UniformBlock made with block_fields()
+        '''
+        block[LIGHTS_UNIFORM] = self.data.reshape( -1, 4 )
@@ -0,0 +1,255 @@
+'''
+Records a mesh's vertex attribute layout once, in a vertex array object,
+instead of re-specifying it every frame.
+
+Without a VAO each draw costs a buffer bind plus an enable and a pointer
+call per attribute, then as many calls again to undo them.  With one,
+drawing is a bind and a draw.  Drivers without VAOs (GL 3.0, or
+GL_ARB_vertex_array_object) get the per-frame calls, as before.
+
+Attributes can also come from buffers other than the mesh's own, and
+advance per instance rather than per vertex, for instanced drawing (see
+instancing.py).
+
+Given a glstate.GLState, a mesh binds through it and leaves things bound,
+so drawing it, or meshes sharing its buffers, again costs only the draw.
+
+A VAO draws from its buffers without binding them, so a buffer given a
+new array (by its set_array()) wouldn't be sent: draw() sends any such
+buffer of the mesh first, as binding it without a VAO does.
+'''
+import ctypes
+
+from OpenGL import GL as gl
+
+import indexformat
+
+
+class Attribute( object ):
+    '''
+    where one vertex attribute lives in a vertex buffer
+
+    buffer -- the VBO holding it, if not the mesh's coords
+    divisor -- advance once per this many instances, instead of per vertex
+    '''
+    def __init__( self, location, size, stride, offset,
+                  type=gl.GL_FLOAT, normalized=False, buffer=None,
+                  divisor=0 ):
+        self.location = location
+        self.size = size
+        self.stride = stride
+        self.offset = offset
+        self.type = type
+        self.normalized = normalized
+        self.buffer = buffer
+        self.divisor = divisor
+
+
+def vao_supported():
+    return bool( gl.glGenVertexArrays )
+
+
+class Mesh( object ):
+    '''
+    vertices in an OpenGL.arrays.vbo.VBO, optionally indexed by another VBO
+
+    attributes -- Attributes describing the vertex layout.  Those with no
+        location in the shader (None or -1) are skipped.
+    count -- number of vertices (or indices) to draw
+    index_type -- GL type of the indices, by default that of the indices
+        VBO's array, or failing that, GL_UNSIGNED_SHORT
+    state -- a glstate.GLState to bind through, skipping binds of what's
+        already bound, and to leave bound until its reset()
+    '''
+    def __init__( self, coords, attributes, count,
+                  mode=gl.GL_TRIANGLES, indices=None,
+                  index_type=None, use_vao=None, state=None ):
+        self.coords = coords
+        self.attributes = [
+            attribute for attribute in attributes
+            if attribute.location not in ( None, -1 )
+        ]
+        self.count = count
+        self.mode = mode
+        self.indices = indices
+        if index_type is None:
+            dtype = getattr( getattr( indices, 'data', None ), 'dtype', None )
+            if dtype is not None:
+                index_type = indexformat.gl_type( dtype )
+            else:
+                index_type = gl.GL_UNSIGNED_SHORT
+        self.index_type = index_type
+        self.use_vao = use_vao
+        self.vao = None
+        self.state = state
+
+    def _set_pointers( self, state=None ):
+        if state is not None:
+            state.enable_attributes( [
+                attribute.location for attribute in self.attributes
+            ] )
+            if not state.set_layout( self ):
+                # still as we left them
+                return
+        bound = self.coords
+        for attribute in self.attributes:
+            buffer = attribute.buffer or self.coords
+            if buffer is not bound:
+                self._bind( buffer, state )
+                bound = buffer
+            if state is None:
+                gl.glEnableVertexAttribArray( attribute.location )
+            gl.glVertexAttribPointer(
+                attribute.location, attribute.size, attribute.type,
+                attribute.normalized, attribute.stride,
+                buffer + attribute.offset
+            )
+            if state is not None:
+                state.set_divisor( attribute.location, attribute.divisor )
+            elif attribute.divisor:
+                gl.glVertexAttribDivisor(
+                    attribute.location, attribute.divisor
+                )
+        if bound is not self.coords:
+            self._bind( self.coords, state )
+
+    @staticmethod
+    def _bind( buffer, state ):
+        if state is not None:
+            state.bind_vbo( buffer )
+        else:
+            buffer.bind()
+
+    def _buffers( self ):
+        buffers = [ self.coords ] + [
+            attribute.buffer for attribute in self.attributes
+            if attribute.buffer is not None
+        ]
+        if self.indices is not None:
+            buffers.append( self.indices )
+        return buffers
+
+    def _upload( self, state=None ):
+        '''
+        send the buffers whose arrays changed since they were last bound,
+        with our VAO bound, as its element buffer is ours already
+        '''
+        for buffer in self._buffers():
+            # already sent, or shared by attributes and sent just now
+            if buffer.copied:
+                continue
+            if state is not None:
+                state.bind_vbo( buffer )
+            else:
+                buffer.bind()
+                if buffer is not self.indices:
+                    buffer.unbind()
+
+    def _clear_pointers( self ):
+        for attribute in self.attributes:
+            if attribute.divisor:
+                gl.glVertexAttribDivisor( attribute.location, 0 )
+            gl.glDisableVertexAttribArray( attribute.location )
+
+    def compile( self ):
+        '''
+        capture the attribute layout and index buffer in a VAO
+        '''
+        self.vao = gl.glGenVertexArrays( 1 )
+        gl.glBindVertexArray( self.vao )
+        try:
+            self.coords.bind()
+            self._set_pointers()
+            if self.indices is not None:
+                # the element buffer binding is part of the VAO
+                self.indices.bind()
+        finally:
+            gl.glBindVertexArray( 0 )
+            self.coords.unbind()
+            if self.indices is not None:
+                self.indices.unbind()
+            if self.state is not None:
+                # all bound behind its back
+                self.state.invalidate()
+
+    def _issue_draw( self, instances, first ):
+        if self.indices is None:
+            if instances is None:
+                gl.glDrawArrays( self.mode, first, self.count )
+            else:
+                gl.glDrawArraysInstanced(
+                    self.mode, first, self.count, instances
+                )
+            return
+
+        offset = ctypes.c_void_p( 0 )
+        if instances is None:
+            if first:
+                gl.glDrawElementsBaseVertex(
+                    self.mode, self.count, self.index_type, offset, first
+                )
+            else:
+                gl.glDrawElements(
+                    self.mode, self.count, self.index_type, offset
+                )
+        elif first:
+            gl.glDrawElementsInstancedBaseVertex(
+                self.mode, self.count, self.index_type, offset, instances,
+                first
+            )
+        else:
+            gl.glDrawElementsInstanced(
+                self.mode, self.count, self.index_type, offset, instances
+            )
+
+    def draw( self, instances=None, first=0 ):
+        '''
+        draw the mesh with the program currently in use, instances times
+        over if given.  first is the vertex to start from, or for indexed
+        meshes, added to every index (eg. a StreamingBuffer's first).
+        Follow with unbind() (in a finally clause, say) before other
+        drawing, or with a state, its reset() once the frame is drawn.
+        '''
+        if self.use_vao is None:
+            self.use_vao = vao_supported()
+        state = self.state
+        if self.use_vao:
+            if self.vao is None:
+                self.compile()
+            if state is not None:
+                state.bind_vertex_array( self.vao )
+            else:
+                gl.glBindVertexArray( self.vao )
+            self._upload( state )
+            self._issue_draw( instances, first )
+            return
+
+        if state is not None:
+            state.bind_vbo( self.coords )
+            if self.indices is not None:
+                state.bind_vbo( self.indices )
+            self._set_pointers( state )
+            self._issue_draw( instances, first )
+            return
+
+        self.coords.bind()
+        if self.indices is not None:
+            self.indices.bind()
+        try:
+            self._set_pointers()
+            self._issue_draw( instances, first )
+        finally:
+            self.coords.unbind()
+            if self.indices is not None:
+                self.indices.unbind()
+            self._clear_pointers()
+
+    def unbind( self ):
+        # a state leaves everything bound until its reset()
+        if self.use_vao and self.state is None:
+            gl.glBindVertexArray( 0 )
+
+    def delete( self ):
+        if self.vao is not None:
+            gl.glDeleteVertexArrays( 1, [ self.vao ] )
+            self.vao = None
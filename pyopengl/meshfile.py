@@ -0,0 +1,508 @@
+'''
+A binary mesh format that opens instantly, however big, and goes to the
+GPU without passing through Python lists:
+
+    python meshfile.py bunny.obj bunny.mesh     # or .ply
+    python meshfile.py --optimise bunny.obj bunny.mesh
+    python meshfile.py bunny.mesh               # describe it
+
+    data = MeshFile( 'bunny.mesh' )
+    mesh = data.mesh( { 'position': position_location,
+                        'normal': normal_location } )
+
+A file is a 64 byte header, a table of the vertex attributes, then the
+interleaved vertices and the indices, each block starting on a 64 byte
+boundary, all little-endian.  MeshFile maps the blocks into numpy arrays
+with numpy.memmap, so nothing is read until it's used, and the VBOs hand
+those arrays' memory to glBufferData directly: the OS pages the file in
+as the driver copies it, once.
+
+OBJ and PLY (ascii or binary) are converted to OpenGLContext's quadric
+layout (see geometry.py), with normals made from the faces if the source
+has none, and indices of the smallest type that fits (see indexformat.py),
+reordered for the vertex cache, overdraw and vertex fetch with --optimise
+(see vertexcache.py).
+'''
+import optparse
+import re
+
+import numpy
+
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+
+import geometry
+import indexformat
+import timing
+import vertexcache
+from mesh import Attribute, Mesh
+
+
+MAGIC = b'PYMESH\0\0'
+VERSION = 1
+ALIGNMENT = 64
+HEADER = numpy.dtype( [
+    ( 'magic', 'S8' ),
+    ( 'version', '<u4' ),
+    ( 'attribute_count', '<u4' ),
+    ( 'vertex_count', '<u8' ),
+    ( 'stride', '<u4' ),
+    ( 'index_type', '<u4' ),
+    ( 'index_count', '<u8' ),
+    ( 'vertex_offset', '<u8' ),
+    ( 'index_offset', '<u8' ),
+    ( 'reserved', '<u8' ),
+] )
+# offset is in bytes from the start of a vertex, size in values
+ATTRIBUTE = numpy.dtype( [
+    ( 'name', 'S16' ),
+    ( 'offset', '<u4' ),
+    ( 'size', '<u4' ),
+    ( 'type', '<u4' ),
+    ( 'normalized', '<u4' ),
+] )
+VALUE_TYPES = {
+    numpy.dtype( '<f4' ): gl.GL_FLOAT,
+    numpy.dtype( '<f2' ): gl.GL_HALF_FLOAT,
+    numpy.dtype( 'i1' ): gl.GL_BYTE,
+    numpy.dtype( 'u1' ): gl.GL_UNSIGNED_BYTE,
+    numpy.dtype( '<i2' ): gl.GL_SHORT,
+    numpy.dtype( '<u2' ): gl.GL_UNSIGNED_SHORT,
+    numpy.dtype( '<i4' ): gl.GL_INT,
+    numpy.dtype( '<u4' ): gl.GL_UNSIGNED_INT,
+}
+# ( name, offset in values, size ) of geometry.py's layout
+QUADRIC_ATTRIBUTES = (
+    ( 'position', geometry.POSITION_OFFSET, 3 ),
+    ( 'texcoord', geometry.TEXCOORD_OFFSET, 2 ),
+    ( 'normal', geometry.NORMAL_OFFSET, 3 ),
+)
+
+
+def _aligned( offset ):
+    return ( offset + ALIGNMENT - 1 ) // ALIGNMENT * ALIGNMENT
+
+
+def _dtype( gl_type ):
+    for dtype, candidate in VALUE_TYPES.items():
+        if candidate == gl_type:
+            return dtype
+    raise ValueError( 'not a vertex value type: %r' % ( gl_type, ) )
+
+
+def save( path, vertices, indices=None, attributes=QUADRIC_ATTRIBUTES,
+          normalized=() ):
+    '''
+    write (N, width) vertices, and optionally indices into them
+
+    attributes -- ( name, offset in values, size ) of each attribute
+    normalized -- names of the integer attributes read as 0..1 (or -1..1)
+    '''
+    vertices = numpy.ascontiguousarray( vertices )
+    vertices = vertices.astype( vertices.dtype.newbyteorder( '<' ) )
+    value_type = VALUE_TYPES[vertices.dtype]
+    count, width = vertices.reshape( len( vertices ), -1 ).shape
+    table = numpy.zeros( len( attributes ), ATTRIBUTE )
+    for entry, ( name, offset, size ) in zip( table, attributes ):
+        entry['name'] = name.encode( 'ascii' )
+        entry['offset'] = offset * vertices.itemsize
+        entry['size'] = size
+        entry['type'] = value_type
+        entry['normalized'] = name in normalized
+
+    header = numpy.zeros( (), HEADER )
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['attribute_count'] = len( table )
+    header['vertex_count'] = count
+    header['stride'] = width * vertices.itemsize
+    header['vertex_offset'] = _aligned( HEADER.itemsize + table.nbytes )
+    if indices is not None:
+        dtype, index_type = indexformat.smallest( count )
+        indices = numpy.asarray( indices ).ravel().astype( dtype )
+        header['index_type'] = index_type
+        header['index_count'] = len( indices )
+        header['index_offset'] = _aligned(
+            header['vertex_offset'] + vertices.nbytes
+        )
+
+    with open( path, 'wb' ) as output:
+        output.write( header.tobytes() )
+        output.write( table.tobytes() )
+        output.seek( int( header['vertex_offset'] ) )
+        output.write( vertices.tobytes() )
+        if indices is not None:
+            output.seek( int( header['index_offset'] ) )
+            output.write( indices.tobytes() )
+
+
+class MeshFile( object ):
+    '''
+    a mesh file mapped into memory
+
+    vertices -- (N, width) memmap of the vertex values, or of bytes if the
+        attributes are of different types
+    indices -- memmap of the indices, or None
+    attributes -- the attribute table, a numpy record array
+    '''
+    def __init__( self, path ):
+        self.path = path
+        with open( path, 'rb' ) as source:
+            header = source.read( HEADER.itemsize )
+            if len( header ) < HEADER.itemsize or not header.startswith(
+                MAGIC
+            ):
+                raise ValueError( '%s is not a mesh file' % ( path, ) )
+            self.header = header = numpy.frombuffer( header, HEADER )[0]
+            if header['version'] > VERSION:
+                raise ValueError(
+                    '%s is mesh file version %d, newer than %d' % (
+                        path, header['version'], VERSION
+                    )
+                )
+            count = int( header['attribute_count'] )
+            self.attributes = numpy.frombuffer(
+                source.read( ATTRIBUTE.itemsize * count ), ATTRIBUTE
+            )
+        self.stride = int( header['stride'] )
+        self.count = int( header['vertex_count'] )
+
+        types = set( int( t ) for t in self.attributes['type'] )
+        dtype = _dtype( types.pop() ) if len( types ) == 1 else numpy.uint8
+        dtype = numpy.dtype( dtype )
+        self.vertices = numpy.memmap(
+            path, dtype, 'r', int( header['vertex_offset'] ),
+            ( self.count, self.stride // dtype.itemsize )
+        ) if self.count else numpy.zeros( ( 0, 0 ), dtype )
+
+        self.index_type = int( header['index_type'] ) or None
+        self.indices = None
+        if self.index_type is not None and header['index_count']:
+            dtype = [
+                dtype for dtype, gl_type, _ in indexformat.FORMATS
+                if gl_type == self.index_type
+            ][0]
+            self.indices = numpy.memmap(
+                path, numpy.dtype( dtype ).newbyteorder( '<' ), 'r',
+                int( header['index_offset'] ),
+                ( int( header['index_count'] ), )
+            )
+
+    def names( self ):
+        return [ name.decode( 'ascii' ) for name in self.attributes['name'] ]
+
+    def buffers( self ):
+        '''
+        ( vertex VBO, index VBO or None ), uploaded from the mapped file
+        when first bound
+        '''
+        coords = vbo.VBO( self.vertices )
+        indices = None
+        if self.indices is not None:
+            indices = vbo.VBO(
+                self.indices, target=gl.GL_ELEMENT_ARRAY_BUFFER
+            )
+        return coords, indices
+
+    def mesh( self, locations, **named ):
+        '''
+        a mesh.Mesh of the file's buffers, with the attributes named in
+        locations ( { name: shader location } ) and the others skipped
+        '''
+        coords, indices = self.buffers()
+        attributes = [
+            Attribute(
+                locations.get( name ), int( entry['size'] ), self.stride,
+                int( entry['offset'] ), type=int( entry['type'] ),
+                normalized=bool( entry['normalized'] )
+            )
+            for name, entry in zip( self.names(), self.attributes )
+        ]
+        count = self.count if indices is None else len( self.indices )
+        return Mesh( coords, attributes, count, indices=indices, **named )
+
+
+def _face_normals( positions, triangles ):
+    '''
+    smooth per vertex normals, from the area weighted face normals
+    '''
+    corners = positions[triangles]
+    faces = numpy.cross(
+        corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]
+    )
+    normals = numpy.zeros_like( positions )
+    for corner in range( 3 ):
+        numpy.add.at( normals, triangles[:, corner], faces )
+    lengths = numpy.sqrt( ( normals ** 2 ).sum( axis=1 ) )[:, None]
+    return normals / numpy.where( lengths > 0, lengths, 1 )
+
+
+def _quadric( positions, texcoords, normals, triangles ):
+    '''
+    (N, 8) float32 vertices in geometry.py's layout, and triangle indices
+    '''
+    coords = numpy.zeros( ( len( positions ), geometry.COORD_STRIDE ), 'f' )
+    position = geometry.POSITION_OFFSET
+    coords[:, position:position + 3] = positions
+    if texcoords is not None:
+        texcoord = geometry.TEXCOORD_OFFSET
+        coords[:, texcoord:texcoord + 2] = texcoords
+    if normals is None:
+        normals = _face_normals( positions, triangles )
+    normal = geometry.NORMAL_OFFSET
+    coords[:, normal:normal + 3] = normals
+    return coords, triangles.ravel()
+
+
+def _fan( polygon ):
+    '''
+    triangles of a convex polygon, as a fan from its first corner
+    '''
+    return [
+        ( polygon[0], polygon[i], polygon[i + 1] )
+        for i in range( 1, len( polygon ) - 1 )
+    ]
+
+
+def read_obj( path ):
+    '''
+    ( coords, indices ) of a Wavefront OBJ's faces, a vertex per distinct
+    position/texcoord/normal corner
+    '''
+    values = { 'v': [], 'vt': [], 'vn': [] }
+    corners = {}
+    triangles = []
+    with open( path ) as source:
+        for line in source:
+            fields = line.split()
+            if not fields:
+                continue
+            kind = fields[0]
+            if kind in values:
+                values[kind].append( [ float( f ) for f in fields[1:4] ] )
+            elif kind == 'f':
+                polygon = []
+                for corner in fields[1:]:
+                    parts = ( corner.split( '/' ) + [ '', '' ] )[:3]
+                    # 1-based, or counting back from the last if negative
+                    key = tuple(
+                        int( part ) + ( len( values[which] ) + 1
+                                        if int( part ) < 0 else 0 )
+                        if part else 0
+                        for part, which in zip( parts, ( 'v', 'vt', 'vn' ) )
+                    )
+                    polygon.append( corners.setdefault( key, len( corners ) ) )
+                triangles.extend( _fan( polygon ) )
+
+    keys = numpy.zeros( ( len( corners ), 3 ), dtype=numpy.intp )
+    for key, index in corners.items():
+        keys[index] = key
+    positions = numpy.array( values['v'], dtype='f' ).reshape( -1, 3 )
+    texcoords = normals = None
+    if values['vt'] and keys[:, 1].all():
+        texcoords = numpy.array(
+            [ ( t + [ 0.0 ] )[:2] for t in values['vt'] ], dtype='f'
+        )[keys[:, 1] - 1]
+    if values['vn'] and keys[:, 2].all():
+        normals = numpy.array( values['vn'], dtype='f' )[keys[:, 2] - 1]
+    return _quadric(
+        positions[keys[:, 0] - 1], texcoords, normals,
+        numpy.array( triangles, dtype=numpy.intp ).reshape( -1, 3 )
+    )
+
+
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+
+
+def _ply_header( source ):
+    '''
+    the format and [ ( element, count, [ ( property, type or
+    ( count type, item type ) ) ] ) ] of a PLY file's header
+    '''
+    if source.readline().strip() != b'ply':
+        raise ValueError( '%s is not a PLY file' % ( source.name, ) )
+    format = None
+    elements = []
+    while True:
+        line = source.readline()
+        if not line:
+            raise ValueError( '%s has no end_header' % ( source.name, ) )
+        fields = line.decode( 'ascii' ).split()
+        if not fields or fields[0] in ( 'comment', 'obj_info' ):
+            continue
+        if fields[0] == 'end_header':
+            return format, elements
+        if fields[0] == 'format':
+            format = fields[1]
+        elif fields[0] == 'element':
+            elements.append( ( fields[1], int( fields[2] ), [] ) )
+        elif fields[0] == 'property' and fields[1] == 'list':
+            elements[-1][2].append( (
+                fields[4], ( PLY_TYPES[fields[2]], PLY_TYPES[fields[3]] )
+            ) )
+        elif fields[0] == 'property':
+            elements[-1][2].append( ( fields[2], PLY_TYPES[fields[1]] ) )
+
+
+def _ply_binary( source, count, properties, order ):
+    '''
+    a binary element's properties, as a record array of the scalar ones,
+    and a list of the rows of its (one) list property, or None
+    '''
+    lists = [ p for p in properties if isinstance( p[1], tuple ) ]
+    if not lists:
+        dtype = numpy.dtype(
+            [ ( name, order + kind ) for name, kind in properties ]
+        )
+        return numpy.frombuffer(
+            source.read( dtype.itemsize * count ), dtype
+        ), None
+    if len( properties ) != 1:
+        raise ValueError( 'only elements of one list property are read' )
+    count_type, item_type = [
+        numpy.dtype( order + kind ) for kind in lists[0][1]
+    ]
+    # usually every face is a triangle, and can be read in one go
+    start = source.tell()
+    triangle = numpy.dtype( [
+        ( 'count', count_type ), ( 'items', item_type, ( 3, ) )
+    ] )
+    records = numpy.frombuffer(
+        source.read( triangle.itemsize * count ), triangle
+    )
+    if len( records ) == count and ( records['count'] == 3 ).all():
+        return None, records['items']
+    source.seek( start )
+    rows = []
+    for _ in range( count ):
+        length = int( numpy.frombuffer(
+            source.read( count_type.itemsize ), count_type
+        )[0] )
+        rows.append( numpy.frombuffer(
+            source.read( item_type.itemsize * length ), item_type
+        ) )
+    return None, rows
+
+
+def _ply_ascii( source, count, properties ):
+    lists = [ p for p in properties if isinstance( p[1], tuple ) ]
+    lines = [ source.readline().split() for _ in range( count ) ]
+    if not lists:
+        dtype = numpy.dtype( [ ( name, kind ) for name, kind in properties ] )
+        values = numpy.array( lines, dtype='f8' ).reshape( count, -1 )
+        records = numpy.zeros( count, dtype )
+        for column, ( name, _ ) in enumerate( properties ):
+            records[name] = values[:, column]
+        return records, None
+    if len( properties ) != 1:
+        raise ValueError( 'only elements of one list property are read' )
+    return None, [ [ int( v ) for v in line[1:] ] for line in lines ]
+
+
+def read_ply( path ):
+    '''
+    ( coords, indices ) of a PLY file's vertices and faces
+    '''
+    with open( path, 'rb' ) as source:
+        format, elements = _ply_header( source )
+        vertices = faces = None
+        for name, count, properties in elements:
+            if format == 'ascii':
+                records, rows = _ply_ascii( source, count, properties )
+            elif format in ( 'binary_little_endian', 'binary_big_endian' ):
+                records, rows = _ply_binary(
+                    source, count, properties,
+                    '<' if format == 'binary_little_endian' else '>'
+                )
+            else:
+                raise ValueError( 'unknown PLY format %r' % ( format, ) )
+            if name == 'vertex':
+                vertices = records
+            elif name == 'face':
+                faces = rows
+    if vertices is None or faces is None:
+        raise ValueError( '%s has no vertices or faces' % ( path, ) )
+
+    def columns( *names ):
+        if all( name in vertices.dtype.names for name in names ):
+            return numpy.column_stack(
+                [ vertices[name] for name in names ]
+            ).astype( 'f' )
+    texcoords = columns( 's', 't' )
+    if texcoords is None:
+        texcoords = columns( 'u', 'v' )
+    if isinstance( faces, numpy.ndarray ):
+        triangles = faces
+    else:
+        triangles = []
+        for face in faces:
+            triangles.extend( _fan( list( face ) ) )
+    return _quadric(
+        columns( 'x', 'y', 'z' ), texcoords, columns( 'nx', 'ny', 'nz' ),
+        numpy.array( triangles, dtype=numpy.intp ).reshape( -1, 3 )
+    )
+
+
+READERS = { '.obj': read_obj, '.ply': read_ply }
+
+
+def convert( source, destination, optimise=False ):
+    extension = re.search( r'\.\w+$', source.lower() )
+    reader = READERS.get( extension.group() if extension else None )
+    if reader is None:
+        raise ValueError( 'can only convert %s files' % (
+            ', '.join( sorted( READERS ) ),
+        ) )
+    coords, indices = reader( source )
+    if optimise:
+        coords, indices = vertexcache.optimise_mesh(
+            coords, indices, reduce_overdraw=True
+        )
+    save( destination, coords, indices )
+
+
+def describe( path ):
+    start = timing.clock()
+    data = MeshFile( path )
+    opened = timing.clock() - start
+    print( '%s: %d vertices of %d bytes, %s indices, opened in %.3fms' % (
+        path, data.count, data.stride,
+        'no' if data.indices is None else '%d %s' % (
+            len( data.indices ), data.indices.dtype
+        ),
+        opened * 1000.0,
+    ) )
+    for name, entry in zip( data.names(), data.attributes ):
+        print( '    %-16s offset %3d  %d x %s%s' % (
+            name, entry['offset'], entry['size'],
+            _dtype( int( entry['type'] ) ).name,
+            ' normalized' if entry['normalized'] else '',
+        ) )
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser(
+        usage='%prog [options] MODEL.obj|MODEL.ply OUTPUT.mesh\n'
+              '       %prog MODEL.mesh'
+    )
+    parser.add_option( '--optimise', action='store_true',
+        help='reorder the triangles and vertices, see vertexcache.py' )
+    options, paths = parser.parse_args( argv )
+    if len( paths ) not in ( 1, 2 ):
+        parser.error( 'name a model to convert and a file to write, '
+                      'or a mesh file to describe' )
+    try:
+        if len( paths ) == 2:
+            convert( paths[0], paths[1], options.optimise )
+        describe( paths[-1] )
+    except ValueError as err:
+        parser.error( str( err ) )
+
+
+if __name__ == "__main__":
+    main()
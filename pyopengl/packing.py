@@ -0,0 +1,227 @@
+'''
+Packs vertex attributes into fewer bytes than the tutorials' 32 bit floats,
+for glVertexAttribPointer to unpack as the GPU reads them:
+
+    packed = pack( [
+        ( 'position', positions, 'quantised' ),
+        ( 'normal', normals, 'normal' ),
+        ( 'colour', colours, 'unorm8' ),
+    ] )
+    mesh = Mesh( packed.buffer(), packed.attributes( locations ), count )
+    gl.glLoadMatrixf( packed.decode_matrix().dot( modelview ) )
+
+FORMATS, per value:
+
+    'float'      32 bit float, as before
+    'half'       16 bit float (GL_HALF_FLOAT), 3 significant figures
+    'quantised'  normalised unsigned short, spread over a cube around
+                 every quantised attribute, as big as the largest side of
+                 their bounding box, 1/65535 of that apart
+    'normal'     GL_INT_2_10_10_10_REV: all of a unit vector in 4 bytes,
+                 to about a tenth of a degree
+    'unorm8'     normalised unsigned byte, for colours in 0..1
+
+Fields are padded to a multiple of 4 bytes, which GL wants, so a half or
+quantised vec3 takes 8 bytes rather than 12, and a unorm8 vec3 4.  A
+position, texcoord and normal vertex drops from 32 bytes to 16, and 03's
+two positions and a colour from 36 to 20.
+
+Quantised values come out of the GPU in 0..1 of the cube.  Put
+decode_matrix() ahead of the modelview, as above, for shaders which only
+transform positions by it.  As the cube scales every axis alike, normals
+turned by gl_NormalMatrix keep their direction, only their length, which
+lights.py's shaders normalise away.  Those that need model space
+positions, such as lights.py's for point lights, must decode them with
+DECODE_GLSL instead, given its uniforms.
+'''
+import numpy
+
+from OpenGL import GL as gl
+from OpenGL.arrays import vbo
+
+import geometry
+import transforms
+from mesh import Attribute
+
+
+# name: ( numpy type, GL type, normalized )
+FORMATS = {
+    'float': ( numpy.float32, gl.GL_FLOAT, False ),
+    'half': ( numpy.float16, gl.GL_HALF_FLOAT, False ),
+    'quantised': ( numpy.uint16, gl.GL_UNSIGNED_SHORT, True ),
+    'normal': ( numpy.uint32, gl.GL_INT_2_10_10_10_REV, True ),
+    'unorm8': ( numpy.uint8, gl.GL_UNSIGNED_BYTE, True ),
+}
+DECODE_GLSL = '''
+uniform vec3 quantised_low;
+uniform vec3 quantised_extent;
+vec3 decode_quantised( vec3 stored ) {
+    return quantised_low + stored * quantised_extent;
+}
+'''
+
+
+def pack_normals( normals ):
+    '''
+    (N, 3) unit vectors as GL_INT_2_10_10_10_REV: x, y and z in ten bit
+    signed fields from the least significant end, and w (0) in the top two
+    '''
+    normals = numpy.clip( numpy.asarray( normals, dtype='f8' ), -1.0, 1.0 )
+    fields = numpy.round( normals * 511.0 ).astype( numpy.int32 ) & 0x3ff
+    fields = fields.astype( numpy.uint32 )
+    return fields[:, 0] | ( fields[:, 1] << 10 ) | ( fields[:, 2] << 20 )
+
+
+def unpack_normals( packed ):
+    '''
+    the vectors pack_normals() packed, as GL 4.2 reads them
+    '''
+    packed = numpy.asarray( packed, dtype=numpy.uint32 )
+    fields = numpy.column_stack(
+        [ ( packed >> shift ) & 0x3ff for shift in ( 0, 10, 20 ) ]
+    ).astype( numpy.int32 )
+    fields[fields > 511] -= 1024
+    return numpy.maximum( fields / 511.0, -1.0 )
+
+
+def bounds( values, cube=False ):
+    '''
+    ( low, extent ) of the box around (N, k) values, extent never 0, and
+    if cube, the largest on every axis
+    '''
+    low, high = values.min( axis=0 ), values.max( axis=0 )
+    extent = high - low
+    if cube:
+        extent[:] = extent.max()
+    return low, numpy.where( extent > 0, extent, 1.0 )
+
+
+def _padded( values, dtype, fill ):
+    '''
+    (N, k) values with columns of fill added to make a multiple of 4 bytes
+    '''
+    itemsize = numpy.dtype( dtype ).itemsize
+    count, width = values.shape
+    columns = -( -width * itemsize // 4 ) * 4 // itemsize
+    result = numpy.empty( ( count, columns ), dtype=dtype )
+    result[:, :width] = values
+    result[:, width:] = fill
+    return result
+
+
+class Packed( object ):
+    '''
+    vertices packed into one interleaved numpy structured array
+
+    fields -- [ ( name, size, GL type, normalized ) ] of each attribute
+    low, extent -- box the quantised fields are spread over, or None
+    '''
+    def __init__( self, vertices, fields, low=None, extent=None ):
+        self.vertices = vertices
+        self.fields = fields
+        self.low = low
+        self.extent = extent
+
+    @property
+    def stride( self ):
+        return self.vertices.dtype.itemsize
+
+    def __len__( self ):
+        return len( self.vertices )
+
+    def buffer( self, **named ):
+        return vbo.VBO( self.vertices.view( numpy.uint8 ), **named )
+
+    def attributes( self, locations, buffer=None ):
+        '''
+        mesh.Attributes reading the fields with locations ( { name:
+        shader location } ), those with none skipped by the Mesh
+        '''
+        return [
+            Attribute(
+                locations.get( name ), size, self.stride,
+                self.vertices.dtype.fields[name][1], type=gl_type,
+                normalized=normalized, buffer=buffer
+            )
+            for name, size, gl_type, normalized in self.fields
+        ]
+
+    def decode_matrix( self ):
+        '''
+        a transforms.py matrix taking quantised positions back to model
+        space, to go before the modelview: a translation and a uniform
+        scale
+        '''
+        if self.low is None:
+            return transforms.identity()
+        return transforms.scale( *self.extent ).dot(
+            transforms.translation( *self.low )
+        )
+
+
+def pack( fields ):
+    '''
+    a Packed of [ ( name, (N, k) values, format ) ], format one of
+    FORMATS, and k 3 for 'normal' and 'quantised'
+    '''
+    fields = [
+        ( name, numpy.asarray( values, dtype='f8' ).reshape(
+            len( values ), -1
+        ), format )
+        for name, values, format in fields
+    ]
+    quantised = [
+        values for _, values, format in fields if format == 'quantised'
+    ]
+    if any( values.shape[1] != 3 for values in quantised ):
+        raise ValueError( 'only positions (x, y, z) can be quantised' )
+    low = extent = None
+    if quantised:
+        low, extent = bounds( numpy.concatenate( quantised ), cube=True )
+
+    columns = []
+    layout = []
+    for name, values, format in fields:
+        dtype, gl_type, normalized = FORMATS[format]
+        size = values.shape[1]
+        if format == 'normal':
+            stored = pack_normals( values[:, :3] )[:, None]
+            # packed types are always read as 4 values
+            size = 4
+        elif format == 'quantised':
+            stored = _padded( numpy.round(
+                ( values - low ) / extent * 65535.0
+            ), dtype, 65535 )
+        elif format == 'unorm8':
+            stored = _padded( numpy.round(
+                numpy.clip( values, 0.0, 1.0 ) * 255.0
+            ), dtype, 255 )
+        else:
+            stored = _padded( values, dtype, 1.0 )
+        columns.append( ( name, stored ) )
+        layout.append( ( name, size, gl_type, normalized ) )
+
+    dtype = numpy.dtype( [
+        ( name, stored.dtype, ( stored.shape[1], ) )
+        for name, stored in columns
+    ] )
+    vertices = numpy.zeros( len( columns[0][1] ) if columns else 0, dtype )
+    for name, stored in columns:
+        vertices[name] = stored
+    return Packed( vertices, layout, low, extent )
+
+
+def pack_quadric( coords, position='half', texcoord='half',
+                  normal='normal' ):
+    '''
+    a Packed of OpenGLContext's interleaved quadric layout (see
+    geometry.py), with its fields in the named formats
+    '''
+    coords = numpy.asarray( getattr( coords, 'data', coords ) ).reshape(
+        -1, geometry.COORD_STRIDE
+    )
+    return pack( [
+        ( 'position', coords[:, geometry.POSITION_OFFSET:][:, :3], position ),
+        ( 'texcoord', coords[:, geometry.TEXCOORD_OFFSET:][:, :2], texcoord ),
+        ( 'normal', coords[:, geometry.NORMAL_OFFSET:][:, :3], normal ),
+    ] )
@@ -0,0 +1,146 @@
+'''
+Reads and writes the PNGs of the regression suite with only zlib and
+numpy: 8 bit RGB or RGBA, not interlaced, which is all we ever write.
+'''
+import struct
+import zlib
+
+import numpy
+
+
+SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# colour type: channels
+CHANNELS = { 2: 3, 6: 4 }
+
+
+def _chunk( kind, data ):
+    return (
+        struct.pack( '>I', len( data ) ) + kind + data
+        + struct.pack( '>I', zlib.crc32( kind + data ) & 0xffffffff )
+    )
+
+
+def write_png( path, pixels ):
+    '''
+    write (height, width, 4) uint8 pixels, top row first
+    '''
+    pixels = numpy.ascontiguousarray( pixels, dtype=numpy.uint8 )
+    height, width, channels = pixels.shape
+    colour_type = dict( ( v, k ) for k, v in CHANNELS.items() )[channels]
+    # filter type 0 (none) in front of every row
+    rows = numpy.zeros( ( height, width * channels + 1 ), dtype=numpy.uint8 )
+    rows[:, 1:] = pixels.reshape( height, -1 )
+    with open( path, 'wb' ) as output:
+        output.write( SIGNATURE )
+        output.write( _chunk( b'IHDR', struct.pack(
+            '>IIBBBBB', width, height, 8, colour_type, 0, 0, 0
+        ) ) )
+        output.write( _chunk( b'IDAT', zlib.compress( rows.tobytes(), 9 ) ) )
+        output.write( _chunk( b'IEND', b'' ) )
+
+
+def _paeth( a, b, c ):
+    p = a + b - c
+    pa, pb, pc = abs( p - a ), abs( p - b ), abs( p - c )
+    return numpy.where(
+        ( pa <= pb ) & ( pa <= pc ), a, numpy.where( pb <= pc, b, c )
+    )
+
+
+def _unfilter_rows( rows, kinds, channels ):
+    # filters 0 to 2 need only the row above, so go a row at a time
+    height, stride = rows.shape
+    out = numpy.zeros( ( height, stride ), dtype=numpy.int32 )
+    previous = numpy.zeros( stride, dtype=numpy.int32 )
+    for y in range( height ):
+        line = rows[y].astype( numpy.int32 )
+        if kinds[y] == 1:
+            line = numpy.cumsum(
+                line.reshape( -1, channels ), axis=0
+            ).ravel() & 0xff
+        elif kinds[y] == 2:
+            line = ( line + previous ) & 0xff
+        out[y] = previous = line
+    return out
+
+
+def _unfilter_diagonals( rows, kinds, channels ):
+    # filters 3 (average) and 4 (Paeth) need the pixel to the left, above
+    # and above left, so go an anti-diagonal of pixels at a time, each
+    # needing only the two before it: width + height steps, not one per
+    # pixel
+    height, stride = rows.shape
+    width = stride // channels
+    filtered = rows.reshape( height, width, channels ).astype( numpy.int32 )
+    # a row and column of zeros above and left, for the edges
+    out = numpy.zeros( ( height + 1, width + 1, channels ), dtype=numpy.int32 )
+    kinds = kinds.astype( numpy.int32 )[:, None]
+    for diagonal in range( height + width - 1 ):
+        y = numpy.arange(
+            max( 0, diagonal - width + 1 ), min( height, diagonal + 1 )
+        )
+        x = diagonal - y
+        left, up, upper_left = out[y + 1, x], out[y, x + 1], out[y, x]
+        kind = kinds[y]
+        predictor = numpy.where(
+            kind == 1, left, numpy.where(
+                kind == 2, up, numpy.where(
+                    kind == 3, ( left + up ) // 2, numpy.where(
+                        kind == 4, _paeth( left, up, upper_left ), 0
+                    )
+                )
+            )
+        )
+        out[y + 1, x + 1] = ( filtered[y, x] + predictor ) & 0xff
+    return out[1:, 1:].reshape( height, stride )
+
+
+def _unfilter( data, height, stride, channels ):
+    rows = numpy.frombuffer( data, dtype=numpy.uint8 ).reshape(
+        height, stride + 1
+    )
+    kinds = rows[:, 0]
+    if ( kinds > 4 ).any():
+        raise ValueError( 'bad PNG filter type %d' % ( kinds.max(), ) )
+    if ( kinds >= 3 ).any():
+        out = _unfilter_diagonals( rows[:, 1:], kinds, channels )
+    else:
+        out = _unfilter_rows( rows[:, 1:], kinds, channels )
+    return out.astype( numpy.uint8 )
+
+
+def read_png( path ):
+    '''
+    (height, width, 4) uint8 pixels, top row first
+    '''
+    with open( path, 'rb' ) as stream:
+        data = stream.read()
+    if not data.startswith( SIGNATURE ):
+        raise ValueError( '%s is not a PNG' % ( path, ) )
+    offset = len( SIGNATURE )
+    header, compressed = None, []
+    while offset < len( data ):
+        length, kind = struct.unpack_from( '>I4s', data, offset )
+        body = data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+        if kind == b'IHDR':
+            header = struct.unpack( '>IIBBBBB', body )
+        elif kind == b'IDAT':
+            compressed.append( body )
+        elif kind == b'IEND':
+            break
+    width, height, depth, colour_type, _, _, interlace = header
+    if depth != 8 or colour_type not in CHANNELS or interlace:
+        raise ValueError(
+            '%s: only 8 bit RGB(A), non-interlaced PNGs are supported'
+            % ( path, )
+        )
+    channels = CHANNELS[colour_type]
+    pixels = _unfilter(
+        zlib.decompress( b''.join( compressed ) ), height, width * channels,
+        channels
+    ).reshape( height, width, channels )
+    if channels == 3:
+        alpha = numpy.full( ( height, width, 1 ), 255, dtype=numpy.uint8 )
+        pixels = numpy.concatenate( ( pixels, alpha ), axis=2 )
+    return pixels
@@ -0,0 +1,262 @@
+'''
+Renders each tutorial headlessly and compares the frame with a golden
+image, so changes made for speed can't quietly change what's drawn.
+
+    python regression.py                  # check 01-09 against golden/
+    python regression.py --update         # (re)write the golden images
+    python regression.py --software       # render with softshaders.py,
+                                          # against golden/software/
+
+Each tutorial is rendered in its own process (by headless.py --png, or
+softshaders.py --output), several at once, and compared as it finishes.
+One frame is rendered, at animation time 0 unless FRACTIONS gives
+another: 03 and 04 are compared half way through their tween, which at
+time 0 would be missed.
+
+An image passes when its structural similarity (SSIM, of the luminance
+over 7x7 windows) with the golden is at least MIN_SSIM, and no more than
+MAX_BAD_PIXELS of its pixels differ from the golden's by more than
+PIXEL_TOLERANCE in any channel.  Drivers don't rasterise identically, so
+the tolerances absorb rounding and edge differences, not real changes.
+
+The GL check is the one to gate on: it runs each tutorial itself, its
+OnInit, Render and shaders, so needs OpenGLContext.  Its goldens should
+be made with software Mesa (llvmpipe), the default under headless.py's
+EGL surfaceless platform, by --update; a tutorial without one fails, as
+MISSING.  softshaders.py's renders differ from GL's, so have goldens of
+their own, in golden/software/, which are committed: they need no GL to
+make or check.  They are drawn from each tutorial's own vertex data and
+uniforms, read from its source, but through shaders ported by hand, so
+catch changes to what a tutorial draws, not to its GLSL.
+'''
+import glob
+import optparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+from os.path import abspath, basename, dirname, exists, join, splitext
+
+import numpy
+
+import pngio
+
+
+HERE = dirname( abspath( __file__ ) )
+GOLDEN_DIRECTORY = join( HERE, 'golden' )
+SOFTWARE_GOLDEN_DIRECTORY = join( GOLDEN_DIRECTORY, 'software' )
+DEFAULT_SIZE = '320x240'
+
+PIXEL_TOLERANCE = 3
+MAX_BAD_PIXELS = 0.002
+MIN_SSIM = 0.99
+
+SSIM_WINDOW = 7
+# animation time of the frame compared, where 0.0 shows no animation
+FRACTIONS = {
+    '03-uniform-values.py': 0.25,
+    '04-uniform-values-tweening.py': 0.25,
+}
+# the usual SSIM stabilising constants, for 8 bit values
+SSIM_C1 = ( 0.01 * 255 ) ** 2
+SSIM_C2 = ( 0.03 * 255 ) ** 2
+
+
+def tutorials():
+    return sorted( glob.glob( join( HERE, '0[0-9]-*.py' ) ) )
+
+
+def golden_path( path, directory=GOLDEN_DIRECTORY ):
+    return join( directory, splitext( basename( path ) )[0] + '.png' )
+
+
+def luminance( pixels ):
+    rgb = pixels[..., :3].astype( 'd' )
+    return rgb.dot( ( 0.299, 0.587, 0.114 ) )
+
+
+def _window_means( image, size ):
+    '''
+    mean of every size x size window of image, by summed-area table
+    '''
+    table = numpy.zeros( ( image.shape[0] + 1, image.shape[1] + 1 ) )
+    table[1:, 1:] = image.cumsum( axis=0 ).cumsum( axis=1 )
+    return (
+        table[size:, size:] - table[:-size, size:]
+        - table[size:, :-size] + table[:-size, :-size]
+    ) / float( size * size )
+
+
+def ssim( a, b, size=SSIM_WINDOW ):
+    '''
+    mean structural similarity of two images' luminance
+    '''
+    x, y = luminance( a ), luminance( b )
+    mean_x, mean_y = _window_means( x, size ), _window_means( y, size )
+    var_x = _window_means( x * x, size ) - mean_x * mean_x
+    var_y = _window_means( y * y, size ) - mean_y * mean_y
+    covariance = _window_means( x * y, size ) - mean_x * mean_y
+    similarity = (
+        ( 2 * mean_x * mean_y + SSIM_C1 ) * ( 2 * covariance + SSIM_C2 )
+    ) / (
+        ( mean_x ** 2 + mean_y ** 2 + SSIM_C1 ) * ( var_x + var_y + SSIM_C2 )
+    )
+    return float( similarity.mean() )
+
+
+def compare( actual, golden, tolerance=PIXEL_TOLERANCE ):
+    '''
+    returns a dict: ssim, bad_pixels (the fraction differing by more than
+    tolerance), max_difference, and the per-pixel difference image
+    '''
+    if actual.shape != golden.shape:
+        return {
+            'ssim': 0.0, 'bad_pixels': 1.0, 'max_difference': 255,
+            'difference': None,
+        }
+    difference = numpy.abs(
+        actual.astype( 'i' ) - golden.astype( 'i' )
+    ).max( axis=2 )
+    return {
+        'ssim': ssim( actual, golden ),
+        'bad_pixels': float( ( difference > tolerance ).mean() ),
+        'max_difference': int( difference.max() ),
+        'difference': difference,
+    }
+
+
+def difference_image( difference ):
+    '''
+    pixels over tolerance in red, the rest in grey by how far out they are
+    '''
+    grey = numpy.minimum( difference * 32, 255 ).astype( numpy.uint8 )
+    image = numpy.empty( difference.shape + ( 4, ), dtype=numpy.uint8 )
+    image[..., 0] = image[..., 1] = image[..., 2] = grey
+    image[..., 3] = 255
+    image[difference > PIXEL_TOLERANCE] = ( 255, 0, 0, 255 )
+    return image
+
+
+def render_command( path, output, size, software ):
+    fraction = '%g' % ( FRACTIONS.get( basename( path ), 0.0 ), )
+    if software:
+        return [ sys.executable, join( HERE, 'softshaders.py' ), path,
+                 '--size', size, '--processes', '1', '--fraction', fraction,
+                 '--output', output ]
+    return [ sys.executable, join( HERE, 'headless.py' ), path,
+             '--frames', '1', '--warmup', '0', '--size', size,
+             '--fraction', fraction, '--png', output ]
+
+
+class Check( object ):
+    '''
+    renders one tutorial and compares it with its golden
+    '''
+    def __init__( self, options, scratch ):
+        self.options = options
+        self.scratch = scratch
+
+    def __call__( self, path ):
+        options = self.options
+        output = join( self.scratch, basename( golden_path( path ) ) )
+        process = subprocess.Popen(
+            render_command( path, output, options.size, options.software ),
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            cwd=dirname( abspath( path ) ),
+        )
+        log = process.communicate()[0]
+        if process.returncode or not exists( output ):
+            return path, 'ERROR', None, log.decode( 'utf-8', 'replace' )
+
+        golden = golden_path( path, options.golden )
+        if options.update:
+            shutil.copyfile( output, golden )
+            return path, 'UPDATED', None, ''
+        if not exists( golden ):
+            return path, 'MISSING', None, 'no golden image; run with --update'
+
+        actual = pngio.read_png( output )
+        result = compare( actual, pngio.read_png( golden ), options.tolerance )
+        passed = (
+            result['ssim'] >= options.min_ssim
+            and result['bad_pixels'] <= options.max_bad_pixels
+        )
+        if not passed and options.artifacts:
+            stem = join( options.artifacts, splitext( basename( golden ) )[0] )
+            pngio.write_png( stem + '.actual.png', actual )
+            if result['difference'] is not None:
+                pngio.write_png(
+                    stem + '.difference.png',
+                    difference_image( result['difference'] )
+                )
+        return path, 'PASS' if passed else 'FAIL', result, ''
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser(
+        usage='%prog [options] [TUTORIAL.py ...]'
+    )
+    parser.add_option( '-s', '--size', default=DEFAULT_SIZE,
+        help='render at WIDTHxHEIGHT [%default]' )
+    parser.add_option( '-j', '--jobs', type='int', default=cpu_count(),
+        help='tutorials rendered at once [%default]' )
+    parser.add_option( '--software', action='store_true',
+        help='render with softshaders.py instead of GL' )
+    parser.add_option( '--update', action='store_true',
+        help='write the renders as the new golden images' )
+    parser.add_option( '--golden',
+        help='directory of golden images [%s, or with --software, %s]' % (
+            GOLDEN_DIRECTORY, SOFTWARE_GOLDEN_DIRECTORY,
+        ) )
+    parser.add_option( '--artifacts', metavar='DIR',
+        help='write the actual and difference images of failures to DIR' )
+    parser.add_option( '--tolerance', type='int', default=PIXEL_TOLERANCE,
+        help='per channel difference allowed [%default]' )
+    parser.add_option( '--max-bad-pixels', type='float',
+        default=MAX_BAD_PIXELS,
+        help='fraction of pixels allowed over tolerance [%default]' )
+    parser.add_option( '--min-ssim', type='float', default=MIN_SSIM,
+        help='least structural similarity allowed [%default]' )
+    options, paths = parser.parse_args( argv )
+    paths = [ abspath( path ) for path in paths ] or tutorials()
+    if options.golden is None:
+        options.golden = (
+            SOFTWARE_GOLDEN_DIRECTORY if options.software
+            else GOLDEN_DIRECTORY
+        )
+
+    for directory in ( options.golden, options.artifacts ):
+        if directory and not exists( directory ):
+            os.makedirs( directory )
+    scratch = tempfile.mkdtemp( prefix='regression-' )
+    pool = ThreadPool( max( 1, options.jobs ) )
+    failures = 0
+    try:
+        for path, status, result, log in pool.imap(
+            Check( options, scratch ), paths
+        ):
+            name = basename( path )
+            if result is None:
+                print( '%-7s %s %s' % ( status, name, log.strip() ) )
+            else:
+                print( '%-7s %-32s ssim %.4f  bad pixels %.4f%%  '
+                       'max difference %3d' % (
+                    status, name, result['ssim'],
+                    result['bad_pixels'] * 100.0, result['max_difference'],
+                ) )
+            if status not in ( 'PASS', 'UPDATED' ):
+                failures += 1
+    finally:
+        pool.close()
+        pool.join()
+        shutil.rmtree( scratch )
+
+    print( '%d of %d failed' % ( failures, len( paths ) ) )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit( main() )
@@ -0,0 +1,221 @@
+'''
+Collects a frame's draws, each tagged with its program, material,
+textures and depth, and submits them sorted so that items sharing state
+are drawn together, binding through a glstate.GLState:
+
+    queue = RenderQueue()
+    queue.prepare( program, lambda: LIGHTS.upload( lights_loc, program ) )
+    for item in scene:
+        queue.add( item.program, item.mesh, item.material,
+                   textures=( item.texture, ), depth=item.distance )
+    stats = queue.submit()      # the state changes it made
+    queue.clear()
+
+Each item's sort key packs, most significant first, the ids of its
+program, texture set and material, and its depth quantised nearest
+first, into 64 bits:
+
+    bits 52-63  program       (what costs most to change)
+    bits 36-51  textures
+    bits 20-35  material
+    bits  0-19  depth         (front to back, for early depth rejection)
+
+so sorting the keys puts each program's items together, and within them
+each texture set's, each material's, and the nearest first.  The keys
+are radix sorted, 16 bits at a time.
+
+Meshes should be made with the queue's state (Mesh( ..., state=
+queue.state )), so their binds are skipped too.  Materials are uploaded
+through a uniforms.UniformCache, so a value a program already holds
+isn't sent again.
+'''
+import numpy
+
+from OpenGL import GL as gl
+
+from glstate import GLState
+from uniforms import UniformCache
+
+
+PROGRAM_BITS = 12
+TEXTURE_BITS = 16
+MATERIAL_BITS = 16
+DEPTH_BITS = 20
+DEPTH_SHIFT = 0
+MATERIAL_SHIFT = DEPTH_SHIFT + DEPTH_BITS
+TEXTURE_SHIFT = MATERIAL_SHIFT + MATERIAL_BITS
+PROGRAM_SHIFT = TEXTURE_SHIFT + TEXTURE_BITS
+KEY_BITS = PROGRAM_SHIFT + PROGRAM_BITS
+DIGIT_BITS = 16
+
+
+def radix_argsort( keys, bits=KEY_BITS ):
+    '''
+    the order sorting uint64 keys, stably, by a least significant digit
+    first radix sort of their low bits.  numpy's stable sort of 16 bit
+    integers is itself a radix sort, so each pass is one argsort; passes
+    over digits every key shares are skipped.
+    '''
+    keys = numpy.asarray( keys, dtype=numpy.uint64 )
+    order = numpy.arange( len( keys ) )
+    mask = numpy.uint64( ( 1 << DIGIT_BITS ) - 1 )
+    for shift in range( 0, bits, DIGIT_BITS ):
+        digits = (
+            ( keys[order] >> numpy.uint64( shift ) ) & mask
+        ).astype( numpy.uint16 )
+        if not len( digits ) or ( digits == digits[0] ).all():
+            continue
+        order = order[numpy.argsort( digits, kind='stable' )]
+    return order
+
+
+class Material( object ):
+    '''
+    uniform values shared by the items drawn with it: uniform names, as
+    in the programs drawing it, to sequences of 1 to 4 floats
+    '''
+    def __init__( self, values ):
+        self.values = dict( values )
+
+
+class RenderQueue( object ):
+    '''
+    a frame's draw items, submitted in the order needing fewest state
+    changes
+
+    state -- the glstate.GLState to bind through, a new one by default
+    uniforms -- the uniforms.UniformCache materials are set through
+    '''
+    def __init__( self, state=None, uniforms=None ):
+        self.state = state if state is not None else GLState()
+        self.uniforms = uniforms if uniforms is not None else UniformCache()
+        self.setups = {}
+        self.locations = {}
+        self.clear()
+
+    def clear( self ):
+        '''
+        forget the items added, once they are submitted
+        '''
+        self.items = []
+        self.fields = []
+        self.depths = []
+        # small ids for the sort keys, numbered afresh each frame, so
+        # materials and texture sets made per frame aren't kept, and
+        # only a frame's own can run out of ids
+        self.ids = {
+            'program': {}, 'textures': {}, 'material': {},
+        }
+
+    def __len__( self ):
+        return len( self.items )
+
+    def _id( self, kind, value, bits ):
+        table = self.ids[kind]
+        result = table.setdefault( value, len( table ) )
+        if result >= 1 << bits:
+            raise ValueError(
+                'more than %d %ss in a frame' % ( 1 << bits, kind )
+            )
+        return result
+
+    def prepare( self, program, setup ):
+        '''
+        call setup(), with program in use, before the first item each
+        submit() draws with it, eg. to upload the lights it shares
+        '''
+        self.setups[program] = setup
+
+    def add( self, program, mesh, material=None, textures=(), depth=0.0 ):
+        '''
+        queue mesh (a Mesh, or anything with a draw()) to draw with
+        program and material (a Material, or None), textures bound to
+        GL_TEXTURE_2D on units 0, 1, ... and at depth from the eye
+        '''
+        textures = tuple( textures )
+        self.items.append( ( program, mesh, material, textures ) )
+        self.fields.append( (
+            self._id( 'program', program, PROGRAM_BITS ),
+            self._id( 'textures', textures, TEXTURE_BITS ),
+            self._id( 'material', material, MATERIAL_BITS ),
+        ) )
+        self.depths.append( depth )
+
+    def keys( self ):
+        '''
+        (N,) uint64 sort keys of the items, as laid out above
+        '''
+        fields = numpy.array( self.fields, dtype=numpy.uint64 ).reshape(
+            -1, 3
+        )
+        depths = numpy.array( self.depths, dtype='d' )
+        quantised = numpy.zeros( len( depths ), dtype=numpy.uint64 )
+        if len( depths ):
+            near, far = depths.min(), depths.max()
+            if far > near:
+                quantised = (
+                    ( depths - near ) * ( ( 1 << DEPTH_BITS ) - 1 )
+                    / ( far - near )
+                ).astype( numpy.uint64 )
+        return (
+            ( fields[:, 0] << numpy.uint64( PROGRAM_SHIFT ) )
+            | ( fields[:, 1] << numpy.uint64( TEXTURE_SHIFT ) )
+            | ( fields[:, 2] << numpy.uint64( MATERIAL_SHIFT ) )
+            | ( quantised << numpy.uint64( DEPTH_SHIFT ) )
+        )
+
+    def order( self ):
+        return radix_argsort( self.keys() )
+
+    def location( self, program, name ):
+        '''
+        the location of uniform name in program, looked up once
+        '''
+        key = ( program, name )
+        location = self.locations.get( key )
+        if location is None:
+            location = self.locations[key] = gl.glGetUniformLocation(
+                program, name
+            )
+        return location
+
+    def submit( self, sort=True ):
+        '''
+        draw every item, sorted unless sort is False, leaving nothing
+        bound.  Returns the state changes made: the GLState's counters,
+        plus 'materials' applied, 'uniforms' ( issued, skipped ) and
+        'items' drawn.
+        '''
+        state = self.state
+        state.reset_counters()
+        self.uniforms.reset_counters()
+        order = self.order() if sort else range( len( self.items ) )
+        prepared = set()
+        applied = None
+        materials = 0
+        try:
+            for index in order:
+                program, mesh, material, textures = self.items[index]
+                state.use_program( program )
+                if program not in prepared:
+                    prepared.add( program )
+                    setup = self.setups.get( program )
+                    if setup is not None:
+                        setup()
+                if material is not None and applied != ( program, material ):
+                    applied = ( program, material )
+                    materials += 1
+                    for name, value in material.values.items():
+                        self.uniforms.set(
+                            program, self.location( program, name ), value
+                        )
+                for unit, texture in enumerate( textures ):
+                    state.bind_texture( unit, gl.GL_TEXTURE_2D, texture )
+                mesh.draw()
+            stats = state.counters()
+        finally:
+            state.reset()
+        stats['materials'] = materials
+        stats['uniforms'] = ( self.uniforms.issued, self.uniforms.skipped )
+        stats['items'] = len( self.items )
+        return stats
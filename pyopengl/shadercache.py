@@ -0,0 +1,198 @@
+'''
+Caches linked shader programs on disk with glGetProgramBinary, so they can
+be restored with glProgramBinary on the next run instead of compiled.
+
+compileShader and compileProgram are drop-in replacements for the ones in
+OpenGL.GL.shaders:
+
+    from shadercache import compileProgram, compileShader
+
+except that compileShader only records the source, leaving compilation
+to compileProgram, and only then if the program isn't in the cache.
+
+Programs are keyed on a SHA-256 of their sources together with the GL
+vendor, renderer and version strings, since a binary is only good for
+the driver that made it.  Should a driver reject a cached binary anyway
+(after an upgrade which kept the version string, say), or not know its
+format, the program is compiled from source and the cache entry replaced.
+
+The cache lives in $SHADER_CACHE_DIR, or ~/.cache/opengl-tutorials/shaders.
+Drivers without GL 4.1 or GL_ARB_get_program_binary just compile.
+'''
+import ctypes
+import hashlib
+import os
+import struct
+from os.path import exists, expanduser, join
+
+from OpenGL import GL as gl
+from OpenGL.GL import shaders
+from OpenGL.error import GLError
+
+
+DEFAULT_DIRECTORY = join( '~', '.cache', 'opengl-tutorials', 'shaders' )
+
+HEADER = struct.Struct( '<I' )  # binary format enum, then the binary
+
+
+class ShaderSource( object ):
+    '''
+    what compileShader returns: a shader not compiled yet
+    '''
+    def __init__( self, source, type ):
+        if not isinstance( source, str ):
+            # a sequence of lines, as OpenGL.GL.shaders accepts
+            source = ''.join( source )
+        self.source = source
+        self.type = type
+
+
+class ShaderCache( object ):
+
+    def __init__( self, directory=None ):
+        if directory is None:
+            directory = os.environ.get( 'SHADER_CACHE_DIR', DEFAULT_DIRECTORY )
+        self.directory = expanduser( directory )
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self._supported = None
+        self._driver = None
+
+    def supported( self ):
+        if self._supported is None:
+            self._supported = bool(
+                gl.glGetProgramBinary and gl.glProgramBinary
+                and gl.glGetIntegerv( gl.GL_NUM_PROGRAM_BINARY_FORMATS )
+            )
+        return self._supported
+
+    def driver( self ):
+        if self._driver is None:
+            self._driver = b'\0'.join(
+                gl.glGetString( name ) or b''
+                for name in ( gl.GL_VENDOR, gl.GL_RENDERER, gl.GL_VERSION )
+            )
+        return self._driver
+
+    def key( self, shader_sources ):
+        digest = hashlib.sha256( self.driver() )
+        for shader in shader_sources:
+            digest.update( b'\0%d\0' % ( int( shader.type ), ) )
+            digest.update( shader.source.encode( 'utf-8' ) )
+        return digest.hexdigest()
+
+    def path( self, key ):
+        return join( self.directory, key + '.bin' )
+
+    def program( self, *shader_sources ):
+        '''
+        a linked program from ShaderSources, restored from the cache if
+        possible.  Raises RuntimeError if compiling or linking fails.
+        '''
+        if not self.supported():
+            self.misses += 1
+            return link( shader_sources, retrievable=False )
+
+        key = self.key( shader_sources )
+        program = self.restore( key )
+        if program is not None:
+            self.hits += 1
+            return program
+
+        self.misses += 1
+        program = link( shader_sources, retrievable=True )
+        self.store( key, program )
+        return program
+
+    def restore( self, key ):
+        path = self.path( key )
+        if not exists( path ):
+            return None
+        with open( path, 'rb' ) as stream:
+            data = stream.read()
+        if len( data ) <= HEADER.size:
+            return None
+        format, = HEADER.unpack_from( data )
+        binary = data[HEADER.size:]
+
+        program = gl.glCreateProgram()
+        try:
+            gl.glProgramBinary( program, format, binary, len( binary ) )
+        except GLError:
+            # GL_INVALID_ENUM, for a format the driver no longer offers
+            gl.glDeleteProgram( program )
+            self.rejected += 1
+            return None
+        if gl.glGetProgramiv( program, gl.GL_LINK_STATUS ) != gl.GL_TRUE:
+            gl.glDeleteProgram( program )
+            self.rejected += 1
+            return None
+        return program
+
+    def store( self, key, program ):
+        length = gl.glGetProgramiv( program, gl.GL_PROGRAM_BINARY_LENGTH )
+        if not length:
+            return
+        binary = ( ctypes.c_ubyte * length )()
+        written = gl.GLsizei()
+        format = gl.GLenum()
+        gl.glGetProgramBinary(
+            program, length, ctypes.byref( written ), ctypes.byref( format ),
+            binary
+        )
+        data = HEADER.pack( format.value ) + bytes(
+            bytearray( binary[:written.value] )
+        )
+        if not exists( self.directory ):
+            os.makedirs( self.directory )
+        # write then rename, so a concurrent run never reads half a binary
+        path = self.path( key )
+        temporary = '%s.%d.tmp' % ( path, os.getpid() )
+        with open( temporary, 'wb' ) as stream:
+            stream.write( data )
+        os.rename( temporary, path )
+
+    def stats( self ):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'rejected': self.rejected,
+        }
+
+
+def link( shader_sources, retrievable=False ):
+    '''
+    compile and link a program, as OpenGL.GL.shaders.compileProgram does
+    '''
+    compiled = [
+        shaders.compileShader( shader.source, shader.type )
+        for shader in shader_sources
+    ]
+    program = gl.glCreateProgram()
+    for shader in compiled:
+        gl.glAttachShader( program, shader )
+    if retrievable:
+        gl.glProgramParameteri(
+            program, gl.GL_PROGRAM_BINARY_RETRIEVABLE_HINT, gl.GL_TRUE
+        )
+    gl.glLinkProgram( program )
+    # the shaders are freed along with the program
+    for shader in compiled:
+        gl.glDeleteShader( shader )
+    if gl.glGetProgramiv( program, gl.GL_LINK_STATUS ) != gl.GL_TRUE:
+        log = gl.glGetProgramInfoLog( program )
+        gl.glDeleteProgram( program )
+        raise RuntimeError( 'Link failure: %s' % ( log, ) )
+    return program
+
+
+CACHE = ShaderCache()
+
+
+def compileShader( source, type ):
+    return ShaderSource( source, type )
+
+
+def compileProgram( *shader_sources ):
+    return CACHE.program( *shader_sources )
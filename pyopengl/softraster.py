@@ -0,0 +1,373 @@
+'''
+A triangle rasteriser in numpy, for rendering the tutorials' geometry on
+machines with no GL at all.
+
+Shaders are Python functions over arrays of vertices or fragments (see
+softshaders.py for ports of the tutorials' own):
+
+    vertex( attributes, uniforms ) -> ( clip positions (N, 4),
+                                        { varying name: (N, k) array } )
+    fragment( varyings, uniforms ) -> (M, 4) colours
+
+and a draw goes much as in GL: transform the vertices, assemble triangles,
+divide by w and map to the viewport, then, for each TILE x TILE block of
+pixels the triangles touch, test pixel centres against the triangles'
+edge functions, depth test, and interpolate the varyings (perspective
+correctly) for the fragment shader.  Tiles are independent, so they are
+shared out over a process pool.
+
+Within a tile every candidate fragment of every triangle is tested at
+once, and only the fragment which survives the depth test at each pixel
+is shaded, which gives the result sequential drawing would (with
+GL_LESS, and no blending) at a fraction of the fragment shader calls.
+
+Deliberately missing: clipping against the near plane (triangles with a
+vertex behind the eye are dropped whole), blending, face culling, and
+any primitive but GL_TRIANGLES.
+'''
+import multiprocessing
+
+import numpy
+
+import transforms
+
+
+TILE = 32
+# candidate fragments tested at once, which bounds the temporaries
+MAX_FRAGMENTS = 1 << 20
+# draws with fewer candidate fragments than this aren't worth the cost
+# of sending to the pool
+PARALLEL_FRAGMENTS = 1 << 18
+# window positions are rounded to 1 / SUBPIXEL of a pixel
+SUBPIXEL = 256
+# vertices with w below this are taken to be behind the eye
+MIN_W = 1e-6
+
+
+class Program( object ):
+    '''
+    a vertex and fragment shader pair.  For use with a process pool they
+    must be module-level functions, so they can be pickled.
+    '''
+    def __init__( self, vertex, fragment ):
+        self.vertex = vertex
+        self.fragment = fragment
+
+
+def builtin_uniforms( modelview, projection ):
+    '''
+    the matrices GLSL 1.10 shaders get for free, in the row layout of
+    transforms.py, so that gl_Position = point.dot( mvp )
+    '''
+    modelview = numpy.asarray( modelview, dtype='f' )
+    projection = numpy.asarray( projection, dtype='f' )
+    return {
+        'gl_ModelViewMatrix': modelview,
+        'gl_ProjectionMatrix': projection,
+        'gl_ModelViewProjectionMatrix': modelview.dot( projection ),
+        'gl_NormalMatrix': transforms.normal_matrix( modelview ),
+    }
+
+
+def _pack_varyings( varyings, count ):
+    '''
+    returns ( (count, V) float64 array, [ ( name, start, end ), ... ] )
+    '''
+    layout, columns, start = [], [], 0
+    for name in sorted( varyings ):
+        value = numpy.asarray( varyings[name], dtype='d' ).reshape( count, -1 )
+        layout.append( ( name, start, start + value.shape[1] ) )
+        columns.append( value )
+        start += value.shape[1]
+    if not columns:
+        return numpy.zeros( ( count, 0 ) ), layout
+    return numpy.hstack( columns ), layout
+
+
+def _top_left( start, end ):
+    '''
+    for counter-clockwise triangles with y up: whether the edge from start
+    to end owns the pixel centres lying exactly on it
+    '''
+    dx = end[..., 0] - start[..., 0]
+    dy = end[..., 1] - start[..., 1]
+    return ( dy < 0 ) | ( ( dy == 0 ) & ( dx < 0 ) )
+
+
+def _edge( start, end, x, y ):
+    return (
+        ( end[..., 0] - start[..., 0] ) * ( y - start[..., 1] )
+        - ( end[..., 1] - start[..., 1] ) * ( x - start[..., 0] )
+    )
+
+
+def _candidates( window, x0, y0, x1, y1 ):
+    '''
+    ( triangle, x, y ) of every pixel in each triangle's bounding box
+    that lies within x0 <= x < x1, y0 <= y < y1
+    '''
+    # pixel centres on the bounding box edge count too
+    low = numpy.ceil( window[:, :, :2].min( axis=1 ) - 0.5 )
+    high = numpy.floor( window[:, :, :2].max( axis=1 ) - 0.5 )
+    left = numpy.maximum( low[:, 0], x0 ).astype( 'i' )
+    bottom = numpy.maximum( low[:, 1], y0 ).astype( 'i' )
+    width = numpy.maximum( numpy.minimum( high[:, 0], x1 - 1 ) - left + 1, 0 )
+    height = numpy.maximum(
+        numpy.minimum( high[:, 1], y1 - 1 ) - bottom + 1, 0
+    )
+    width = width.astype( 'i' )
+    counts = width * height.astype( 'i' )
+    triangle = numpy.repeat( numpy.arange( len( window ) ), counts )
+    offset = numpy.arange( counts.sum() ) - numpy.repeat(
+        numpy.cumsum( counts ) - counts, counts
+    )
+    x = left[triangle] + offset % width[triangle]
+    y = bottom[triangle] + offset // width[triangle]
+    return triangle, x, y
+
+
+def _rasterise( job ):
+    '''
+    draw a batch of triangles into one tile; run in the pool.  Returns the
+    tile's colour and depth, or None if no fragment was written.
+    '''
+    ( x0, y0, colour, depth, window, inv_w, values, ids, layout,
+      fragment, uniforms, depth_test ) = job
+    colour = colour.copy()
+    depth = depth.copy()
+    height, width = depth.shape
+    written = False
+
+    batches = numpy.array_split(
+        numpy.arange( len( window ) ),
+        max( 1, int( numpy.ceil(
+            _area( window, x0, y0, width, height ) / float( MAX_FRAGMENTS )
+        ) ) )
+    )
+    for batch in batches:
+        triangle, x, y = _candidates(
+            window[batch], x0, y0, x0 + width, y0 + height
+        )
+        if not len( triangle ):
+            continue
+        corners = window[batch][triangle]
+        v0, v1, v2 = corners[:, 0], corners[:, 1], corners[:, 2]
+        cx, cy = x + 0.5, y + 0.5
+        area = _edge( v0, v1, v2[:, 0], v2[:, 1] )
+        # make every triangle counter-clockwise: swap v1 and v2 otherwise
+        flip = area < 0
+        v1, v2 = (
+            numpy.where( flip[:, None], v2, v1 ),
+            numpy.where( flip[:, None], v1, v2 ),
+        )
+        area = numpy.abs( area )
+        e0 = _edge( v1, v2, cx, cy )
+        e1 = _edge( v2, v0, cx, cy )
+        e2 = _edge( v0, v1, cx, cy )
+        inside = (
+            ( ( e0 > 0 ) | ( ( e0 == 0 ) & _top_left( v1, v2 ) ) )
+            & ( ( e1 > 0 ) | ( ( e1 == 0 ) & _top_left( v2, v0 ) ) )
+            & ( ( e2 > 0 ) | ( ( e2 == 0 ) & _top_left( v0, v1 ) ) )
+        )
+        # barycentric weights of the original, unswapped, vertices
+        weights = numpy.column_stack( ( e0, e1, e2 ) ) / area[:, None]
+        weights[flip] = weights[flip][:, [ 0, 2, 1 ]]
+        z = ( weights * corners[:, :, 2] ).sum( axis=1 )
+        inside &= ( z >= 0.0 ) & ( z <= 1.0 )
+
+        keep = numpy.flatnonzero( inside )
+        triangle, x, y, z = triangle[keep], x[keep], y[keep], z[keep]
+        weights = weights[keep]
+        order_ids = ids[batch][triangle]
+        pixel = ( y - y0 ) * width + ( x - x0 )
+        if depth_test:
+            # nearest per pixel, the first drawn on a tie, and only where
+            # it passes GL_LESS against what's there already
+            order = numpy.lexsort( ( order_ids, z, pixel ) )
+            first = numpy.ones( len( order ), dtype=bool )
+            first[1:] = pixel[order][1:] != pixel[order][:-1]
+            winner = order[first]
+            winner = winner[z[winner] < depth.ravel()[pixel[winner]]]
+        else:
+            # the last drawn per pixel
+            order = numpy.lexsort( ( order_ids, pixel ) )
+            last = numpy.ones( len( order ), dtype=bool )
+            last[:-1] = pixel[order][1:] != pixel[order][:-1]
+            winner = order[last]
+        if not len( winner ):
+            continue
+
+        source = batch[triangle[winner]]
+        perspective = weights[winner] * inv_w[source]
+        w_sum = perspective.sum( axis=1 )
+        perspective /= w_sum[:, None]
+        interpolated = numpy.einsum(
+            'ij,ijk->ik', perspective, values[source]
+        )
+        varyings = dict(
+            ( name, interpolated[:, start:end] )
+            for name, start, end in layout
+        )
+        varyings['gl_FragCoord'] = numpy.column_stack( (
+            x[winner] + 0.5, y[winner] + 0.5, z[winner], w_sum,
+        ) )
+        shaded = numpy.clip(
+            numpy.asarray( fragment( varyings, uniforms ), dtype='f' ),
+            0.0, 1.0
+        )
+        colour.reshape( -1, 4 )[pixel[winner]] = shaded
+        if depth_test:
+            depth.ravel()[pixel[winner]] = z[winner]
+        written = True
+
+    if not written:
+        return None
+    return colour, depth
+
+
+def _area( window, x0, y0, width, height ):
+    '''
+    upper bound on the candidate fragments of window's triangles in a tile
+    '''
+    low = window[:, :, :2].min( axis=1 )
+    high = window[:, :, :2].max( axis=1 )
+    spans = numpy.minimum( high - low + 1, ( width, height ) )
+    return float( numpy.prod( numpy.maximum( spans, 0 ), axis=1 ).sum() )
+
+
+class Rasteriser( object ):
+    '''
+    a colour and depth buffer of size ( width, height ), and the means to
+    draw into them.
+
+    processes -- size of the process pool: None for one per CPU, 1 to do
+        all the work in this process
+    '''
+    def __init__( self, size, processes=None, tile=TILE ):
+        self.size = size
+        self.tile = tile
+        width, height = size
+        # rows bottom first, as GL stores them
+        self.colour = numpy.zeros( ( height, width, 4 ), dtype='f' )
+        self.depth = numpy.ones( ( height, width ), dtype='f' )
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self.processes = processes
+        self.pool = None
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc_info ):
+        self.close()
+
+    def _map( self, function, jobs, fragments ):
+        if ( self.processes <= 1 or len( jobs ) <= 1
+                or fragments < PARALLEL_FRAGMENTS ):
+            return [ function( job ) for job in jobs ]
+        if self.pool is None:
+            self.pool = multiprocessing.Pool( self.processes )
+        return self.pool.map( function, jobs )
+
+    def close( self ):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def clear( self, colour=( 0.0, 0.0, 0.0, 1.0 ), depth=1.0 ):
+        self.colour[:] = colour
+        self.depth[:] = depth
+
+    def read_pixels( self ):
+        '''
+        (height, width, 4) uint8, top row first, like headless.Framebuffer
+        '''
+        return numpy.round( self.colour[::-1] * 255.0 ).astype( numpy.uint8 )
+
+    def draw( self, program, attributes, uniforms, count=None, indices=None,
+              depth_test=True ):
+        '''
+        draw GL_TRIANGLES, from count vertices or by indices, with the
+        named attribute arrays and uniforms (see builtin_uniforms)
+        '''
+        clip, varyings = program.vertex( attributes, uniforms )
+        clip = numpy.asarray( clip, dtype='d' )
+        if indices is None:
+            indices = numpy.arange( len( clip ) if count is None else count )
+        elif count is not None:
+            indices = indices[:count]
+        triangles = numpy.asarray( indices ).reshape( -1, 3 )
+        values, layout = _pack_varyings( varyings, len( clip ) )
+
+        # whole triangles behind the eye are dropped, not clipped
+        w = clip[:, 3]
+        visible = ( w[triangles] > MIN_W ).all( axis=1 )
+        ndc = clip[:, :3] / numpy.where( w > MIN_W, w, 1.0 )[:, None]
+        width, height = self.size
+        window = numpy.column_stack( (
+            ( ndc[:, 0] + 1.0 ) * 0.5 * width,
+            ( ndc[:, 1] + 1.0 ) * 0.5 * height,
+            ( ndc[:, 2] + 1.0 ) * 0.5,
+        ) )
+        # snap to the sub-pixel grid, as GL implementations do
+        window[:, :2] = numpy.round( window[:, :2] * SUBPIXEL ) / SUBPIXEL
+        window = window[triangles]
+        low = window[:, :, :2].min( axis=1 )
+        high = window[:, :, :2].max( axis=1 )
+        visible &= ( high[:, 0] >= 0 ) & ( low[:, 0] <= width )
+        visible &= ( high[:, 1] >= 0 ) & ( low[:, 1] <= height )
+        # degenerate triangles cover nothing
+        visible &= _edge(
+            window[:, 0], window[:, 1], window[:, 2, 0], window[:, 2, 1]
+        ) != 0
+        ids = numpy.flatnonzero( visible )
+        if not len( ids ):
+            return
+
+        # bin the triangles into the tiles their bounding boxes touch
+        tile = self.tile
+        columns = ( width + tile - 1 ) // tile
+        rows = ( height + tile - 1 ) // tile
+        first = numpy.clip( ( low[ids] // tile ).astype( 'i' ), 0,
+                            ( columns - 1, rows - 1 ) )
+        last = numpy.clip( ( high[ids] // tile ).astype( 'i' ), 0,
+                           ( columns - 1, rows - 1 ) )
+        spans = last - first + 1
+        counts = spans[:, 0] * spans[:, 1]
+        which = numpy.repeat( numpy.arange( len( ids ) ), counts )
+        offset = numpy.arange( counts.sum() ) - numpy.repeat(
+            numpy.cumsum( counts ) - counts, counts
+        )
+        tile_x = first[which, 0] + offset % spans[which, 0]
+        tile_y = first[which, 1] + offset // spans[which, 0]
+        tile_index = tile_y * columns + tile_x
+        order = numpy.lexsort( ( which, tile_index ) )
+        which, tile_index = which[order], tile_index[order]
+        starts = numpy.flatnonzero(
+            numpy.r_[ True, tile_index[1:] != tile_index[:-1] ]
+        )
+        ends = numpy.r_[ starts[1:], len( tile_index ) ]
+
+        corner_values = values[triangles]
+        inv_w = 1.0 / numpy.where( w > MIN_W, w, 1.0 )[triangles]
+        jobs, fragments = [], 0
+        for start, end in zip( starts, ends ):
+            index = tile_index[start]
+            x0 = ( index % columns ) * tile
+            y0 = ( index // columns ) * tile
+            area = ( slice( y0, y0 + tile ), slice( x0, x0 + tile ) )
+            chosen = ids[which[start:end]]
+            fragments += _area( window[chosen], x0, y0, tile, tile )
+            jobs.append( (
+                x0, y0, self.colour[area], self.depth[area],
+                window[chosen], inv_w[chosen], corner_values[chosen],
+                chosen, layout, program.fragment, uniforms, depth_test,
+            ) )
+
+        for job, result in zip( jobs, self._map( _rasterise, jobs, fragments ) ):
+            if result is None:
+                continue
+            x0, y0 = job[:2]
+            area = ( slice( y0, y0 + tile ), slice( x0, x0 + tile ) )
+            self.colour[area], self.depth[area] = result
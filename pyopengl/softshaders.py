@@ -0,0 +1,468 @@
+'''
+The tutorials' shaders ported to Python, and the geometry and uniforms
+each tutorial draws with, for rendering them with softraster.py:
+
+    python softshaders.py 09-point-lights.py --size 320x240 --output 09.png
+
+What each tutorial draws is read from its own source, without importing
+it, so these need neither OpenGLContext nor GL: module-level data
+(VERTEX_DATA, UNIFORM_VALUES, the LIGHTS.add calls), the array OnInit
+fills its VBO from, and the literal values Render passes to glUniform*f.
+Only the shaders are ported by hand, and the tweening of 03 and 04.
+Spheres come from geometry.sphere(), so their tessellation may differ a
+little from OpenGLContext's.
+'''
+import ast
+import optparse
+import tokenize
+from functools import partial
+from os.path import basename
+
+import numpy
+
+import dlight
+import geometry
+import softraster
+import timing
+import transforms
+from lights import LightSet
+from pngio import write_png
+
+
+DEFAULT_SIZE = ( 640, 480 )
+
+
+def _apply( matrix, vectors, w=1.0 ):
+    '''
+    matrix * vec4( vectors, w ), for (N, 3) vectors
+    '''
+    vectors = numpy.asarray( vectors, dtype='f' )
+    homogeneous = numpy.empty( ( len( vectors ), 4 ), dtype='f' )
+    homogeneous[:, :3] = vectors
+    homogeneous[:, 3] = w
+    return homogeneous.dot( matrix )
+
+
+def _normalize( vectors ):
+    return vectors / numpy.sqrt(
+        ( vectors * vectors ).sum( axis=-1 )
+    )[..., None]
+
+
+# 01-basic-geometry.py
+def basic_vertex( attributes, uniforms ):
+    return _apply(
+        uniforms['gl_ModelViewProjectionMatrix'], attributes['gl_Vertex']
+    ), {}
+
+
+def green_fragment( varyings, uniforms ):
+    colour = numpy.empty( ( len( varyings['gl_FragCoord'] ), 4 ), dtype='f' )
+    colour[:] = ( 0, 1, 0, 1 )
+    return colour
+
+
+# 02-varying-values.py
+def color_vertex( attributes, uniforms ):
+    colour = numpy.ones( ( len( attributes['gl_Color'] ), 4 ), dtype='f' )
+    colour[:, :3] = attributes['gl_Color']
+    return _apply(
+        uniforms['gl_ModelViewProjectionMatrix'], attributes['gl_Vertex']
+    ), { 'vertex_color': colour }
+
+
+def vertex_color_fragment( varyings, uniforms ):
+    return varyings['vertex_color']
+
+
+# 03-uniform-values.py and 04-uniform-values-tweening.py
+def tween_vertex( attributes, uniforms ):
+    tween = uniforms['tween']
+    position = (
+        attributes['position'] * ( 1.0 - tween )
+        + attributes['tweened'] * tween
+    )
+    colour = numpy.ones( ( len( position ), 4 ), dtype='f' )
+    colour[:, :3] = attributes['color']
+    return _apply(
+        uniforms['gl_ModelViewProjectionMatrix'], position
+    ), { 'baseColor': colour }
+
+
+def base_color_fragment( varyings, uniforms ):
+    return varyings['baseColor']
+
+
+# 05-lighting.py: diffuse lighting per vertex
+def diffuse_vertex( attributes, uniforms ):
+    normal_matrix = uniforms['gl_NormalMatrix']
+    ec_light_location = _normalize(
+        numpy.asarray( uniforms['Light_location'], dtype='f' ).dot(
+            normal_matrix
+        )
+    )
+    diffuse_weight = numpy.maximum( 0.0, _normalize(
+        attributes['Vertex_normal'].dot( normal_matrix )
+    ).dot( ec_light_location ) )
+    colour = numpy.clip(
+        uniforms['Global_ambient'] * uniforms['Material_ambient']
+        + uniforms['Light_ambient'] * uniforms['Material_ambient']
+        + numpy.multiply.outer(
+            diffuse_weight,
+            uniforms['Light_diffuse'] * uniforms['Material_diffuse']
+        ),
+        0.0, 1.0
+    )
+    return _apply(
+        uniforms['gl_ModelViewProjectionMatrix'],
+        attributes['Vertex_position']
+    ), { 'baseColor': colour }
+
+
+def normal_vertex( attributes, uniforms ):
+    '''
+    the vertex shader of 06, and of lights.py for the later tutorials
+    '''
+    return _apply(
+        uniforms['gl_ModelViewProjectionMatrix'],
+        attributes['Vertex_position']
+    ), {
+        'baseNormal': _normalize( attributes['Vertex_normal'] ).dot(
+            uniforms['gl_NormalMatrix']
+        ),
+        'modelPosition': attributes['Vertex_position'],
+    }
+
+
+# 06-specular-highlights.py: one directional light, per fragment
+def specular_fragment( varyings, uniforms ):
+    ec_light_location = _normalize(
+        numpy.asarray( uniforms['Light_location'], dtype='f' ).dot(
+            uniforms['gl_NormalMatrix']
+        )
+    )
+    light_half = _normalize( ec_light_location - dlight.VIEW_DIRECTION )
+    # a distance of 0.0 skips attenuation, leaving 06's dLight
+    _, diffuse, specular = dlight.dlight(
+        ec_light_location, light_half, varyings['baseNormal'],
+        uniforms['Material_shininess'], 0.0, ( 1.0, 0.0, 0.0 )
+    )
+    return (
+        uniforms['Global_ambient'] * uniforms['Material_ambient']
+        + uniforms['Light_ambient'] * uniforms['Material_ambient']
+        + numpy.multiply.outer(
+            diffuse, uniforms['Light_diffuse'] * uniforms['Material_diffuse']
+        )
+        + numpy.multiply.outer(
+            specular,
+            uniforms['Light_specular'] * uniforms['Material_specular']
+        )
+    )
+
+
+# 07-multiple-lights.py to 09-point-lights.py, via lights.py
+def lit_fragment( varyings, uniforms ):
+    return dlight.lit_colour(
+        varyings['modelPosition'], varyings['baseNormal'],
+        uniforms['lights'], uniforms['material'],
+        uniforms['Global_ambient'], uniforms['gl_NormalMatrix']
+    )
+
+
+BASIC = softraster.Program( basic_vertex, green_fragment )
+VARYING = softraster.Program( color_vertex, vertex_color_fragment )
+TWEEN = softraster.Program( tween_vertex, base_color_fragment )
+DIFFUSE = softraster.Program( diffuse_vertex, base_color_fragment )
+SPECULAR = softraster.Program( normal_vertex, specular_fragment )
+LIT = softraster.Program( normal_vertex, lit_fragment )
+
+
+def _statements( source ):
+    '''
+    [ ( depth, source ) ] of each simple statement, or compound statement
+    header, at any depth of indentation.  By tokenizing rather than
+    parsing, this works on the tutorials' Python 2 source under Python 3
+    too.
+    '''
+    lines = source.splitlines( True )
+    statements = []
+    depth, start, start_depth = 0, None, 0
+    for kind, _, ( row, _ ), _, _ in tokenize.generate_tokens(
+        partial( next, iter( lines ), '' )
+    ):
+        if kind == tokenize.INDENT:
+            depth += 1
+        elif kind == tokenize.DEDENT:
+            depth -= 1
+        elif kind == tokenize.NEWLINE:
+            if start is not None:
+                statements.append(
+                    ( start_depth, ''.join( lines[start - 1:row] ) )
+                )
+            start = None
+        elif kind not in ( tokenize.COMMENT, tokenize.NL ) and start is None:
+            start, start_depth = row, depth
+    return statements
+
+
+def _literal( node, values ):
+    # a literal, or a sum of literals and names already assigned, as the
+    # shader sources are
+    if isinstance( node, ast.BinOp ) and isinstance( node.op, ast.Add ):
+        return _literal( node.left, values ) + _literal( node.right, values )
+    if isinstance( node, ast.Name ) and node.id in values:
+        return values[node.id]
+    return ast.literal_eval( node )
+
+
+def _tutorial_statements( path ):
+    with open( path ) as source:
+        return _statements( source.read() )
+
+
+def tutorial_values( path ):
+    '''
+    the literal module-level assignments of a tutorial (or sums of them,
+    such as its shader sources), by name, and LIGHTS as a LightSet if it
+    has one
+    '''
+    values = {}
+    for depth, statement in _tutorial_statements( path ):
+        if depth:
+            continue
+        try:
+            node, = ast.parse( statement, path ).body
+        except SyntaxError:
+            # a class or function header, or Python 2 only syntax
+            continue
+        if isinstance( node, ast.Assign ) and len( node.targets ) == 1:
+            target = node.targets[0]
+            if isinstance( target, ast.Name ):
+                try:
+                    values[target.id] = _literal( node.value, values )
+                except ( ValueError, TypeError ):
+                    pass
+        elif (
+            isinstance( node, ast.Expr ) and isinstance( node.value, ast.Call )
+            and isinstance( node.value.func, ast.Attribute )
+            and node.value.func.attr == 'add'
+            and getattr( node.value.func.value, 'id', None ) == 'LIGHTS'
+        ):
+            lights = values.setdefault( 'LIGHTS', LightSet() )
+            lights.add(
+                *[ ast.literal_eval( arg ) for arg in node.value.args ],
+                **dict(
+                    ( keyword.arg, ast.literal_eval( keyword.value ) )
+                    for keyword in node.value.keywords
+                )
+            )
+    return values
+
+
+def tutorial_calls( path, name ):
+    '''
+    the argument nodes ( ast nodes ) of each call to a function or method
+    called name anywhere in a tutorial, in order, for _literal()
+    '''
+    calls = []
+    for _, statement in _tutorial_statements( path ):
+        try:
+            tree = ast.parse( statement.lstrip() )
+        except SyntaxError:
+            continue
+        for node in ast.walk( tree ):
+            if isinstance( node, ast.Call ) and name in (
+                getattr( node.func, 'id', None ),
+                getattr( node.func, 'attr', None ),
+            ):
+                calls.append( node.args )
+    return calls
+
+
+def vertex_data( path, values ):
+    '''
+    the literal array a tutorial fills its VBO from, in OnInit or at
+    module level
+    '''
+    for arguments in tutorial_calls( path, 'array' ):
+        if arguments:
+            return _literal( arguments[0], values )
+    raise ValueError( 'no vertex data in %s' % ( path, ) )
+
+
+def render_uniforms( path, values ):
+    '''
+    the uniforms a tutorial sets to literal values, by name, from its
+    gl.glUniform*f( self.<name>_loc, ... ) calls
+    '''
+    uniforms = {}
+    for setter in ( 'glUniform1f', 'glUniform2f', 'glUniform3f',
+                    'glUniform4f' ):
+        for arguments in tutorial_calls( path, setter ):
+            location = arguments[0]
+            if (
+                not isinstance( location, ast.Attribute )
+                or not location.attr.endswith( '_loc' )
+            ):
+                continue
+            try:
+                value = tuple(
+                    _literal( argument, values )
+                    for argument in arguments[1:]
+                )
+            except ( ValueError, TypeError ):
+                continue
+            uniforms[location.attr[:-len( '_loc' )]] = value
+    return uniforms
+
+
+def _columns( data, *widths ):
+    data = numpy.asarray( data, dtype='f' )
+    columns, start = [], 0
+    for width in widths:
+        columns.append( data[:, start:start + width] )
+        start += width
+    return columns
+
+
+def _tween( fraction ):
+    # as the tutorials' OnTimerFraction
+    if fraction > .5:
+        fraction = 1.0 - fraction
+    return fraction * 2
+
+
+def _sphere():
+    coords, indices = geometry.sphere( radius=1.0 )
+    return {
+        'Vertex_position': coords[:, 0:3],
+        'Vertex_normal': coords[:, 5:8],
+    }, indices
+
+
+def _lit_uniforms( values, lights ):
+    material, global_ambient = dlight.material_from_uniforms( values )
+    return {
+        'material': material,
+        'Global_ambient': global_ambient,
+        'lights': lights.data,
+    }
+
+
+def scene( path, fraction=0.0 ):
+    '''
+    what the tutorial at path draws at animation fraction: a list of
+    ( program, attributes, uniforms, indices ), indices None to draw
+    every vertex
+    '''
+    name = basename( path )[:2]
+    values = tutorial_values( path )
+    if name == '01':
+        position, = _columns( vertex_data( path, values ), 3 )
+        return [ ( BASIC, { 'gl_Vertex': position }, {}, None ) ]
+    if name == '02':
+        position, color = _columns( vertex_data( path, values ), 3, 3 )
+        return [ ( VARYING, {
+            'gl_Vertex': position, 'gl_Color': color,
+        }, {}, None ) ]
+    if name in ( '03', '04' ):
+        position, tweened, color = _columns(
+            vertex_data( path, values ), 3, 3, 3
+        )
+        return [ ( TWEEN, {
+            'position': position, 'tweened': tweened, 'color': color,
+        }, { 'tween': _tween( fraction ) }, None ) ]
+    if name == '05':
+        position, normal = _columns( vertex_data( path, values ), 3, 3 )
+        return [ ( DIFFUSE, {
+            'Vertex_position': position, 'Vertex_normal': normal,
+        }, _arrays( render_uniforms( path, values ) ), None ) ]
+
+    attributes, indices = _sphere()
+    if name == '06':
+        return [ ( SPECULAR, attributes, _arrays(
+            render_uniforms( path, values )
+        ), indices ) ]
+    if name == '07':
+        uniforms = values['UNIFORM_VALUES']
+        lights = LightSet()
+        for i in range( 3 ):
+            light = 'light%d_' % ( i, )
+            lights.add(
+                uniforms[light + 'pos'], uniforms[light + 'amb'],
+                uniforms[light + 'diff'], uniforms[light + 'spec'],
+            )
+        return [ ( LIT, attributes, _lit_uniforms( uniforms, lights ),
+                   indices ) ]
+    if name in ( '08', '09' ):
+        return [ ( LIT, attributes, _lit_uniforms(
+            values['UNIFORM_VALUES'], values['LIGHTS']
+        ), indices ) ]
+    raise ValueError( 'no software port of %s' % ( path, ) )
+
+
+def _arrays( uniforms ):
+    return dict(
+        ( name, numpy.asarray( value, dtype='f' ) )
+        for name, value in uniforms.items()
+    )
+
+
+def render( path, size=DEFAULT_SIZE, fraction=0.0, processes=None,
+            rasteriser=None ):
+    '''
+    the tutorial at path, rendered in software as headless.py renders it
+    in GL, as (height, width, 4) uint8 pixels, top row first
+    '''
+    modelview, projection = transforms.default_camera( *size )
+    builtins = softraster.builtin_uniforms( modelview, projection )
+    own = rasteriser is None
+    if own:
+        rasteriser = softraster.Rasteriser( size, processes )
+    try:
+        rasteriser.clear()
+        for program, attributes, uniforms, indices in scene( path, fraction ):
+            attributes = dict(
+                ( name, numpy.asarray( value, dtype='f' ) )
+                for name, value in attributes.items()
+            )
+            uniforms = dict( uniforms, **builtins )
+            rasteriser.draw( program, attributes, uniforms, indices=indices )
+        return rasteriser.read_pixels()
+    finally:
+        if own:
+            rasteriser.close()
+
+
+def main( argv=None ):
+    parser = optparse.OptionParser(
+        usage='%prog [options] TUTORIAL.py [TUTORIAL.py ...]'
+    )
+    parser.add_option( '-s', '--size', default='%dx%d' % DEFAULT_SIZE,
+        help='image WIDTHxHEIGHT' )
+    parser.add_option( '-f', '--fraction', type='float', default=0.0,
+        help='animation time, from 0.0 to 1.0' )
+    parser.add_option( '-j', '--processes', type='int',
+        help='rasterise tiles in this many processes [one per CPU]' )
+    parser.add_option( '-o', '--output', metavar='FILE',
+        help='write the image to FILE, a PNG, if rendering one tutorial' )
+    options, paths = parser.parse_args( argv )
+    if not paths:
+        parser.error( 'name at least one tutorial script' )
+
+    width, height = [ int( n ) for n in options.size.lower().split( 'x' ) ]
+    with softraster.Rasteriser( ( width, height ), options.processes ) as r:
+        for path in paths:
+            start = timing.clock()
+            pixels = render(
+                path, ( width, height ), options.fraction, rasteriser=r
+            )
+            print( '%-32s %8.1f ms' % (
+                basename( path ), ( timing.clock() - start ) * 1000.0
+            ) )
+            if options.output and len( paths ) == 1:
+                write_png( options.output, pixels )
+
+
+if __name__ == "__main__":
+    main()
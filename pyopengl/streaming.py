@@ -0,0 +1,239 @@
+'''
+A vertex buffer for geometry that changes every frame, which the CPU
+writes straight into, through a numpy view of mapped buffer memory.
+
+vbo.VBO.set_array() re-sends the whole array with glBufferData, from a
+copy the caller has already had to build.  A StreamingBuffer instead
+divides one buffer into a ring of REGIONS regions.  Each frame the CPU
+fills the next region in place while the GPU may still be reading the
+ones before, and a fence after each frame's draws says when its region
+can be written again, so the CPU only waits if it gets REGIONS frames
+ahead:
+
+    stream = StreamingBuffer( count * stride, stride )
+    mesh = Mesh( stream, attributes, count )   # as if it were a VBO
+    ...
+    vertices = stream.map( 'f', ( count, 9 ) )
+    simulate( vertices )                       # writes in place
+    stream.unmap()
+    mesh.draw( first=stream.first )
+    stream.fence()
+
+Attribute pointers stay at the start of the buffer, and draws pick the
+region with their first vertex, so a Mesh's VAO never needs re-making.
+As first applies to every attribute, all of a mesh's per-vertex
+attributes must then come from the one StreamingBuffer.
+
+How the memory is mapped depends on the driver:
+
+    'persistent'  GL 4.4 or GL_ARB_buffer_storage: mapped once, coherent,
+                  for the buffer's whole life
+    'map'         GL 3.0 or GL_ARB_map_buffer_range: each region mapped
+                  unsynchronized while it's written
+    'copy'        neither: the view is of a numpy array, copied into the
+                  region with glBufferSubData on unmap()
+
+Fences need GL 3.2 or GL_ARB_sync.  Without them 'map' degrades to
+synchronised mapping, with the stalls that brings.
+'''
+import ctypes
+
+import numpy
+
+from OpenGL import GL as gl
+
+
+REGIONS = 3
+MODES = ( 'persistent', 'map', 'copy' )
+# how long to wait on a fence at a time, in nanoseconds
+WAIT_TIMEOUT = 1000000
+
+
+def best_mode():
+    if gl.glBufferStorage and gl.glMapBufferRange:
+        return 'persistent'
+    if gl.glMapBufferRange:
+        return 'map'
+    return 'copy'
+
+
+def fences_supported():
+    return bool( gl.glFenceSync )
+
+
+class StreamingBuffer( object ):
+    '''
+    a ring of regions of size bytes each, in a single buffer object.
+
+    stride -- bytes per vertex, which regions are sized in multiples of,
+        so that each region starts on a whole vertex
+    mode -- one of MODES, or None for the best the driver supports
+    '''
+    def __init__( self, size, stride=1, regions=REGIONS,
+                  target=gl.GL_ARRAY_BUFFER, mode=None ):
+        if mode is None:
+            mode = best_mode()
+        if mode not in MODES:
+            raise ValueError( 'unknown streaming mode: %r' % ( mode, ) )
+        self.mode = mode
+        self.stride = stride
+        self.region_size = ( size + stride - 1 ) // stride * stride
+        self.regions = regions
+        self.target = target
+        self.buffer = None
+        self.memory = None
+        self.staging = None
+        self.fences = [ None ] * regions
+        self.region = regions - 1
+        self.mapped = False
+        self.stalls = 0
+        self.frames = 0
+
+    @property
+    def offset( self ):
+        '''
+        byte offset of the current region in the buffer
+        '''
+        return self.region * self.region_size
+
+    @property
+    def first( self ):
+        '''
+        index of the current region's first vertex, to draw from
+        '''
+        return self.offset // self.stride
+
+    def _create( self ):
+        total = self.region_size * self.regions
+        self.buffer = gl.glGenBuffers( 1 )
+        gl.glBindBuffer( self.target, self.buffer )
+        if self.mode == 'persistent':
+            flags = (
+                gl.GL_MAP_WRITE_BIT | gl.GL_MAP_PERSISTENT_BIT
+                | gl.GL_MAP_COHERENT_BIT
+            )
+            gl.glBufferStorage( self.target, total, None, flags )
+            address = gl.glMapBufferRange( self.target, 0, total, flags )
+            self.memory = numpy.frombuffer(
+                ( ctypes.c_ubyte * total ).from_address( address ),
+                dtype=numpy.uint8
+            )
+        else:
+            gl.glBufferData( self.target, total, None, gl.GL_STREAM_DRAW )
+            if self.mode == 'copy':
+                self.staging = numpy.zeros( self.region_size, numpy.uint8 )
+        gl.glBindBuffer( self.target, 0 )
+
+    def _wait( self, region ):
+        fence = self.fences[region]
+        if fence is None:
+            return
+        result = gl.glClientWaitSync( fence, 0, 0 )
+        if result not in ( gl.GL_ALREADY_SIGNALED, gl.GL_CONDITION_SATISFIED ):
+            self.stalls += 1
+            while result not in (
+                gl.GL_ALREADY_SIGNALED, gl.GL_CONDITION_SATISFIED
+            ):
+                if result == gl.GL_WAIT_FAILED:
+                    raise RuntimeError( 'glClientWaitSync failed' )
+                result = gl.glClientWaitSync(
+                    fence, gl.GL_SYNC_FLUSH_COMMANDS_BIT, WAIT_TIMEOUT
+                )
+        gl.glDeleteSync( fence )
+        self.fences[region] = None
+
+    def map( self, dtype=numpy.uint8, shape=None ):
+        '''
+        move on to the next region, waiting for the GPU to finish with
+        it if need be, and return a writable view of it as an array of
+        dtype, shaped shape (or flat).  Valid until unmap().
+        '''
+        if self.mapped:
+            raise RuntimeError( 'StreamingBuffer is already mapped' )
+        if self.buffer is None:
+            self._create()
+        self.region = ( self.region + 1 ) % self.regions
+        self._wait( self.region )
+
+        start = self.offset
+        if self.mode == 'persistent':
+            memory = self.memory[start:start + self.region_size]
+        elif self.mode == 'map':
+            flags = gl.GL_MAP_WRITE_BIT | gl.GL_MAP_INVALIDATE_RANGE_BIT
+            if fences_supported():
+                # the fence has already told us the GPU is done with it
+                flags |= gl.GL_MAP_UNSYNCHRONIZED_BIT
+            gl.glBindBuffer( self.target, self.buffer )
+            address = gl.glMapBufferRange(
+                self.target, start, self.region_size, flags
+            )
+            gl.glBindBuffer( self.target, 0 )
+            memory = numpy.frombuffer(
+                ( ctypes.c_ubyte * self.region_size ).from_address( address ),
+                dtype=numpy.uint8
+            )
+        else:
+            memory = self.staging
+        self.mapped = True
+
+        view = memory.view( dtype )
+        if shape is not None:
+            view = view[:int( numpy.prod( shape ) )].reshape( shape )
+        return view
+
+    def unmap( self, size=None ):
+        '''
+        hand the current region to the GL.  size is how many bytes were
+        written, if not all of them (it only matters to 'copy' mode).
+        '''
+        if not self.mapped:
+            return
+        if self.mode == 'map':
+            gl.glBindBuffer( self.target, self.buffer )
+            gl.glUnmapBuffer( self.target )
+            gl.glBindBuffer( self.target, 0 )
+        elif self.mode == 'copy':
+            if size is None:
+                size = self.region_size
+            gl.glBindBuffer( self.target, self.buffer )
+            gl.glBufferSubData(
+                self.target, self.offset, size, self.staging[:size]
+            )
+            gl.glBindBuffer( self.target, 0 )
+        self.mapped = False
+
+    def fence( self ):
+        '''
+        call after the draws reading the current region have been issued
+        '''
+        if fences_supported():
+            self.fences[self.region] = gl.glFenceSync(
+                gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0
+            )
+        self.frames += 1
+
+    # enough of the vbo.VBO interface for Mesh and Attribute
+    def bind( self ):
+        if self.buffer is None:
+            self._create()
+        gl.glBindBuffer( self.target, self.buffer )
+
+    def unbind( self ):
+        gl.glBindBuffer( self.target, 0 )
+
+    def __add__( self, offset ):
+        return ctypes.c_void_p( offset )
+
+    def delete( self ):
+        for region in range( self.regions ):
+            if self.fences[region] is not None:
+                gl.glDeleteSync( self.fences[region] )
+                self.fences[region] = None
+        if self.buffer is not None:
+            if self.mode == 'persistent':
+                gl.glBindBuffer( self.target, self.buffer )
+                gl.glUnmapBuffer( self.target )
+                gl.glBindBuffer( self.target, 0 )
+            gl.glDeleteBuffers( 1, [ self.buffer ] )
+            self.buffer = None
+            self.memory = None
@@ -0,0 +1,71 @@
+'''
+Frame-time statistics shared by the headless runner and the benchmarks.
+'''
+import time
+
+# best wall clock on every platform we run on
+try:
+    clock = time.perf_counter
+except AttributeError:
+    clock = time.clock if hasattr( time, 'clock' ) else time.time
+
+
+PERCENTILES = ( 50, 90, 95, 99 )
+
+
+def percentile( samples, pct ):
+    '''
+    linear-interpolated percentile of an already sorted sequence
+    '''
+    if not samples:
+        return 0.0
+    rank = ( len( samples ) - 1 ) * pct / 100.0
+    lower = int( rank )
+    upper = min( lower + 1, len( samples ) - 1 )
+    weight = rank - lower
+    return samples[lower] * ( 1.0 - weight ) + samples[upper] * weight
+
+
+def summarise( samples ):
+    '''
+    summarise a list of durations in seconds, as a dict of milliseconds
+    '''
+    ordered = sorted( samples )
+    count = len( ordered )
+    summary = {
+        'frames': count,
+        'min': ordered[0] * 1000.0 if count else 0.0,
+        'max': ordered[-1] * 1000.0 if count else 0.0,
+        'mean': sum( ordered ) * 1000.0 / count if count else 0.0,
+    }
+    for pct in PERCENTILES:
+        summary['p%d' % ( pct, )] = percentile( ordered, pct ) * 1000.0
+    summary['fps'] = 1000.0 / summary['mean'] if summary['mean'] else 0.0
+    return summary
+
+
+def format_summary( name, summary ):
+    '''
+    one line of milliseconds, eg. for a report table
+    '''
+    columns = [ 'min', 'mean' ] + [ 'p%d' % ( pct, ) for pct in PERCENTILES ]
+    columns.append( 'max' )
+    return '%-32s %6d frames  %s  %8.1f fps' % (
+        name,
+        summary['frames'],
+        '  '.join( '%s %7.3f' % ( column, summary[column] )
+                   for column in columns ),
+        summary['fps'],
+    )
+
+
+def time_calls( function, repeat, *args ):
+    '''
+    call function( *args ) repeat times, returning each call's duration
+    '''
+    samples = []
+    for _ in range( repeat ):
+        start = clock()
+        function( *args )
+        samples.append( clock() - start )
+    return samples
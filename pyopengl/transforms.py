@@ -0,0 +1,87 @@
+'''
+Column-major 4x4 matrices built with numpy, for code that needs the same
+camera as OpenGLContext without asking the fixed-function pipeline for it.
+
+Matrices are returned the way glLoadMatrixf wants them: a (4,4) float32
+array whose rows are OpenGL's columns, so a point transforms as
+``point.dot( matrix )``.
+'''
+from math import pi, tan
+
+import numpy
+
+
+# OpenGLContext's default ViewPlatform
+CAMERA_POSITION = ( 0.0, 0.0, 10.0 )
+FIELD_OF_VIEW = pi / 3
+NEAR = 0.3
+FAR = 50000.0
+
+
+def identity():
+    return numpy.identity( 4, dtype='f' )
+
+
+def translation( x, y, z ):
+    matrix = identity()
+    matrix[3, :3] = ( x, y, z )
+    return matrix
+
+
+def scale( x, y, z ):
+    matrix = identity()
+    matrix[0, 0], matrix[1, 1], matrix[2, 2] = x, y, z
+    return matrix
+
+
+def rotation( angle, x, y, z ):
+    '''
+    angle radians anticlockwise about the axis ( x, y, z ), as glRotate
+    '''
+    axis = numpy.array( ( x, y, z ), dtype='f8' )
+    x, y, z = axis / numpy.sqrt( axis.dot( axis ) )
+    c, s = numpy.cos( angle ), numpy.sin( angle )
+    matrix = identity()
+    # glRotate's matrix, transposed
+    matrix[:3, :3] = numpy.array( [
+        [ x * x * ( 1 - c ) + c, y * x * ( 1 - c ) + z * s,
+          x * z * ( 1 - c ) - y * s ],
+        [ x * y * ( 1 - c ) - z * s, y * y * ( 1 - c ) + c,
+          y * z * ( 1 - c ) + x * s ],
+        [ x * z * ( 1 - c ) + y * s, y * z * ( 1 - c ) - x * s,
+          z * z * ( 1 - c ) + c ],
+    ] )
+    return matrix
+
+
+def perspective( fovy, aspect, near, far ):
+    '''
+    same as gluPerspective, but fovy is in radians
+    '''
+    f = 1.0 / tan( fovy / 2.0 )
+    matrix = numpy.zeros( ( 4, 4 ), dtype='f' )
+    matrix[0, 0] = f / aspect
+    matrix[1, 1] = f
+    matrix[2, 2] = ( far + near ) / ( near - far )
+    matrix[2, 3] = -1.0
+    matrix[3, 2] = ( 2.0 * far * near ) / ( near - far )
+    return matrix
+
+
+def default_camera( width, height ):
+    '''
+    returns ( modelview, projection ) for OpenGLContext's default viewpoint
+    '''
+    x, y, z = CAMERA_POSITION
+    modelview = translation( -x, -y, -z )
+    projection = perspective(
+        FIELD_OF_VIEW, float( width ) / height, NEAR, FAR
+    )
+    return modelview, projection
+
+
+def normal_matrix( modelview ):
+    '''
+    the 3x3 gl_NormalMatrix for a modelview, in the same row-vector layout
+    '''
+    return numpy.linalg.inv( modelview[:3, :3] ).T.astype( 'f' )
@@ -0,0 +1,239 @@
+'''
+Uniform buffer objects laid out with the std140 rules, so their contents
+can be built in a numpy structured array and copied to the GPU as-is.
+
+A UniformBlock replaces many glUniform calls per frame with, at most, a
+glBufferSubData per changed byte range, and a single bind.  Because it is
+bound to a numbered binding point rather than to a program, any number of
+programs declaring the block can share it.
+
+Blocks need GL 3.1 or GL_ARB_uniform_buffer_object, so shaders declaring
+them start with:
+
+    #extension GL_ARB_uniform_buffer_object : require
+'''
+import numpy
+
+from OpenGL import GL as gl
+
+
+# glsl type: ( numpy base type, shape, std140 alignment, size )
+TYPES = {
+    'float': ( 'f4', (), 4, 4 ),
+    'int': ( 'i4', (), 4, 4 ),
+    'vec2': ( 'f4', ( 2, ), 8, 8 ),
+    'vec3': ( 'f4', ( 3, ), 16, 12 ),
+    'vec4': ( 'f4', ( 4, ), 16, 16 ),
+    'mat4': ( 'f4', ( 4, 4 ), 16, 64 ),
+}
+# array elements are padded to this, which only vec4 and mat4 already are
+ARRAY_TYPES = ( 'vec4', 'mat4' )
+
+
+class Struct( object ):
+    '''
+    a GLSL struct, usable as a field type of a block
+    '''
+    def __init__( self, name, fields ):
+        self.name = name
+        self.fields = fields
+        self.dtype = std140_dtype( fields, struct=True )
+
+    def declaration( self ):
+        return 'struct %s {\n%s};\n' % ( self.name, _members( self.fields ) )
+
+
+def _round_up( value, alignment ):
+    return ( value + alignment - 1 ) // alignment * alignment
+
+
+def std140_dtype( fields, struct=False ):
+    '''
+    numpy dtype with the std140 offsets of fields, which are tuples of
+    ( name, type ) or ( name, type, array_length ), type being a glsl type
+    name from TYPES or a Struct
+    '''
+    names, formats, offsets = [], [], []
+    offset = 0
+    for field in fields:
+        name, kind = field[:2]
+        count = field[2] if len( field ) > 2 else None
+        if isinstance( kind, Struct ):
+            if count is not None:
+                raise ValueError( 'arrays of structs are not supported' )
+            format, alignment, size = kind.dtype, 16, kind.dtype.itemsize
+        else:
+            base, shape, alignment, size = TYPES[kind]
+            if count is not None:
+                if kind not in ARRAY_TYPES:
+                    raise ValueError(
+                        'std140 pads each %s[] element to a vec4; declare '
+                        '%r as a vec4 array instead' % ( kind, name )
+                    )
+                shape = ( count, ) + shape
+                size *= count
+            format = ( base, shape ) if shape else base
+        offset = _round_up( offset, alignment )
+        names.append( name )
+        formats.append( format )
+        offsets.append( offset )
+        offset += size
+    # blocks are sized by the driver, but structs pad themselves to a vec4
+    itemsize = _round_up( offset, 16 ) if struct else offset
+    return numpy.dtype( {
+        'names': names,
+        'formats': formats,
+        'offsets': offsets,
+        'itemsize': itemsize,
+    } )
+
+
+def _members( fields ):
+    lines = []
+    for field in fields:
+        name, kind = field[:2]
+        if isinstance( kind, Struct ):
+            kind = kind.name
+        if len( field ) > 2:
+            name = '%s[%d]' % ( name, field[2] )
+        lines.append( '    %s %s;\n' % ( kind, name ) )
+    return ''.join( lines )
+
+
+def glsl_declaration( name, fields ):
+    '''
+    GLSL source declaring block name, and any structs it uses
+    '''
+    structs = [
+        field[1].declaration() for field in fields
+        if isinstance( field[1], Struct )
+    ]
+    return '%slayout(std140) uniform %s {\n%s};\n' % (
+        ''.join( structs ), name, _members( fields ),
+    )
+
+
+# the Material struct of 07, 08 and 09, and the global ambient light
+MATERIAL = Struct( 'Material', [
+    ( 'ambient', 'vec4' ),
+    ( 'diffuse', 'vec4' ),
+    ( 'specular', 'vec4' ),
+    ( 'shininess', 'float' ),
+] )
+MATERIAL_BLOCK = 'MaterialBlock'
+MATERIAL_FIELDS = [
+    ( 'material', MATERIAL ),
+    ( 'Global_ambient', 'vec4' ),
+]
+
+
+class UniformBlock( object ):
+    '''
+    the contents of a std140 uniform block, and the buffer holding them.
+
+    Assign values by field name, with dots for struct members, as you
+    would name the uniforms in GLSL:
+
+        block['material.diffuse'] = (0.2, 0.7, 0.3, 1.0)
+
+    then call upload() and bind() each frame; upload() only copies the
+    byte ranges which changed since it was last called.
+    '''
+    # changed ranges this close together are sent as one
+    MERGE_GAP = 16
+
+    def __init__( self, name, fields, binding, usage=gl.GL_DYNAMIC_DRAW ):
+        self.name = name
+        self.fields = fields
+        self.binding = binding
+        self.usage = usage
+        self.dtype = std140_dtype( fields )
+        self.bytes = numpy.zeros( self.dtype.itemsize, dtype=numpy.uint8 )
+        # a structured view onto self.bytes
+        self.values = self.bytes.view( self.dtype ).reshape( () )
+        self.uploaded = None
+        self.buffer = None
+        self.calls = 0
+        self.bytes_uploaded = 0
+
+    def declaration( self ):
+        return glsl_declaration( self.name, self.fields )
+
+    def _field( self, name ):
+        target = self.values
+        for part in name.split( '.' ):
+            target = target[part]
+        return target
+
+    def __getitem__( self, name ):
+        return self._field( name )
+
+    def __setitem__( self, name, value ):
+        target = self._field( name )
+        target[...] = numpy.reshape( value, target.shape )
+
+    def attach( self, program ):
+        '''
+        point program's declaration of this block at our binding point.
+        Returns False if program doesn't use the block.
+        '''
+        index = gl.glGetUniformBlockIndex( program, self.name )
+        if index == gl.GL_INVALID_INDEX:
+            return False
+        gl.glUniformBlockBinding( program, index, self.binding )
+        return True
+
+    def bind( self ):
+        gl.glBindBufferBase( gl.GL_UNIFORM_BUFFER, self.binding, self.buffer )
+
+    def dirty_ranges( self ):
+        '''
+        ( start, end ) byte ranges which differ from what was uploaded
+        '''
+        if self.uploaded is None:
+            return [ ( 0, len( self.bytes ) ) ]
+        changed = numpy.flatnonzero( self.bytes != self.uploaded )
+        if not len( changed ):
+            return []
+        breaks = numpy.flatnonzero( numpy.diff( changed ) > self.MERGE_GAP )
+        starts = numpy.concatenate( ( changed[:1], changed[breaks + 1] ) )
+        ends = numpy.concatenate( ( changed[breaks], changed[-1:] ) ) + 1
+        return list( zip( starts.tolist(), ends.tolist() ) )
+
+    def upload( self ):
+        '''
+        copy changed values to the buffer, creating it on first use.
+        Returns the number of buffer uploads made.
+        '''
+        if self.buffer is None:
+            self.buffer = gl.glGenBuffers( 1 )
+            gl.glBindBuffer( gl.GL_UNIFORM_BUFFER, self.buffer )
+            gl.glBufferData(
+                gl.GL_UNIFORM_BUFFER, len( self.bytes ), self.bytes,
+                self.usage
+            )
+            gl.glBindBuffer( gl.GL_UNIFORM_BUFFER, 0 )
+            self.uploaded = self.bytes.copy()
+            self.calls += 1
+            self.bytes_uploaded += len( self.bytes )
+            return 1
+
+        ranges = self.dirty_ranges()
+        if ranges:
+            gl.glBindBuffer( gl.GL_UNIFORM_BUFFER, self.buffer )
+            for start, end in ranges:
+                gl.glBufferSubData(
+                    gl.GL_UNIFORM_BUFFER, start, end - start,
+                    self.bytes[start:end]
+                )
+                self.uploaded[start:end] = self.bytes[start:end]
+                self.bytes_uploaded += end - start
+            gl.glBindBuffer( gl.GL_UNIFORM_BUFFER, 0 )
+            self.calls += len( ranges )
+        return len( ranges )
+
+    def delete( self ):
+        if self.buffer is not None:
+            gl.glDeleteBuffers( 1, [ self.buffer ] )
+            self.buffer = None
+            self.uploaded = None
@@ -0,0 +1,61 @@
+'''
+Uniform values persist in a linked program until they are changed, so
+re-sending the same value every frame is pure overhead: each glUniform
+call goes through PyOpenGL's wrappers before it reaches the driver.
+'''
+from OpenGL import GL as gl
+
+
+# glUniform entry point by number of float components
+SETTERS = {
+    1: 'glUniform1f',
+    2: 'glUniform2f',
+    3: 'glUniform3f',
+    4: 'glUniform4f',
+}
+
+
+class UniformCache( object ):
+    '''
+    remembers the last value uploaded to each (program, location) and only
+    issues the GL call when the value changes.
+
+    The program must be in use (glUseProgram) when set() is called, as with
+    the glUniform functions themselves.
+    '''
+    def __init__( self ):
+        self.values = {}
+        self.issued = 0
+        self.skipped = 0
+
+    def set( self, program, location, value ):
+        '''
+        upload value, a sequence of 1 to 4 floats, unless that location
+        already holds it.  Returns True if a GL call was made.
+        '''
+        if location in ( None, -1 ):
+            return False
+        value = tuple( value )
+        key = ( program, location )
+        if self.values.get( key ) == value:
+            self.skipped += 1
+            return False
+        getattr( gl, SETTERS[len( value )] )( location, *value )
+        self.values[key] = value
+        self.issued += 1
+        return True
+
+    def forget( self, program=None ):
+        '''
+        discard what we know about program's uniforms (or all programs),
+        eg. after it is relinked or deleted, which resets its values
+        '''
+        if program is None:
+            self.values.clear()
+        else:
+            for key in [ key for key in self.values if key[0] == program ]:
+                del self.values[key]
+
+    def reset_counters( self ):
+        self.issued = 0
+        self.skipped = 0
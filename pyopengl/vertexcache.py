@@ -0,0 +1,293 @@
+'''
+Reorders triangle indices, offline or as a mesh loads, so the GPU
+transforms fewer vertices, fetches them from memory in order, and shades
+fewer hidden fragments:
+
+    indices = optimise( indices, len( coords ) )       # vertex cache
+    indices = overdraw( coords, indices )               # optional
+    coords, indices = reorder_vertices( coords, indices )
+
+or all three with optimise_mesh( coords, indices ).
+
+optimise() is Tom Forsyth's "Linear-Speed Vertex Cache Optimisation":
+triangles are added greedily, each the best scoring of those using the
+vertices in a simulated LRU cache, a vertex scoring more the more
+recently it was used and the fewer triangles it has left.
+reorder_vertices() then renumbers the vertices in the order they're
+first used.  overdraw() splits the cache-ordered triangles into clusters
+where the order restarted anyway, and sorts the clusters outward-facing
+first, so they tend to hide the rest (Sander, Nehab and Barczak,
+"Fast Triangle Reordering for Vertex Locality and Reduced Overdraw").
+
+Gains are measured without a GPU by running the indices through a
+simulated FIFO post-transform cache (see simulate()):
+
+    ACMR  average cache miss ratio, transformed vertices per triangle:
+          3 at worst, about 0.5 for a good regular grid
+    ATVR  average transform to vertex ratio, transformed vertices per
+          vertex: 1 is ideal
+
+    python bench_vertexcache.py model.mesh
+'''
+from collections import deque
+
+import numpy
+
+
+FORSYTH_CACHE_SIZE = 32
+CACHE_DECAY_POWER = 1.5
+LAST_TRIANGLE_SCORE = 0.75
+VALENCE_BOOST_SCALE = 2.0
+VALENCE_BOOST_POWER = 0.5
+# a typical post-transform cache, for simulate()
+SIMULATED_CACHE_SIZE = 16
+# how much worse than the whole mesh's ACMR overdraw() lets clusters be
+OVERDRAW_THRESHOLD = 1.05
+
+
+def simulate( indices, cache_size=SIMULATED_CACHE_SIZE ):
+    '''
+    the number of vertices a FIFO post-transform cache of cache_size
+    entries would transform, drawing indices
+    '''
+    cache = deque()
+    cached = set()
+    misses = 0
+    for index in numpy.asarray( indices ).ravel().tolist():
+        if index in cached:
+            continue
+        misses += 1
+        cache.append( index )
+        cached.add( index )
+        if len( cache ) > cache_size:
+            cached.discard( cache.popleft() )
+    return misses
+
+
+def statistics( indices, cache_size=SIMULATED_CACHE_SIZE ):
+    '''
+    { 'acmr': ..., 'atvr': ... } of triangle indices
+    '''
+    indices = numpy.asarray( indices ).ravel()
+    misses = simulate( indices, cache_size )
+    triangles = len( indices ) // 3
+    vertices = len( numpy.unique( indices ) )
+    return {
+        'acmr': misses / float( triangles ) if triangles else 0.0,
+        'atvr': misses / float( vertices ) if vertices else 0.0,
+    }
+
+
+def _vertex_score( position, remaining, cache_size ):
+    if not remaining:
+        return -1.0
+    score = 0.0
+    if position >= 0:
+        if position < 3:
+            # the last triangle's vertices, scored the same whatever
+            # their order, so it isn't favoured to share just one
+            score = LAST_TRIANGLE_SCORE
+        else:
+            scale = 1.0 / ( cache_size - 3 )
+            score = ( 1.0 - ( position - 3 ) * scale ) ** CACHE_DECAY_POWER
+    return score + VALENCE_BOOST_SCALE * remaining ** -VALENCE_BOOST_POWER
+
+
+def optimise( indices, vertex_count=None, cache_size=FORSYTH_CACHE_SIZE ):
+    '''
+    indices' triangles reordered for the post-transform vertex cache, by
+    Forsyth's algorithm, as an array of the same type
+    '''
+    indices = numpy.asarray( indices )
+    triangles = indices.reshape( -1, 3 )
+    count = len( triangles )
+    if vertex_count is None:
+        vertex_count = int( triangles.max() ) + 1 if count else 0
+
+    # each vertex's triangles, as CSR arrays
+    corners = triangles.ravel()
+    order = numpy.argsort( corners, kind='mergesort' )
+    starts = numpy.zeros( vertex_count + 1, dtype=numpy.intp )
+    numpy.cumsum(
+        numpy.bincount( corners, minlength=vertex_count ), out=starts[1:]
+    )
+    adjacent = [
+        ( order[starts[v]:starts[v + 1]] // 3 ).tolist()
+        for v in range( vertex_count )
+    ]
+
+    remaining = [ len( tris ) for tris in adjacent ]
+    position = [ -1 ] * vertex_count
+    vertex_scores = [
+        _vertex_score( -1, remaining[v], cache_size )
+        for v in range( vertex_count )
+    ]
+    triangle_list = triangles.tolist()
+    triangle_scores = numpy.array( vertex_scores )[triangles].sum( axis=1 )
+
+    result = numpy.empty( count, dtype=numpy.intp )
+    cache = []
+    best = int( triangle_scores.argmax() ) if count else -1
+    for emitted in range( count ):
+        if best < 0:
+            # nothing in the cache has triangles left: start afresh
+            best = int( triangle_scores.argmax() )
+        result[emitted] = best
+        triangle_scores[best] = -numpy.inf
+        corners = triangle_list[best]
+        for vertex in corners:
+            remaining[vertex] -= 1
+            adjacent[vertex].remove( best )
+
+        # degenerate triangles name a vertex twice, but it's cached once
+        front = [ v for i, v in enumerate( corners ) if v not in corners[:i] ]
+        cache = front + [ v for v in cache if v not in front ]
+        evicted = cache[cache_size:]
+        del cache[cache_size:]
+        for vertex in evicted:
+            position[vertex] = -1
+            vertex_scores[vertex] = _vertex_score(
+                -1, remaining[vertex], cache_size
+            )
+        for index, vertex in enumerate( cache ):
+            position[vertex] = index
+            vertex_scores[vertex] = _vertex_score(
+                index, remaining[vertex], cache_size
+            )
+
+        best, best_score = -1, -numpy.inf
+        for vertex in cache + evicted:
+            for triangle in adjacent[vertex]:
+                score = sum(
+                    vertex_scores[v] for v in triangle_list[triangle]
+                )
+                triangle_scores[triangle] = score
+                if position[vertex] >= 0 and score > best_score:
+                    best, best_score = triangle, score
+    return triangles[result].ravel().astype( indices.dtype )
+
+
+def reorder_vertices( coords, indices ):
+    '''
+    ( coords, indices ) with the vertices renumbered in the order indices
+    first use them, any unused left at the end
+    '''
+    indices = numpy.asarray( indices )
+    flat = indices.ravel()
+    used, first = numpy.unique( flat, return_index=True )
+    order = used[numpy.argsort( first )]
+    unused = numpy.setdiff1d(
+        numpy.arange( len( coords ) ), used, assume_unique=True
+    )
+    order = numpy.concatenate( [ order, unused ] )
+    remap = numpy.empty( len( coords ), dtype=numpy.intp )
+    remap[order] = numpy.arange( len( coords ) )
+    return (
+        numpy.asarray( coords )[order],
+        remap[flat].astype( indices.dtype ).reshape( indices.shape ),
+    )
+
+
+def clusters( indices, threshold=OVERDRAW_THRESHOLD,
+              cache_size=SIMULATED_CACHE_SIZE ):
+    '''
+    the triangle numbers where cache-ordered indices can be cut into
+    clusters, from 0: where the order restarted anyway, every vertex of
+    a triangle missing the cache, and where a cluster's ACMR (drawn with
+    an empty cache) gets within threshold of the whole mesh's
+    '''
+    triangles = numpy.asarray( indices ).reshape( -1, 3 ).tolist()
+    target = statistics( indices, cache_size )['acmr'] * threshold
+    starts = []
+    cache, cached = deque(), set()
+    cluster_misses = drawn = 0
+    for number, triangle in enumerate( triangles ):
+        if not starts or cluster_misses <= target * drawn:
+            misses = 3
+        else:
+            misses = len( [ index for index in triangle
+                            if index not in cached ] )
+        if misses == 3:
+            starts.append( number )
+            cache, cached = deque(), set()
+            cluster_misses = drawn = 0
+        for index in triangle:
+            if index in cached:
+                continue
+            cluster_misses += 1
+            cache.append( index )
+            cached.add( index )
+            if len( cache ) > cache_size:
+                cached.discard( cache.popleft() )
+        drawn += 1
+    return starts or [ 0 ]
+
+
+def overdraw( coords, indices, position=0, threshold=OVERDRAW_THRESHOLD,
+              cache_size=SIMULATED_CACHE_SIZE ):
+    '''
+    cache-ordered indices' clusters of triangles sorted to draw those
+    facing furthest out of the mesh first, from any view
+
+    position -- offset in values of each vertex's x, y, z in coords
+    threshold -- see clusters(): higher makes more, smaller clusters, to
+        sort more finely, at the cost of more vertex cache misses
+    '''
+    indices = numpy.asarray( indices )
+    triangles = indices.reshape( -1, 3 )
+    if not len( triangles ):
+        return indices
+    positions = numpy.asarray( coords, dtype='f8' )[
+        :, position:position + 3
+    ]
+    corners = positions[triangles]
+    # area weighted normals and centres of every triangle
+    normals = numpy.cross(
+        corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]
+    )
+    areas = numpy.sqrt( ( normals ** 2 ).sum( axis=1 ) )
+    centres = corners.mean( axis=1 )
+    middle = (
+        ( centres * areas[:, None] ).sum( axis=0 ) / areas.sum()
+        if areas.sum() else centres.mean( axis=0 )
+    )
+
+    starts = numpy.array( clusters( indices, threshold, cache_size ) )
+    cluster = numpy.zeros( len( triangles ), dtype=numpy.intp )
+    cluster[starts[1:]] = 1
+    cluster = numpy.cumsum( cluster )
+    count = len( starts )
+
+    def total( values ):
+        return numpy.array( [
+            numpy.bincount( cluster, weights=values[:, axis],
+                            minlength=count )
+            for axis in range( 3 )
+        ] ).T
+    normal = total( normals )
+    area = numpy.bincount( cluster, weights=areas, minlength=count )
+    centre = total( centres * areas[:, None] ) / numpy.where(
+        area > 0, area, 1
+    )[:, None]
+    length = numpy.sqrt( ( normal ** 2 ).sum( axis=1 ) )
+    facing = ( ( centre - middle ) * normal ).sum( axis=1 ) / numpy.where(
+        length > 0, length, 1
+    )
+
+    # stable, so ties keep their cache order
+    order = numpy.argsort( -facing, kind='mergesort' )
+    ends = numpy.append( starts[1:], len( triangles ) )
+    return numpy.concatenate( [
+        triangles[starts[c]:ends[c]] for c in order
+    ] ).ravel().astype( indices.dtype )
+
+
+def optimise_mesh( coords, indices, reduce_overdraw=False, position=0 ):
+    '''
+    ( coords, indices ) reordered for the vertex cache, optionally for
+    overdraw, then for vertex fetch
+    '''
+    indices = optimise( indices, len( coords ) )
+    if reduce_overdraw:
+        indices = overdraw( coords, indices, position )
+    return reorder_vertices( coords, indices )